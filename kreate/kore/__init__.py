@@ -1,21 +1,36 @@
-from ._kontext import Kontext, Module
-from ._konfig import Konfig
-from ._app import App
-from ._cli import Cli
-from ._komp import KomponentKlass, Komponent, JinYamlKomponent, JinjaKomponent
-from ._core import deep_update, wrap, DictWrapper
+import importlib
+from typing import TYPE_CHECKING
 
-__all__ = [
-    Kontext.__name__,
-    Module.__name__,
-    Konfig.__name__,
-    App.__name__,
-    Cli.__name__,
-    KomponentKlass.__name__,
-    Komponent.__name__,
-    JinjaKomponent.__name__,
-    JinYamlKomponent.__name__,
-    wrap.__name__,
-    deep_update.__name__,
-    DictWrapper.__name__,
-]
+if TYPE_CHECKING:  # Only imports the below statements during type checking
+    from ._kontext import Kontext, Module
+    from ._konfig import Konfig
+    from ._app import App
+    from ._cli import Cli
+    from ._komp import KomponentKlass, Komponent, JinYamlKomponent, JinjaKomponent
+    from ._core import deep_update, wrap, DictWrapper
+
+# the submodules are only imported when used, for a faster startup
+_lazy_imports = {
+    "Kontext": "._kontext",
+    "Module": "._kontext",
+    "Konfig": "._konfig",
+    "App": "._app",
+    "Cli": "._cli",
+    "KomponentKlass": "._komp",
+    "Komponent": "._komp",
+    "JinjaKomponent": "._komp",
+    "JinYamlKomponent": "._komp",
+    "wrap": "._core",
+    "deep_update": "._core",
+    "DictWrapper": "._core",
+}
+
+__all__ = list(_lazy_imports)
+
+
+def __getattr__(name: str):
+    if name not in _lazy_imports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_lazy_imports[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -1,16 +1,21 @@
 import os
 import logging
-import shutil
-import inspect
-from typing import Mapping, List, TYPE_CHECKING
+from typing import Iterable, Mapping, List, TYPE_CHECKING
 from pathlib import Path
+from . import _dag
 from ._core import wrap
-from ._konfig import Konfig
 from ._kontext import load_class
+from ._target import TargetDir
 from ._komp import Komponent, KomponentKlass, TextFile, JinjaFile
 
+if TYPE_CHECKING:  # Only imports the below statements during type checking
+    from ._konfig import Konfig
+
 logger = logging.getLogger(__name__)
 
+# the app that is aktivated by forked worker processes
+_worker_app = None
+
 
 class App:
     """
@@ -25,16 +30,20 @@ class App:
       app.kreate_file()       # write the rendered template to a file
     """
 
-    def __init__(self, konfig: Konfig):
+    def __init__(self, konfig: "Konfig"):
         self.konfig = konfig
         self.kontext = konfig.kontext
         self.komponents: List[Komponent] = []
         self.komponents_by_id = {}
+        # the id of a komponent is not unique, e.g. the same patch for two targets
+        self.komponents_by_key = {}
+        self.komponent_keys_by_id = {}
         self.klasses: Mapping[str, KomponentKlass] = {}
         self.strukture = wrap(konfig.get_path("strukt"))
         self.target_path = Path(konfig.get_path("system.target_dir", f"build"))
         for mod in self.kontext.modules:
             mod.init_app(self)
+        self.target_dir = TargetDir(self.target_path)
         self.register_klasses()
 
     def kreate_komponents(self):
@@ -68,24 +77,120 @@ class App:
             return
         self.komponents.append(komp)
         self.komponents_by_id[komp.id] = komp
+        self.komponents_by_key[komp.key()] = komp
+        self.komponent_keys_by_id.setdefault(komp.id, []).append(komp.key())
+
+    def komponent_keys(self, ids: Iterable[str]) -> List[str]:
+        """the keys of all komponents with the given ids or keys, unknown ids are ignored"""
+        result = []
+        for id in ids:
+            if id in self.komponents_by_key:
+                result.append(id)
+            else:
+                result.extend(self.komponent_keys_by_id.get(id, []))
+        return result
+
+    def dependency_graph(self) -> _dag.Graph:
+        # the graph is keyed by komponent key, since the ids are not unique.
+        # dependencies on komponents that do not exist (e.g. that are skipped) are ignored
+        return {
+            komp.key(): set(self.komponent_keys(komp.aktivate_after()))
+            for komp in self.komponents
+        }
+
+    def select_komponents(self, komp_ids: List[str] = None) -> List[Komponent]:
+        """the komponents with the given ids or keys (default all), and all komponents they depend on"""
+        if not komp_ids:
+            return sorted(self.komponents, key=lambda komp: komp.key())
+        for id in komp_ids:
+            if id not in self.komponents_by_key and id not in self.komponent_keys_by_id:
+                raise ValueError(f"unknown komponent {id}")
+        keys = _dag.dependencies_closure(self.dependency_graph(), self.komponent_keys(komp_ids))
+        return [self.komponents_by_key[key] for key in sorted(keys)]
+
+    def aktivate_komponents(self, komponents: List[Komponent] = None):
+        komponents = self.komponents if komponents is None else komponents
+        graph = self.dependency_graph()
+        graph = {komp.key(): graph[komp.key()] for komp in komponents}
+        jobs = int(self.konfig.get_path("system.jobs", 1))
+        if jobs > 1:
+            import multiprocessing  # only needed for parallel jobs
+
+            if "fork" not in multiprocessing.get_all_start_methods():
+                logger.warning(f"can not use {jobs} jobs, since fork is not supported")
+                jobs = 1
+        if jobs > 1:
+            self.aktivate_komponents_parallel(graph, jobs)
+            return
+        for key in _dag.topological_order(graph):
+            logger.debug(f"aktivating {key}")
+            self.komponents_by_key[key].aktivate()
+
+    def aktivate_komponents_parallel(self, graph: _dag.Graph, jobs: int):
+        global _worker_app
+        import multiprocessing
+        import queue
 
-    def aktivate_komponents(self):
-        for komp in sorted(self.komponents, key = lambda komp: komp.id):
-            logger.debug(f"aktivating {komp.id}")
-            komp.aktivate()
-
-    def kreate_files(self):
-        if self.target_path.exists():
-            logger.info(f"removing target directory {self.target_path}")
-            shutil.rmtree(self.target_path)
-        os.makedirs(self.target_path, exist_ok=True)
-        self.aktivate_komponents()
-        for komp in sorted(self.komponents, key = lambda komp: komp.id):
+        jobs = min(jobs, len(graph)) or 1
+        logger.info(f"aktivating {len(graph)} komponents with {jobs} jobs")
+        states = {}
+        finished = queue.Queue()
+
+        def submit(key: str) -> None:
+            # a komponent gets the aktivated state of the komponents it depends on
+            dep_states = {dep: states[dep] for dep in graph[key]}
+            pool.apply_async(
+                _aktivate_in_worker,
+                (key, dep_states),
+                callback=finished.put,
+                error_callback=finished.put,
+            )
+
+        def wait() -> str:
+            result = finished.get()
+            if isinstance(result, BaseException):
+                raise result
+            key, state, cleanup_paths, written = result
+            states[key] = state
+            self.komponents_by_key[key].set_aktivated_state(state)
+            for path in cleanup_paths:
+                self.kontext.add_cleanup_path(path)
+            # files that were kopied while aktivating, e.g. by a Kustomization
+            self.target_dir.merge_written(written)
+            return key
+
+        _worker_app = self
+        try:
+            with multiprocessing.get_context("fork").Pool(jobs) as pool:
+                _dag.run_parallel(graph, submit, wait)
+        finally:
+            _worker_app = None
+
+    def incremental(self) -> bool:
+        return str(self.konfig.get_path("system.incremental", False)) == "True"
+
+    def kreate_files(self, komp_ids: List[str] = None):
+        """kreate the files of all komponents, or only of komp_ids and their dependencies"""
+        komponents = self.select_komponents(komp_ids)
+        self.target_dir = TargetDir(
+            self.target_path, incremental=self.incremental(), partial=bool(komp_ids)
+        )
+        self.target_dir.prepare()
+        self.aktivate_komponents(komponents)
+        for komp in komponents:
             if komp.get_filename():
                 logger.info(f"kreating file {komp.get_filename()}")
                 komp.kreate_file()
             else:
                 logger.info(f"skipping file for {komp.id}")
+        self.target_dir.finish()
+        logger.debug(f"file cache: {self.konfig.file_getter.cache_stats()}")
+
+    def write_file(self, path: Path, data, secret: bool = False) -> bool:
+        """write a file in the target dir, and return False if it was unchanged"""
+        if secret:
+            self.kontext.add_cleanup_path(path)
+        return self.target_dir.write(path, data, secret=secret)
 
     def kreate_komponents_from_strukture(self):
         if not self.strukture:
@@ -127,3 +232,15 @@ class App:
             return kls.kreate_komponent(app=self, shortname=shortname)
         else:
             raise ValueError(f"Unknown klass name {klass_name}")
+
+
+def _aktivate_in_worker(key: str, dep_states: dict):
+    app = _worker_app
+    for dep_key, state in dep_states.items():
+        app.komponents_by_key[dep_key].set_aktivated_state(state)
+    komp = app.komponents_by_key[key]
+    logger.debug(f"aktivating {komp.id} in process {os.getpid()}")
+    komp.aktivate()
+    cleanup_paths = set(app.kontext.cleanup_paths)
+    app.kontext.cleanup_paths.clear()
+    return key, komp.aktivated_state(), cleanup_paths, app.target_dir.pop_written_state()
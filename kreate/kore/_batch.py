@@ -0,0 +1,151 @@
+"""
+kreate the files for many konfigs (apps and environments) in one process
+
+Each konfig is kreated as if kreate was run in the dir of that konfig,
+with a fresh Kontext and Konfig, but the compiled templates, the parsed
+konfig files and the zip repo indexes are shared between all konfigs.
+The first konfig is kreated before the worker processes are forked,
+so all workers start with these caches already filled.
+"""
+
+import argparse
+import glob
+import logging
+import os
+import time
+from pathlib import Path
+from typing import List
+
+from ._cli import Cli
+from ._kontext import Kontext
+
+logger = logging.getLogger(__name__)
+
+# the cli of the batch command, used by forked worker processes
+_batch_cli = None
+
+
+def batch_konfig_paths(patterns: List[str], envs: List[str] = None) -> List[Path]:
+    """all main konfig files in the given files, dirs or glob patterns"""
+    konfig_glob = os.getenv("KREATE_MAIN_KONFIG_FILE", "kreate*.konf")
+    result = []
+    for pattern in patterns:
+        for name in sorted(glob.glob(pattern)) or [pattern]:
+            path = Path(name)
+            if path.is_dir():
+                result.extend(sorted(path.glob(konfig_glob)))
+            elif path.is_file():
+                result.append(path)
+            else:
+                raise FileNotFoundError(f"no konfig file or dir found for {pattern}")
+    if envs:
+        # konfig files are named kreate-<app>-<env>.konf
+        result = [path for path in result if path.stem.split("-")[-1] in envs]
+    # the same konfig might be found by several patterns
+    return list(dict.fromkeys(path.resolve() for path in result))
+
+
+def kreate_batch_item(cli: Cli, path: Path) -> dict:
+    """kreate the files of one konfig, and return the status and timing"""
+    start = time.perf_counter()
+    result = {"konfig": str(path), "status": "ok", "error": None}
+    cwd = os.getcwd()
+    environ = dict(os.environ)
+    kontext = None
+    try:
+        os.chdir(path.parent)
+        kontext = Kontext()
+        for mod in cli.kontext.modules:
+            kontext.add_module(type(mod)())
+        item_cli = Cli(kontext)
+        item_cli.args = argparse.Namespace(**vars(cli.args))
+        item_cli.args.konfig = path.name
+        # the konfigs are already kreated in parallel
+        item_cli.args.define = [*cli.args.define, "system.jobs=1"]
+        item_cli.args.komp = []
+        item_cli.subcmd = "files"
+        item_cli.params = []
+        app = item_cli.kreate_files()
+        result["files"] = len(app.target_dir.written)
+    except Exception as e:
+        logger.error(f"kreating {path} failed: {type(e).__name__}: {e}")
+        result["status"] = "failed"
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        if kontext and not cli.args.keep_secrets:
+            kontext.cleanup("")
+        os.chdir(cwd)
+        # a .env file of one konfig should not be used by the next one
+        os.environ.clear()
+        os.environ.update(environ)
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def _kreate_in_worker(path: Path) -> dict:
+    return kreate_batch_item(_batch_cli, path)
+
+
+def batch_jobs(cli: Cli, nrof_konfigs: int) -> int:
+    jobs = cli.args.jobs or os.cpu_count() or 1
+    if jobs > 1:
+        import multiprocessing
+
+        if "fork" not in multiprocessing.get_all_start_methods():
+            logger.warning(f"can not use {jobs} jobs, since fork is not supported")
+            jobs = 1
+    return max(1, min(jobs, nrof_konfigs - 1))
+
+
+def run_batch(cli: Cli, paths: List[Path]) -> List[dict]:
+    global _batch_cli
+    from ._jinyaml import share_parsed_yaml
+
+    share_parsed_yaml()
+    if not paths:
+        return []
+    # the first konfig fills the caches, before the workers are forked
+    results = [kreate_batch_item(cli, paths[0])]
+    jobs = batch_jobs(cli, len(paths))
+    if jobs == 1:
+        results.extend(kreate_batch_item(cli, path) for path in paths[1:])
+        return results
+    import multiprocessing
+
+    logger.info(f"kreating {len(paths)} konfigs with {jobs} jobs")
+    _batch_cli = cli
+    try:
+        with multiprocessing.get_context("fork").Pool(jobs) as pool:
+            results.extend(pool.map(_kreate_in_worker, paths[1:], chunksize=1))
+    finally:
+        _batch_cli = None
+    return results
+
+
+def print_summary(results: List[dict], seconds: float) -> None:
+    cwd = Path.cwd()
+    for result in results:
+        konfig = Path(result["konfig"])
+        if cwd in konfig.parents:
+            konfig = konfig.relative_to(cwd)
+        line = f"{result['status']:6} {result['seconds']:6.2f}s  {konfig}"
+        if result["error"]:
+            line += "  " + result["error"].splitlines()[0]
+        print(line)
+    failed = sum(1 for result in results if result["status"] != "ok")
+    print(f"kreated {len(results)} konfigs in {seconds:.2f}s: {len(results) - failed} ok, {failed} failed")
+
+
+def batch(cli: Cli):
+    """kreate files for many konfigs: batch <file|dir|glob>..."""
+    if not cli.params:
+        raise ValueError("batch needs one or more konfig files, dirs or glob patterns")
+    start = time.perf_counter()
+    paths = batch_konfig_paths(cli.params, cli.args.env)
+    if not paths:
+        raise ValueError(f"no konfig files found in {cli.params}")
+    results = run_batch(cli, paths)
+    print_summary(results, time.perf_counter() - start)
+    failed = [result for result in results if result["status"] != "ok"]
+    if failed:
+        raise RuntimeError(f"{len(failed)} of {len(results)} konfigs failed")
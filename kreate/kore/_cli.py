@@ -4,13 +4,14 @@ import argparse
 import logging
 import traceback
 import warnings
-import importlib.metadata
-
 from pathlib import Path
+from typing import TYPE_CHECKING
 from ._core import wrap
 from ._kontext import Kontext
-from ._konfig import Konfig
-from ._app import App
+
+if TYPE_CHECKING:  # Only imports the below statements during type checking
+    from ._konfig import Konfig
+    from ._app import App
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +25,9 @@ class Cli:
         self.epilog = "subcommands:\n"
         self.subcommands = {}
         self.aliases = {}
+        # the options that only one subcommand uses, by dest, shown in a group per subcommand
+        self.subcommand_options = {}
+        self.subcommand_groups = {}
         self.parser = argparse.ArgumentParser(
             prog="kreate",
             usage=("kreate [options] [<subcommand> [param ...]]"),
@@ -93,6 +97,8 @@ class Cli:
         return result
 
     def dist_package_version(self, package_name: str):
+        import importlib.metadata
+
         return importlib.metadata.version(package_name)
 
     def add_subcommand(self, func, name=None, aliases=[]) -> None:
@@ -103,6 +109,20 @@ class Cli:
         alias0 = aliases[0] if aliases else ""
         self.epilog += f"  {func.__name__:17} {alias0 :3} {func.__doc__ or ''} \n"
 
+    def add_subcommand_argument(self, subcmd: str, *args, **kwargs) -> None:
+        """add an option that can only be used with one subcommand"""
+        if subcmd not in self.subcommand_groups:
+            self.subcommand_groups[subcmd] = self.parser.add_argument_group(f"{subcmd} options")
+        action = self.subcommand_groups[subcmd].add_argument(*args, **kwargs)
+        self.subcommand_options[action.dest] = (subcmd, action)
+
+    def check_subcommand_options(self) -> None:
+        for dest, (subcmd, action) in self.subcommand_options.items():
+            if subcmd != self.subcmd and getattr(self.args, dest) != action.default:
+                raise ValueError(
+                    f"option {action.option_strings[-1]} can only be used with the {subcmd} subcommand"
+                )
+
     def add_help_section(self, text: str):
         self.epilog += text + "\n"
 
@@ -140,6 +160,7 @@ class Cli:
                 self.params = []
             if self.subcmd not in self.subcommands:
                 raise LookupError(f"Unknown subcommand {self.subcmd}")
+            self.check_subcommand_options()
             if self.subcmd != "view": # view has better, that understands alias
                 logger.info(f"==== {self.subcmd} {' '.join(self.params)} ====")
             self.subcommands[self.subcmd](self)
@@ -166,7 +187,9 @@ class Cli:
             if not self.args.keep_secrets:
                 self.kontext.cleanup(", use --keep-secrets or -K option to keep it")
 
-    def kreate_konfig(self) -> Konfig:
+    def kreate_konfig(self) -> "Konfig":
+        from ._konfig import Konfig
+
         path = self.find_main_konfig_path()
         dict_ = self.calc_dict()
         return Konfig(self.kontext, path, dict_=dict_, inkludes=self.args.inklude)
@@ -220,7 +243,9 @@ class Cli:
             help="inklude extra files before parsing main konfig",
         )
 
-    def kreate_app(self) -> App:
+    def kreate_app(self) -> "App":
+        from ._app import App
+
         args = vars(self.args).get("cli_args", [])
         konfig = self.kreate_konfig()
         konfig.set_path("system.cli_args", args)
@@ -228,12 +253,12 @@ class Cli:
         app.kreate_komponents()
         return app
 
-    def kreate_files(self) -> App:
+    def kreate_files(self) -> "App":
         app = self.kreate_app()
-        app.kreate_files()
+        app.kreate_files(komp_ids=vars(self.args).get("komp"))
         return app
 
-    def run_command(self, app: App, cmd_name: str, success_codes=None, **kwargs) -> str:
+    def run_command(self, app: "App", cmd_name: str, success_codes=None, **kwargs) -> str:
         cmd: str = app.konfig.get_path(f"system.command.{cmd_name}.script")
         if cmd is None:
             logger.error(f"Command could not be located: {cmd_name}")
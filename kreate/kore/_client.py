@@ -0,0 +1,98 @@
+"""
+a thin client, that lets a running `kreate serve` process handle a command
+
+The arguments, environment and current dir are sent to the server, together
+with the stdin, stdout and stderr file descriptors of the client, so the
+output of the command is written directly to the output of the client.
+Only the exit code is sent back.
+
+This module only uses the standard library, so it starts fast.
+"""
+
+import array
+import json
+import os
+import socket
+import struct
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+STDIO_FDS = (0, 1, 2)
+
+
+def socket_path() -> Path:
+    path = os.getenv("KREATE_SERVE_SOCKET")
+    if path:
+        return Path(path)
+    return Path.home() / ".cache/kreate/serve.sock"
+
+
+def use_server() -> bool:
+    return os.getenv("KREATE_SERVE_CLIENT", "False") == "True"
+
+
+def send_request(sock: socket.socket, request: dict, fds: List[int]) -> None:
+    data = json.dumps(request).encode()
+    ancillary = [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array("i", fds))]
+    sock.sendmsg([struct.pack(">I", len(data)) + data], ancillary)
+
+
+def receive_request(sock: socket.socket) -> tuple:
+    """the request and the received file descriptors"""
+    fds = array.array("i")
+    ancillary_size = socket.CMSG_SPACE(len(STDIO_FDS) * fds.itemsize)
+    data, ancdata, _, _ = sock.recvmsg(64 * 1024, ancillary_size)
+    for level, type, fd_data in ancdata:
+        if level == socket.SOL_SOCKET and type == socket.SCM_RIGHTS:
+            fds.frombytes(fd_data[: len(fd_data) - (len(fd_data) % fds.itemsize)])
+    if len(data) < 4:
+        raise ConnectionError("incomplete request")
+    size = struct.unpack(">I", data[:4])[0]
+    data = data[4:]
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("incomplete request")
+        data += chunk
+    return json.loads(data), list(fds)
+
+
+def valid_fds() -> List[int]:
+    """the stdio file descriptors that are open (e.g. stdin might be closed)"""
+    result = []
+    for fd in STDIO_FDS:
+        try:
+            os.fstat(fd)
+            result.append(fd)
+        except OSError:
+            pass
+    return result
+
+
+def forward_to_server(argv: List[str] = None) -> Optional[int]:
+    """
+    let the server run the command and return it's exit code,
+    or None if client mode is not enabled or no server is running
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if not use_server() or "serve" in argv or not hasattr(socket, "AF_UNIX"):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(socket_path()))
+    except OSError:
+        sock.close()
+        return None
+    with sock:
+        fds = valid_fds()
+        request = {"argv": argv, "env": dict(os.environ), "cwd": os.getcwd(), "fds": fds}
+        send_request(sock, request, fds)
+        data = b""
+        while len(data) < 4:
+            chunk = sock.recv(4 - len(data))
+            if not chunk:
+                print("kreate server stopped before the command was finished", file=sys.stderr)
+                return 1
+            data += chunk
+    return struct.unpack(">i", data)[0]
@@ -0,0 +1,104 @@
+"""
+the dependency graph of komponents
+
+Each komponent declares the ids of the komponents it depends on with
+aktivate_after(), e.g. a Patch depends on it's target, and a Kustomization
+on all resources and patches.  A komponent is only aktivated after all the
+komponents it depends on, so independent komponents can be aktivated at the
+same time, and a subset of komponents can be aktivated with their dependencies.
+The graph is keyed by the key() of each komponent, since the id of a komponent
+is not unique, e.g. when the same patch is used for two targets.
+"""
+
+import heapq
+from typing import Callable, Dict, Iterable, List, Set
+
+Graph = Dict[str, Set[str]]
+
+
+def dependencies_closure(graph: Graph, ids: Iterable[str]) -> Set[str]:
+    """the given ids, and all ids they (indirectly) depend on"""
+    result = set()
+    todo = list(ids)
+    while todo:
+        id = todo.pop()
+        if id in result:
+            continue
+        if id not in graph:
+            raise ValueError(f"unknown komponent {id}")
+        result.add(id)
+        todo.extend(graph[id])
+    return result
+
+
+def dependents_closure(graph: Graph, ids: Iterable[str]) -> Set[str]:
+    """the given ids, and all ids that (indirectly) depend on them"""
+    depending = dependents(graph)
+    result = set()
+    todo = list(ids)
+    while todo:
+        id = todo.pop()
+        if id not in result:
+            result.add(id)
+            todo.extend(depending.get(id, []))
+    return result
+
+
+def dependents(graph: Graph) -> Dict[str, List[str]]:
+    """the ids of the komponents that depend on each komponent"""
+    result = {id: [] for id in graph}
+    for id in sorted(graph):
+        for dep in graph[id]:
+            result[dep].append(id)
+    return result
+
+
+def check_cycles(graph: Graph, done: Set[str]) -> None:
+    if len(done) != len(graph):
+        ids = sorted(set(graph) - done)
+        raise ValueError(f"circular dependency between komponents {ids}")
+
+
+def topological_order(graph: Graph) -> List[str]:
+    """all ids, each after it's dependencies, otherwise sorted by id"""
+    waiting = {id: len(deps) for id, deps in graph.items()}
+    ready = [id for id, count in waiting.items() if count == 0]
+    heapq.heapify(ready)
+    depending = dependents(graph)
+    result = []
+    while ready:
+        id = heapq.heappop(ready)
+        result.append(id)
+        for other in depending[id]:
+            waiting[other] -= 1
+            if waiting[other] == 0:
+                heapq.heappush(ready, other)
+    check_cycles(graph, set(result))
+    return result
+
+
+def run_parallel(graph: Graph, submit: Callable, wait: Callable) -> None:
+    """
+    schedule all ids as soon as all their dependencies are done
+
+    submit(id) should start the work for an id, and wait() should block
+    until some work is done, and return the id of that work.
+    """
+    waiting = {id: len(deps) for id, deps in graph.items()}
+    depending = dependents(graph)
+    done = set()
+    running = 0
+    for id in sorted(graph):
+        if waiting[id] == 0:
+            submit(id)
+            running += 1
+    while running:
+        id = wait()
+        running -= 1
+        done.add(id)
+        for other in depending[id]:
+            waiting[other] -= 1
+            if waiting[other] == 0:
+                submit(other)
+                running += 1
+    check_cycles(graph, done)
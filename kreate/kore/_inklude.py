@@ -0,0 +1,89 @@
+import logging
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def split_inklude_params(location: str):
+    """split an inklude like 'file.konf a=1 b=2' in the location and the params"""
+    params = {}
+    if " " in location.strip():
+        location, remainder = location.split(None, 1)
+        for item in remainder.split():
+            if "=" not in item:
+                raise ValueError(
+                    f"inklude params should contain = in inklude:{location}"
+                )
+            k, v = item.split("=", 1)
+            params[k] = v
+    return location, params
+
+
+class InkludeNode:
+    def __init__(self, location, parent: "InkludeNode" = None):
+        self.location = location
+        self.parent = parent
+        self.children: List[InkludeNode] = []
+        self.inkluded: Optional[str] = None
+        self.params = {}
+        if parent:
+            parent.children.append(self)
+
+    def __repr__(self) -> str:
+        return f"InkludeNode({self.location})"
+
+    def to_dict(self) -> dict:
+        result = {"location": self.location}
+        if self.inkluded and self.inkluded != self.location:
+            result["inkluded"] = self.inkluded
+        if self.params:
+            result["params"] = dict(self.params)
+        if self.children:
+            result["inkludes"] = [child.to_dict() for child in self.children]
+        return result
+
+
+class InkludeGraph:
+    """
+    The graph of all inkluded files, with one node per inkluded location.
+
+    Each inklude entry in the konfig is only processed once, the first time
+    it appears. The parent of a node is the file that listed the inklude,
+    or None for the main konfig and the --inklude options.
+    """
+
+    def __init__(self):
+        self.root_nodes: List[InkludeNode] = []
+        self.nodes = {}
+        self.parents = {}
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    @staticmethod
+    def key(location):
+        return location if isinstance(location, str) else tuple(location)
+
+    def add_root(self, location) -> InkludeNode:
+        node = InkludeNode(location)
+        self.root_nodes.append(node)
+        return node
+
+    def new_node(self, location) -> Optional[InkludeNode]:
+        """return a new node, or None if this location was already seen"""
+        key = self.key(location)
+        if key in self.nodes:
+            return None
+        parent = self.parents.get(key)
+        node = InkludeNode(location, parent)
+        if not parent:
+            self.root_nodes.append(node)
+        self.nodes[key] = node
+        return node
+
+    def found_inkludes(self, node: InkludeNode, inkludes) -> None:
+        for location in inkludes or []:
+            self.parents.setdefault(self.key(location), node)
+
+    def to_list(self) -> list:
+        return [node.to_dict() for node in self.root_nodes]
@@ -1,23 +1,54 @@
 import base64
+import copy
+import hashlib
 import logging
 import os
 import re
 import traceback
 import warnings
+from collections import ChainMap, OrderedDict
 from collections.abc import Mapping
 from io import StringIO
 
 import jinja2
 from ruamel.yaml import YAML
 
+from ._repo import jinja_cache_dir
+from .overlay import OverlayMap, represent_overlay
+
 logger = logging.getLogger(__name__)
 
+# compiled template code is shared between all JinYaml instances in
+# this process, since all environments are created with the same settings,
+# the least recently used code is removed (e.g. in a long running server)
+_compiled_code = OrderedDict()
+COMPILED_CODE_SIZE = 512
+# parsed konfig files that can be shared between konfigs in one process (e.g. in batch mode),
+# None if not enabled, since a single konfig does not render the same text twice
+_parsed_yaml = None
+PARSED_YAML_SIZE = 512
+
+
+def share_parsed_yaml() -> None:
+    """remember parsed konfig files, to reuse them when another konfig renders the same text"""
+    global _parsed_yaml
+    if _parsed_yaml is None:
+        _parsed_yaml = OrderedDict()
+
 
 def error(msg: str):
     # TODO: is this best Exception?
     raise RuntimeError(msg)
 
 
+class KonfigContext(jinja2.runtime.Context):
+    def get_all(self) -> Mapping:
+        # used when including a template with context, the konfig is not copied (see render_jinja)
+        if not self.vars:
+            return self.parent
+        return ChainMap(self.vars, self.parent)
+
+
 class JinYaml:
     def __init__(self, konfig) -> None:
         self.konfig = konfig
@@ -26,18 +57,24 @@ class JinYaml:
             finalize=raise_error_if_none,
             trim_blocks=True,
             lstrip_blocks=True,
-            loader=RepoLoader(konfig),
+            loader=RepoLoader(self),
             extensions=["jinja2.ext.debug"],
+            bytecode_cache=bytecode_cache(),
         )
+        self.env.context_class = KonfigContext
+        self.templates = {}
+        self.used_env_vars = set()
         self.env.globals["konfig"] = konfig
         self.env.globals["jinja_extension"] = {
-            "getenv": os.getenv,
+            "getenv": self.getenv,
             "sorted": sorted,
             "error": error,
             "warning": warnings.warn,
             "logger": logger,
         }
         self.yaml_parser = YAML()
+        self.yaml_parser.representer.add_representer(OverlayMap, represent_overlay)
+        self.yaml_parsers = {"rt": self.yaml_parser}
         self.add_jinja_filter("b64encode", b64encode)
         self.add_jinja_filter("handle_empty_str", handle_empty_str)
         self.add_jinja_filter("yaml", self.yaml_filter)
@@ -55,17 +92,67 @@ class JinYaml:
             start = "\n" + indent
         return start + start.join(out.getvalue().splitlines())
 
+    def getenv(self, name: str, default=None):
+        self.used_env_vars.add(name)
+        return os.getenv(name, default)
+
+    def parser(self, engine: str = None) -> YAML:
+        # rt (round-trip) keeps comments and formatting, safe is faster and
+        # results in plain dicts (using the C loader if ruamel.yaml.clib is installed)
+        engine = engine or "rt"
+        if engine not in self.yaml_parsers:
+            if engine != "safe":
+                raise ValueError(f"unknown yaml_engine {engine}, use rt or safe")
+            self.yaml_parsers[engine] = YAML(typ="safe")
+        return self.yaml_parsers[engine]
+
     def add_jinja_filter(self, name, func):
         self.env.filters[name] = func
 
+    def compile(self, filename: str, data: str):
+        key = (filename, hashlib.sha256(data.encode()).hexdigest())
+        code = _compiled_code.get(key)
+        if code is not None:
+            _compiled_code.move_to_end(key)
+        else:
+            bcc = self.env.bytecode_cache
+            if bcc is not None:
+                bucket = bcc.get_bucket(self.env, filename, filename, data)
+                code = bucket.code
+            if code is None:
+                logger.debug(f"compiling template {filename}")
+                code = self.env.compile(data, filename, filename)
+                if bcc is not None:
+                    bucket.code = code
+                    bcc.set_bucket(bucket)
+            _compiled_code[key] = code
+            if len(_compiled_code) > COMPILED_CODE_SIZE:
+                _compiled_code.popitem(last=False)
+        return key, code
+
+    def get_template(self, filename: str, data: str) -> jinja2.Template:
+        key, code = self.compile(filename, data)
+        if tmpl := self.templates.get(key):
+            return tmpl
+        tmpl = self.env.template_class.from_code(
+            self.env, code, self.env.make_globals(None)
+        )
+        self.templates[key] = tmpl
+        return tmpl
+
     def render_jinja(self, filename: str, vars: Mapping) -> str:
         try:
             data = self.konfig.load_repo_file(filename)
             if data is None:
                 logger.debug(f"did not find {filename}")
                 return None
-            tmpl = self.env.from_string(data)  # self.env.get_template(filename)
-            result = tmpl.render(vars)
+            tmpl = self.get_template(filename, data)
+            # as tmpl.render(vars), but without copying all vars (e.g. the whole konfig)
+            context = tmpl.new_context(ChainMap(vars, tmpl.globals), shared=True)
+            try:
+                result = tmpl.environment.concat(tmpl.root_render_func(context))
+            except Exception:
+                tmpl.environment.handle_exception()
             # TODO: Somehow the trailing newline sometimes disappears, this can be a problem
             # so this is an ugly hack
             if not result.endswith("\n"):
@@ -86,15 +173,42 @@ class JinYaml:
                 logger.error(f"Error when rendering {filename}, {e}")
             raise
 
-    def render_yaml(self, fname: str, vars: Mapping) -> Mapping:
-        self.konfig.tracer.push(f"rendering jinja: {fname}")
-        text = self.render_jinja(fname, vars)
-        self.konfig.tracer.pop()
+    def render_yaml(
+        self, fname: str, vars: Mapping, engine: str = None, shared: bool = False
+    ) -> Mapping:
+        shared = shared and _parsed_yaml is not None
+        dekrypted = self.konfig.dekrypted
+        if shared:
+            self.konfig.dekrypted = False
+        try:
+            self.konfig.tracer.push(f"rendering jinja: {fname}")
+            text = self.render_jinja(fname, vars)
+            self.konfig.tracer.pop()
+            # text with dekrypted secrets should not be remembered
+            shared = shared and not self.konfig.dekrypted
+        finally:
+            self.konfig.dekrypted = self.konfig.dekrypted or dekrypted
         if text is None:
             return None
+        if shared:
+            return self.load_shared_yaml(fname, text, engine)
+        self.konfig.tracer.push(f"parsing yaml: {fname}\n" + text)
+        result = self.parser(engine).load(text)
+        self.konfig.tracer.pop()
+        return result
+
+    def load_shared_yaml(self, fname: str, text: str, engine: str = None) -> Mapping:
+        # a copy is much faster than parsing, and every konfig can change its own copy
+        key = (engine, hashlib.sha256(text.encode()).hexdigest())
+        if key in _parsed_yaml:
+            _parsed_yaml.move_to_end(key)
+            return copy.deepcopy(_parsed_yaml[key])
         self.konfig.tracer.push(f"parsing yaml: {fname}\n" + text)
-        result = self.yaml_parser.load(text)
+        result = self.parser(engine).load(text)
         self.konfig.tracer.pop()
+        _parsed_yaml[key] = copy.deepcopy(result)
+        if len(_parsed_yaml) > PARSED_YAML_SIZE:
+            _parsed_yaml.popitem(last=False)
         return result
 
     def render_multi_yaml(self, fname: str, vars: Mapping) -> Mapping:
@@ -149,9 +263,18 @@ def handle_empty_str(value: str) -> str:
     return value
 
 
+def bytecode_cache():
+    if os.getenv("KREATE_JINJA_BYTECODE_CACHE", "False") != "True":
+        return None
+    dir = jinja_cache_dir()
+    dir.mkdir(parents=True, exist_ok=True)
+    return jinja2.FileSystemBytecodeCache(str(dir))
+
+
 class RepoLoader(jinja2.BaseLoader):
-    def __init__(self, konfig):
-        self.konfig = konfig
+    def __init__(self, jinyaml: JinYaml):
+        self.jinyaml = jinyaml
+        self.konfig = jinyaml.konfig
 
     def get_source(self, environment, filename):
         data = self.konfig.load_repo_file(filename)
@@ -160,3 +283,11 @@ class RepoLoader(jinja2.BaseLoader):
         if isinstance(data, bytes):
             data = data.decode()
         return data, filename, lambda: True
+
+    def load(self, environment, name, globals=None):
+        # use the shared compiled code, instead of compiling per environment
+        source, filename, uptodate = self.get_source(environment, name)
+        _, code = self.jinyaml.compile(filename, source)
+        return environment.template_class.from_code(
+            environment, code, globals or {}, uptodate
+        )
@@ -1,16 +1,16 @@
 import logging
-import os
+import io
 import re
+from collections import ChainMap
 from collections.abc import Mapping
 from typing import Any, TYPE_CHECKING, Sequence
-import jinja2
 
 from ._core import wrap, DictWrapper
-from ._konfig import Konfig
 from ._kontext import check_requires
 
 if TYPE_CHECKING:
     from ._app import App
+    from ._konfig import Konfig
 
 logger = logging.getLogger(__name__)
 
@@ -50,6 +50,7 @@ class Komponent:
         self.shortname = shortname or "main"
         self.id = f"{klass.name}.{shortname}"
         self.strukture = wrap(self._find_strukture())
+        self.field_index = FieldIndex(self)
         self.field = Field(self)
         name = (
                 self.strukture.get("name", None)
@@ -95,6 +96,37 @@ class Komponent:
         # Abstract Method, sub-classes may implement this method
         pass
 
+    def key(self) -> str:
+        # unique for each komponent in an app, unlike the id, since
+        # e.g. the same patch can be used for more than one target
+        return self.id
+
+    def aktivate_after(self) -> Sequence[str]:
+        # ids of komponents that should be aktivated before this komponent,
+        # e.g. it's target or all komponents of a kind that it enumerates
+        return []
+
+    def aktivated_state(self):
+        # The result of aktivate, that can be passed from a worker process
+        return None
+
+    def set_aktivated_state(self, state) -> None:
+        pass
+
+    def render_aktivate(self) -> bool:
+        # if the komponent should be aktivated for the render command,
+        # otherwise it's documents can be rendered without aktivating it
+        return True
+
+    def render_after(self) -> Sequence[str]:
+        # keys of komponents that change the rendered documents of this
+        # komponent, e.g. it's patches, and are aktivated before rendering it
+        return []
+
+    def render_documents(self) -> Sequence:
+        # the documents that are output by the render command
+        return []
+
     def __str__(self) -> str:
         return f"<{self.__class__.__name__} {self.id} {self.name}>"
 
@@ -119,12 +151,8 @@ class Komponent:
         filename = self.get_filename()
         if filename:
             path = self.app.target_path / filename
-            if self.is_secret():
-                self.app.kontext.add_cleanup_path(path)
-            os.makedirs(path.parent, exist_ok=True)
             text = self.kreate_file_data()
-            with open(path, "w") as f:
-                f.write(text)
+            self.app.write_file(path, text, secret=self.is_secret())
 
     def kreate_file_data(self) -> str:
         raise NotImplementedError(f"no kreate_file_data for {type(self)}")
@@ -169,36 +197,94 @@ class Komponent:
             return self.strukture.get("target_filename")
         return f"{self.klass.name}-{self.shortname}.yaml".lower()
 
-    def _field(self, fieldname: str, default=None):
-        if fieldname in self.strukture:
-            return self.strukture[fieldname]
-        if result := self.strukture.get_path(f"field.{fieldname}"):
-            return result
+    def field_layers(self) -> list:
+        """the (source, container, mode) layers to lookup fields, in order of precedence"""
         konf = self.app.konfig
-        result = konf.get_path(f"val.{self.id}.{fieldname}")  # deprecated in 2.0.0
-        if result is None:
-            result = konf.get_path(f"val.field.{self.id}.{fieldname}")
-        if result is None:
-            result = konf.get_path(
-                f"val.{self.klass.name}.{fieldname}"
-            )  # deprecated in 2.0.0
-        if result is None:
-            result = konf.get_path(f"val.field.{self.klass.name}.{fieldname}")
-        if result is None:
-            result = konf.get_path(f"val.generic.{fieldname}")  # deprecated in 2.0.0
-        if result is None:
-            result = konf.get_path(f"val.field.generic.{fieldname}")
-        if result is not None:
+        strukt = self.strukture.data
+        return [
+            (f"strukt.{self.id}", strukt, FieldIndex.PRESENT),
+            (f"strukt.{self.id}.field", strukt.get("field"), FieldIndex.TRUTHY),
+            # the val.<id>, val.<klass> and val.generic paths are deprecated in 2.0.0
+            (f"val.{self.id}", konf.get_path(f"val.{self.id}"), FieldIndex.NOT_NONE),
+            (f"val.field.{self.id}", konf.get_path(f"val.field.{self.id}"), FieldIndex.NOT_NONE),
+            (f"val.{self.klass.name}", konf.get_path(f"val.{self.klass.name}"), FieldIndex.NOT_NONE),
+            (f"val.field.{self.klass.name}", konf.get_path(f"val.field.{self.klass.name}"), FieldIndex.NOT_NONE),
+            ("val.generic", konf.get_path("val.generic"), FieldIndex.NOT_NONE),
+            ("val.field.generic", konf.get_path("val.field.generic"), FieldIndex.NOT_NONE),
+        ]
+
+    def _field(self, fieldname: str, default=None):
+        result, source = self.field_index.lookup(fieldname)
+        if source is not None:
             return result
         if default is not None:
             return default
+        import jinja2
+
         raise jinja2.exceptions.UndefinedError(f"Unknown field {fieldname} in {self}")
 
     def _contains_field(self, key) -> bool:
-        marker = object()
-        if self._field(key, marker) is marker:
-            return False
-        return True
+        return self.field_index.lookup(key)[1] is not None
+
+
+class FieldIndex:
+    """
+    The layers of konfig where the fields of a komponent are found.
+
+    The layers are resolved once, on the first lookup (when all komponents
+    are known), and the result of each field lookup is memoized.
+    """
+
+    PRESENT = "present"  # the field is found if the key exists, even if None
+    TRUTHY = "truthy"  # the field is only found if it has a truthy value
+    NOT_NONE = "not_none"  # the field is found if it is not None
+
+    def __init__(self, komp: Komponent) -> None:
+        self._komp = komp
+        self._layers = None
+        self._cache = {}
+
+    def layers(self) -> list:
+        if self._layers is None:
+            self._layers = self._komp.field_layers()
+        return self._layers
+
+    def reset(self) -> None:
+        self._layers = None
+        self._cache = {}
+
+    @staticmethod
+    def _get(container, fieldname: str, mode: str):
+        if not isinstance(container, Mapping):
+            return None, False
+        if mode == FieldIndex.PRESENT:
+            if fieldname in container:
+                return container[fieldname], True
+            return None, False
+        value = DictWrapper(container).get_path(fieldname)
+        if mode == FieldIndex.TRUTHY:
+            return value, bool(value)
+        return value, value is not None
+
+    def lookup(self, fieldname: str):
+        """return the value and the source of a field, or (None, None) if not found"""
+        if fieldname not in self._cache:
+            result = (None, None)
+            for source, container, mode in self.layers():
+                value, found = self._get(container, fieldname, mode)
+                if found:
+                    result = (value, source)
+                    break
+            self._cache[fieldname] = result
+        return self._cache[fieldname]
+
+    def explain(self, fieldname: str) -> list:
+        """return the (source, value, found) of a field for all layers"""
+        result = []
+        for source, container, mode in self.layers():
+            value, found = self._get(container, fieldname, mode)
+            result.append((source, value, found))
+        return result
 
 
 class Field:
@@ -240,7 +326,7 @@ class JinjaKomponent(Komponent):
         self._template_text = None
 
     # caching template content
-    def template_text(self, konfig: Konfig):
+    def template_text(self, konfig: "Konfig"):
         if not self._template_text:
             tmpl = self.get_template_location()
             self._template_text = konfig.load_repo_file(tmpl)
@@ -256,16 +342,21 @@ class JinjaKomponent(Komponent):
             raise KeyError(f"no template defined for {self.id} in {self.klass.info}")
         self.data = self.app.konfig.jinyaml.render_jinja(template, komponent_vars)
 
+    def aktivated_state(self):
+        return self.data
+
+    def set_aktivated_state(self, state) -> None:
+        self.data = state
+
     def get_template_location(self) -> str:
         return self.klass.info.get("template")
 
     def kreate_file_data(self) -> None:
         return self.data
 
-    def _template_vars(self):
-        result = dict(self.app.konfig.yaml)
-        result["my"] = self
-        return result
+    def _template_vars(self) -> ChainMap:
+        # the konfig is not copied, so only the keys a template uses are read (and recorded)
+        return ChainMap({"my": self}, self.app.konfig.yaml)
 
 
 class JinjaFile(JinjaKomponent):
@@ -289,17 +380,26 @@ class MultiJinYamlKomponent(JinjaKomponent):
             template, template_vars
         )
 
+    def aktivated_state(self):
+        self.documents = list(self.documents)
+        return self.documents
+
+    def set_aktivated_state(self, state) -> None:
+        self.documents = state
+
+    def render_documents(self) -> Sequence:
+        return list(self.documents)
+
     def kreate_file(self) -> None:
         filename = self.get_filename()
         if filename:
             path = self.app.target_path / filename
-            if self.is_secret():
-                self.app.kontext.add_cleanup_path(path)
-            os.makedirs(path.parent, exist_ok=True)
-            with open(path, "w") as f:
-                for doc in self.documents:
-                    f.write("---\n")
-                    self.app.konfig.jinyaml.dump(doc, f)
+            # render in memory, so unchanged files need not be written
+            f = io.StringIO()
+            for doc in self.documents:
+                f.write("---\n")
+                self.app.konfig.jinyaml.dump(doc, f)
+            self.app.write_file(path, f.getvalue(), secret=self.is_secret())
 
 
 class JinYamlKomponent(JinjaKomponent):
@@ -310,11 +410,23 @@ class JinYamlKomponent(JinjaKomponent):
     def aktivate(self):
         template_vars = self._template_vars()
         template = self.get_template_location()
-        self.yaml = wrap(self.app.konfig.jinyaml.render_yaml(template, template_vars))
+        engine = self.klass.info.get("yaml_engine")
+        self.yaml = wrap(
+            self.app.konfig.jinyaml.render_yaml(template, template_vars, engine=engine)
+        )
         self.invoke_options()
         self.add_additions()
         self.remove_deletions()
 
+    def aktivated_state(self):
+        return self.yaml.data
+
+    def set_aktivated_state(self, state) -> None:
+        self.yaml = wrap(state)
+
+    def render_documents(self) -> Sequence:
+        return [self.yaml.data]
+
     def get_path(self, path: str, default=None):
         return self.yaml.get_path(path, default=default)
 
@@ -325,11 +437,9 @@ class JinYamlKomponent(JinjaKomponent):
         filename = self.get_filename()
         if filename:
             path = self.app.target_path / filename
-            if self.is_secret():
-                self.app.kontext.add_cleanup_path(path)
-            os.makedirs(path.parent, exist_ok=True)
-            with open(path, "w") as f:
-                self.app.konfig.jinyaml.dump(self.yaml.data, f)
+            f = io.StringIO()
+            self.app.konfig.jinyaml.dump(self.yaml.data, f)
+            self.app.write_file(path, f.getvalue(), secret=self.is_secret())
 
     def add_additions(self):
         additions = self.strukture.get("add", {})
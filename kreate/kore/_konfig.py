@@ -1,4 +1,6 @@
 import logging
+from collections import ChainMap
+from collections.abc import Mapping
 from pathlib import Path
 from typing import List, Sequence
 
@@ -6,7 +8,9 @@ from ._kontext import Kontext, get_package_version, check_requires
 from ._core import deep_update, wrap
 from ._repo import FileGetter
 from .trace import Trace
-from ._jinyaml import JinYaml
+from ._inklude import InkludeGraph, InkludeNode, split_inklude_params
+from ._snapshot import KonfigSnapshot, use_snapshots
+from .overlay import OverlayMap
 
 logger = logging.getLogger(__name__)
 
@@ -24,13 +28,21 @@ class Konfig:
         self.tracer = self.kontext.tracer or Trace()
         logger.info(f"using main konfig from {main_konfig_path}")
         self.dekrypt_func = None
-        self.dict_ = dict_ or {}
+        # every inkluded file is added as a layer, instead of being merged
+        self.dict_ = OverlayMap()
+        self.dict_.update(dict_ or {})
         self.yaml = wrap(self.dict_)
+        from ._jinyaml import JinYaml  # imports jinja2 and ruamel.yaml
+
         self.jinyaml = JinYaml(self)
         self.file_getter = FileGetter(self, main_konfig_path.parent)
+        self.dekrypted = False
         for mod in self.kontext.modules:
             mod.init_konfig(self)
-        self.already_inkluded = set()
+        self.inklude_graph = InkludeGraph()
+        # the repos are only konfigured again when an inkluded file has system.repo
+        self.repos_changed = True
+        self.snapshot = KonfigSnapshot(self, inkludes) if use_snapshots() else None
         deep_update(
             self.dict_,
             {
@@ -41,10 +53,14 @@ class Konfig:
             },
         )
         logger.debug(self.file_getter)
-        for ink in inkludes or []:
-            self.inklude(ink)
-        self.inklude(self.main_konfig_path.name)
-        self.load_new_inkludes()
+        if not (self.snapshot and self.snapshot.load()):
+            for ink in inkludes or []:
+                self.inklude(ink)
+            self.inklude(self.main_konfig_path.name)
+            self.load_new_inkludes()
+            if self.snapshot:
+                self.snapshot.save()
+        self.snapshot = None
         check_requires(self.get_path("system.requires",{}), msg="system.requires: ")
 
     def __getitem__(self, key: str):
@@ -56,16 +72,15 @@ class Konfig:
     def set_path(self, path: str, value):
         return self.yaml.set_path(path, value)
 
-    def _jinja_context(self):
-        result = {}
-        for k in self.yaml.keys():
-            v = self.yaml[k]
-            result[k] = v
-        return result
+    def _jinja_context(self) -> ChainMap:
+        # the konfig is not copied for every inkluded file, a template only reads the keys it uses
+        return ChainMap({}, self.yaml)
 
     def load_repo_file(self, fname: str) -> str:
         self.tracer.push(f"loading repo file: {fname}")
         result = self.file_getter.get_data(fname)
+        if self.snapshot:
+            self.snapshot.record_file(fname, result)
         self.tracer.pop()
         return result
 
@@ -86,39 +101,41 @@ class Konfig:
     def load_inkludes(self, inkludes: List[str]) -> int:
         count = 0
         for idx, fname in enumerate(inkludes):
-            fname_hash = tuple(fname)
-            if fname_hash not in self.already_inkluded:
+            node = self.inklude_graph.new_node(fname)
+            if node:
                 count += 1
-                self.already_inkluded.add(fname_hash)
-                self.inklude(fname, idx + 1)
+                self.inklude(fname, idx + 1, node=node)
         logger.debug(f"inkluded {count} new files")
         return count
 
-    def inklude_one_file(self, location: str, idx: int = None):
-        # reload all repositories, in case any were added/changed
+    def inklude_one_file(
+        self, location: str, idx: int = None, node: InkludeNode = None
+    ):
         self.tracer.push(f"inkluding {location}")
-        self.file_getter.konfig_repos()
+        if self.repos_changed:
+            # reload the repositories that were added/changed
+            self.file_getter.konfig_repos()
+            self.repos_changed = False
         context = self._jinja_context()
         context["my_repo_name"] = self.file_getter.get_prefix(location)
-        context["args"] = {}
-        if " " in location.strip():
-            location, remainder = location.split(None, 1)
-            for item in remainder.split():
-                if "=" not in item:
-                    raise ValueError(
-                        "inklude params should contain = in inklude:{fname}"
-                    )
-                k, v = item.split("=", 1)
-                context["args"][k] = v
+        location, context["args"] = split_inklude_params(location)
         # new name inklude_args is more specific. args will be removed in version 2.0
         context["inklude_args"] = context["args"]
-        val_yaml = self.jinyaml.render_yaml(location, context)
+        engine = self.get_path("system.yaml_engine")
+        val_yaml = self.jinyaml.render_yaml(location, context, engine=engine, shared=True)
         if val_yaml:  # it can be empty
-            deep_update(self.yaml, val_yaml, list_insert_index={"inklude": idx})
+            self.dict_.add_layer(val_yaml, list_insert_index={"inklude": idx})
+            system = val_yaml.get("system")
+            if isinstance(system, Mapping) and "repo" in system:
+                self.repos_changed = True
+            if node:
+                node.inkluded = location
+                node.params = context["args"]
+                self.inklude_graph.found_inkludes(node, val_yaml.get("inklude"))
         self.tracer.pop()
         return val_yaml
 
-    def inklude(self, location: str, idx: int = None):
+    def inklude(self, location: str, idx: int = None, node: InkludeNode = None):
         if isinstance(location, str):
             locations = [loc.strip() for loc in location.split("|")]
         elif isinstance(location, Sequence):
@@ -129,8 +146,9 @@ class Konfig:
             )
         if len(locations) > 1:
             logger.verbose(f"trying multiple locations {locations}")
+        node = node or self.inklude_graph.add_root(location)
         for loc in locations:
-            result = self.inklude_one_file(loc.strip(), idx=idx)
+            result = self.inklude_one_file(loc.strip(), idx=idx, node=node)
             if result:
                 logger.verbose(f"inkluded  {loc}")
                 break
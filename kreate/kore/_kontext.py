@@ -1,13 +1,9 @@
-import subprocess
 import sys
 import logging
 import warnings
-import importlib.metadata
 
 from pathlib import Path
 from typing import Mapping, List, Set, TYPE_CHECKING, Sequence
-from packaging.specifiers import SpecifierSet
-from packaging.version import Version
 
 from . import dotenv
 from .trace import Trace
@@ -15,6 +11,8 @@ from .trace import Trace
 if TYPE_CHECKING:  # Only imports the below statements during type checking
     from kreate.kore._app import App
     from kreate.kore._konfig import Konfig
+    import subprocess
+
     from kreate.kore._cli import Cli
 
 logging.VERBOSE = 15
@@ -27,6 +25,9 @@ logging.verbose = lambda msg, *args, **kwargs: logging.log(
 )
 logger = logging.getLogger(__name__)
 
+# subcommands that do not use any environment var, so no .env file is loaded
+NO_DOTENV_SUBCOMMANDS = {"version", "vr"}
+
 
 def load_class(name):
     components = name.split(".")
@@ -52,7 +53,9 @@ class Kontext:
         module.init_kontext(self)
         self.modules.append(module)
 
-    def run_shell(self, cmd: str, success_codes=None) -> subprocess.CompletedProcess:
+    def run_shell(self, cmd: str, success_codes=None) -> "subprocess.CompletedProcess":
+        import subprocess  # only needed by commands that run a shell
+
         self.tracer.push_info(f"running command {cmd}")
         success_codes = success_codes or (0,)
         result = subprocess.run(
@@ -88,6 +91,10 @@ class Kontext:
                 load_dot_env = False
             if arg == "--no-kreate-env":
                 load_kreate_env = False
+        # the first param is the subcommand (or the value of an option, which is very unlikely)
+        params = [arg for arg in sys.argv[1:] if not arg.startswith("-")]
+        if params and params[0] in NO_DOTENV_SUBCOMMANDS:
+            return
         try:
             if load_dot_env:
                 dotenv.load_env(Path.cwd() / ".env")
@@ -120,13 +127,38 @@ class Module:
         ...
 
 
+def _installed_version(package: str) -> str:
+    """the version in the metadata of an installed package, or None if not found"""
+    name = package.replace("-", "_").replace(".", "_").lower()
+    for path in sys.path:
+        for info in Path(path or ".").glob(f"{name}-*.dist-info/METADATA"):
+            with open(info) as file:
+                for line in file:
+                    if line.startswith("Version:"):
+                        return line.split(":", 1)[1].strip()
+                    if not line.strip():
+                        break
+    return None
+
+
 def get_package_version(package: str) -> str:
+    # importing importlib.metadata takes longer than most commands that need a version
+    version = _installed_version(package)
+    if version:
+        return version
+    import importlib.metadata
+
     try:
         return importlib.metadata.version(package)
     except importlib.metadata.PackageNotFoundError:
         return "Unknown"
 
 def check_requires(specifiers: Mapping, force: bool = False, msg: str = ""):
+    if not specifiers:
+        return
+    from packaging.specifiers import SpecifierSet
+    from packaging.version import Version
+
     dev_versions = ["Unknown"]  #  , "rc", "editable"]
     for package, specifier in specifiers.items():
         version = get_package_version(package)
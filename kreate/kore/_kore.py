@@ -1,18 +1,20 @@
-import importlib.metadata
-import inspect
 import logging
 import os
 import re
+import sys
+import time
 import warnings
 from collections.abc import MutableMapping
+from typing import TYPE_CHECKING
 
-from . import _jinyaml, Komponent, Konfig
-from ._app import App
 from ._cli import Cli
 from ._core import pprint_map, pprint_tuple, print_filtered
-from ._kontext import Module, VersionWarning, load_class
-from ._repo import clear_cache
+from ._kontext import Module, VersionWarning, get_package_version, load_class
+from . import _repocache
 
+if TYPE_CHECKING:  # Only imports the below statements during type checking
+    from ._app import App
+    from ._komp import Komponent
 
 FORMAT = "%(message)s"
 logger = logging.getLogger(__name__)
@@ -40,6 +42,12 @@ class KoreModule(Module):
         cli.add_subcommand(view, aliases=["v"])
         cli.add_subcommand(command, aliases=["cmd"])
         cli.add_subcommand(shell, aliases=["sh"])
+        cli.add_subcommand(repo, aliases=["rp"])
+        cli.add_subcommand(cache, aliases=["ca"])
+        cli.add_subcommand(batch, aliases=["ba"])
+        cli.add_subcommand(watch, aliases=["wa"])
+        cli.add_subcommand(serve, aliases=["se"])
+        cli.add_subcommand(render, aliases=["r"])
 
     def add_kore_options(self, cli: Cli):
         self.add_output_options(cli)
@@ -86,12 +94,54 @@ class KoreModule(Module):
             default=[],
             help="inklude extra files before parsing main konfig",
         )
+        cli.parser.add_argument(
+            "-j",
+            "--jobs",
+            metavar="N",
+            action="store",
+            type=int,
+            default=None,
+            help="aktivate komponents in N parallel processes (sets system.jobs)",
+        )
+        cli.parser.add_argument(
+            "--yaml-engine",
+            metavar="engine",
+            action="store",
+            choices=["rt", "safe"],
+            default=None,
+            help="yaml engine to parse konfig files (sets system.yaml_engine)",
+        )
+        cli.parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="only write changed files to the target dir (sets system.incremental)",
+        )
+        cli.parser.add_argument(
+            "--komp",
+            metavar="id",
+            action="append",
+            default=[],
+            help="only kreate komponent id, and the komponents it depends on",
+        )
+        cli.add_subcommand_argument(
+            "batch",
+            "--env",
+            metavar="env",
+            action="append",
+            default=[],
+            help="only kreate konfigs for env",
+        )
         cli.parser.add_argument(
             "-l",
             "--local-repo",
             action="store_true",
             help="use local repo's (force KREATE_REPO_USE_LOCAL_DIR=True)",
         )
+        cli.parser.add_argument(
+            "--offline",
+            action="store_true",
+            help="never download repo's, only use the cache or mirror (force KREATE_REPO_OFFLINE=True)",
+        )
 
     def add_output_options(self, cli: Cli):
         cli.parser.add_argument(
@@ -110,6 +160,22 @@ class KoreModule(Module):
             action="store_true",
             help="do not output any info, just essential output",
         )
+        cli.parser.add_argument(
+            "-o",
+            "--output",
+            metavar="file",
+            action="store",
+            default=None,
+            help="file to write the render output to (default=- for stdout)",
+        )
+        cli.parser.add_argument(
+            "--output-format",
+            metavar="format",
+            action="store",
+            choices=["yaml", "json"],
+            default="yaml",
+            help="format of the render output: yaml or json (one document per line)",
+        )
         cli.parser.add_argument(
             "-W",
             "--warn-filter",
@@ -122,6 +188,14 @@ class KoreModule(Module):
     def process_kore_options(self, args):
         if args.local_repo:
             os.environ["KREATE_REPO_USE_LOCAL_DIR"] = "True"
+        if args.offline:
+            os.environ["KREATE_REPO_OFFLINE"] = "True"
+        if args.jobs:
+            args.define.append(f"system.jobs={args.jobs}")
+        if args.yaml_engine:
+            args.define.append(f"system.yaml_engine={args.yaml_engine}")
+        if args.incremental:
+            args.define.append("system.incremental=True")
         if args.quiet:
             warnings.filterwarnings("ignore")
             # logging.basicConfig(format="%(message)s", level=logging.ERROR)
@@ -130,7 +204,7 @@ class KoreModule(Module):
             logging.basicConfig(level=5)
         elif args.verbose == 2:
             logging.basicConfig(level=logging.DEBUG)
-            _jinyaml.logger.setLevel(logging.INFO)
+            logging.getLogger("kreate.kore._jinyaml").setLevel(logging.INFO)
         elif args.verbose == 1:
             logging.basicConfig(format=FORMAT, level=logging.VERBOSE)
         else:
@@ -158,12 +232,14 @@ class KoreModule(Module):
         warnings.filterwarnings(action, message, category, module, lineno)
 
 
-def clear_repo_cache(cli: Cli):
+def clear_cache(cli: Cli):
     """clear the repo cache"""
-    clear_cache()
+    from . import _repo
+
+    _repo.clear_cache()
 
 
-def view_template(cli: Cli, app: App, klass_name: str):
+def view_template(cli: Cli, app: "App", klass_name: str):
     if klass_name not in app.klasses:
         logger.warning(f"Unknown klass {klass_name}")
         return
@@ -180,6 +256,8 @@ def view_template(cli: Cli, app: App, klass_name: str):
         print(f"{klass_name} " f"{klass.python_class.__name__}: " f"{klass.info}")
         print("==========================")
         if klass.python_class.__doc__:
+            import inspect  # only needed to view a klass
+
             print(inspect.cleandoc(klass.python_class.__doc__))
         if template_loc:
             print("==========================")
@@ -208,6 +286,8 @@ def view_templates(cli: Cli, templates):
     # we call the kreate_app method and not the convenience app()
     # method, because aktivating the app, will do stuff that might break
     # template = cli.args.template
+    from ._app import App
+
     app = App(cli.kreate_konfig())
     if templates:
         for t in templates:
@@ -230,6 +310,7 @@ def view_aliases():
         "wf": "warningfilters",
         "tmpl": "template",
         "ink": "inklude",
+        "ig": "inkludegraph",
         "p": "paths",
         "path": "paths",
         "y": "yaml",
@@ -248,7 +329,7 @@ def view_aliases():
 
 
 def view(cli: Cli):
-    """view the entire konfig or subkey(s); possible other subcommand arguments: [template, warningfilters, alias]"""
+    """view the entire konfig or subkey(s); possible other subcommand arguments: [template, warningfilters, alias, inkludegraph]"""
     print_full_config = True
     yaml_mode = True
     if cli.params:
@@ -285,6 +366,11 @@ def view(cli: Cli):
                 # View Warning Filter
                 view_warning_filters()
 
+            elif param == "inkludegraph":
+                # View the tree of inkluded files
+                konfig = cli.kreate_konfig()
+                konfig.jinyaml.dump(konfig.inklude_graph.to_list(), sys.stdout)
+
             elif param == "alias":
                 # View Alassses
                 for alias, full in view_aliases().items():
@@ -341,7 +427,7 @@ def view_komponents(cli: Cli):
 
 def view_komponent(cli: Cli, komp_id: str):
     app = cli.kreate_app()
-    if komp := app.komponents_by_id.get(komp_id) is None:
+    if (komp := app.komponents_by_id.get(komp_id)) is None:
         found = []
         for id in sorted(app.komponents_by_id.keys()):
             if id.lower().startswith(komp_id.lower()):
@@ -370,51 +456,30 @@ def view_komponent(cli: Cli, komp_id: str):
         for field in sorted(set(fields)):
             print(f"  {field}: " + str(komp._field(field, "**not-set**")))
             if cli.args.verbose > 0:
-                found = False
-                found = _pfp(app.konfig, f"strukt.{komp.id}.{field}", found)
-                found = _pfp(app.konfig, f"strukt.field.{komp.id}.{field}", found)
-                found = _pfp(app.konfig, f"val.{komp.id}.{field}", found)
-                found = _pfp(app.konfig, f"val.field.{komp.id}.{field}", found)
-                found = _pfp(app.konfig, f"val.{komp.klass.name}.{field}", found)
-                found = _pfp(app.konfig, f"val.field.{komp.klass.name}.{field}", found)
-                found = _pfp(app.konfig, f"val.generic.{field}", found)
-                found = _pfp(app.konfig, f"val.field.generic.{field}", found)
+                _print_field_sources(komp, field)
         fields = re.findall("{{ *my.optional\(['\"]([a-zA-Z_0-9]*)['\"]\)", tmpl_text)
         print("=== Optionals ===")
         for field in sorted(set(fields)):
             print(f"  {field}: " + str(komp._field(field, "**not-set**")))
             if cli.args.verbose > 0:
-                found = False
-                found = _pfp(app.konfig, f"strukt.{komp.id}.{field}", found)
-                found = _pfp(app.konfig, f"strukt.field.{komp.id}.{field}", found)
-                found = _pfp(app.konfig, f"val.{komp.id}.{field}", found)
-                found = _pfp(app.konfig, f"val.field.{komp.id}.{field}", found)
-                found = _pfp(app.konfig, f"val.{komp.klass.name}.{field}", found)
-                found = _pfp(app.konfig, f"val.field.{komp.klass.name}.{field}", found)
-                found = _pfp(app.konfig, f"val.generic.{field}", found)
-                found = _pfp(app.konfig, f"val.field.generic.{field}", found)
-
-
-def _pfp(konfig: Konfig, path: str, found: bool) -> bool:
-    result = konfig.get_path(path)
-    if result is None and not found:
-        print(f"    . {path}: -")
-    elif not found:
-        print(f"    * {path}: {result}")
-        found = True
-    else:
-        print(f"      {path}: {result}")
-    return found
+                _print_field_sources(komp, field)
+
+
+def _print_field_sources(komp: "Komponent", field: str) -> None:
+    used_source = komp.field_index.lookup(field)[1]
+    for source, value, found in komp.field_index.explain(field):
+        if source == used_source:
+            print(f"    * {source}.{field}: {value}")
+        elif found:
+            print(f"      {source}.{field}: {value}")
+        else:
+            print(f"    . {source}.{field}: -")
 
 
 def version(cli: Cli):
     """view the version"""
     for pckg in cli.kontext.packages:
-        try:
-            version = cli.dist_package_version(pckg)
-        except importlib.metadata.PackageNotFoundError:
-            version = "Unknown"
-        print(f"{pckg}: {version}")
+        print(f"{pckg}: {get_package_version(pckg)}")
 
 
 def command(cli: Cli):
@@ -430,6 +495,82 @@ def shell(cli: Cli):
     cli.run_shell(cmd)
 
 
+def repo(cli: Cli):
+    """list all repos; possible other subcommand arguments: [prefetch, lock]"""
+    konfig = cli.kreate_konfig()
+    file_getter = konfig.file_getter
+    if cli.params and cli.params[0] == "prefetch":
+        # download all repos that are not in the cache yet, in parallel
+        file_getter.prefetch_repos()
+    elif cli.params and cli.params[0] == "lock":
+        # pin the sha256 of all zip repos, to verify them in later runs
+        file_getter.lock_repos()
+    elif cli.params:
+        raise ValueError(f"unknown repo subcommand {cli.params[0]}")
+    for name in konfig.get_path("system.repo", {}):
+        repo = file_getter.repo_prefixes[name]
+        dir = repo.calc_dir()
+        print(f"{name:24} {repo} {dir if dir.exists() else ''}")
+
+
+def cache(cli: Cli):
+    """show the repo cache; possible other subcommand arguments: [stats, evict, clear]"""
+    from ._repo import cache_dir
+
+    action = cli.params[0] if cli.params else "stats"
+    if action == "clear":
+        clear_cache(cli)
+        return
+    elif action == "evict":
+        for meta in _repocache.evict(cache_dir()):
+            print(f"evicted {meta['path']} ({_repocache.format_size(meta['size'])})")
+        return
+    elif action != "stats":
+        raise ValueError(f"unknown cache subcommand {action}")
+    entries = _repocache.cache_entries(cache_dir())
+    print(f"{'entry':48} {'size':>6} {'last used':16} {'hits':>5} {'misses':>6}")
+    for meta in entries:
+        name = str(meta["path"].relative_to(cache_dir()))
+        size = _repocache.format_size(meta["size"])
+        used = time.strftime("%Y-%m-%d %H:%M", time.localtime(meta["last_access"]))
+        print(f"{name:48} {size:>6} {used:16} {meta['hits']:5} {meta['misses']:6}")
+    total = _repocache.format_size(sum(meta["size"] for meta in entries))
+    hits = sum(meta["hits"] for meta in entries)
+    misses = sum(meta["misses"] for meta in entries)
+    print(f"{len(entries)} entries in {cache_dir()}, {total} bytes, {hits} hits, {misses} misses")
+
+
+# the modules of these subcommands are only imported when the subcommand is run
+
+
+def batch(cli: Cli):
+    """kreate files for many konfigs: batch <file|dir|glob>..."""
+    from . import _batch
+
+    _batch.batch(cli)
+
+
+def watch(cli: Cli):
+    """kreate the files again each time a loaded file changes"""
+    from . import _watch
+
+    _watch.watch(cli)
+
+
+def serve(cli: Cli):
+    """run the commands of clients (with KREATE_SERVE_CLIENT=True) in a warm process"""
+    from . import _serve
+
+    _serve.serve(cli)
+
+
+def render(cli: Cli):
+    """output the documents of all komponents, without writing files (-o file)"""
+    from . import _render
+
+    _render.render(cli)
+
+
 def __flatten_dict_gen(d, parent_key, sep):
     for k, v in d.items():
         new_key = parent_key + sep + k if parent_key else k
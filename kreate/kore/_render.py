@@ -0,0 +1,113 @@
+"""
+render the documents of all komponents to stdout, without writing files
+
+The komponents are aktivated one by one (each after it's dependencies), and
+the documents of a komponent are written as soon as the komponents in it's
+render_after() are aktivated as well, e.g. a resource after it's patches.
+Nothing is written to the target dir, so dekrypted secrets never are on disk.
+
+To keep the memory bounded, the aktivated data of a komponent is released
+when it is rendered, and no other komponent needs it anymore: all komponents
+that depend on it are aktivated, and all komponents that it changes (e.g.
+the target of a patch) are rendered.
+"""
+
+import json
+import logging
+import sys
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Dict, List, Set, TextIO
+
+from . import _dag
+
+if TYPE_CHECKING:  # Only imports the below statements during type checking
+    from ._app import App
+    from ._cli import Cli
+    from ._komp import Komponent
+
+logger = logging.getLogger(__name__)
+
+
+class Renderer:
+    def __init__(self, app: "App", out: TextIO, format: str = "yaml") -> None:
+        if format not in ("yaml", "json"):
+            raise ValueError(f"unknown output format {format}, use yaml or json")
+        self.app = app
+        self.out = out
+        self.format = format
+        self.nrof_documents = 0
+
+    def write(self, doc) -> None:
+        if self.format == "json":
+            self.out.write(json.dumps(doc, default=str) + "\n")
+        else:
+            self.out.write("---\n")
+            self.app.konfig.jinyaml.dump(doc, self.out)
+        # the documents are streamed, so the next tool can start with them
+        self.out.flush()
+        self.nrof_documents += 1
+
+    def render(self, komp: "Komponent") -> None:
+        docs = komp.render_documents()
+        if not docs:
+            logger.verbose(f"no documents to render for {komp.id}")
+        for doc in docs:
+            if doc:
+                self.write(doc)
+
+    def run(self, komponents: List["Komponent"]) -> None:
+        # the komponents are keyed by their key, since the ids are not unique
+        by_key = {komp.key(): komp for komp in komponents}
+        keys = set(by_key)
+        graph = self.app.dependency_graph()
+        # komponents that are not aktivated do not need their dependencies
+        graph = {
+            key: graph[key] if by_key[key].render_aktivate() else set() for key in sorted(keys)
+        }
+        render_after = {key: set(by_key[key].render_after()) & keys for key in keys}
+        # the komponents that still need the data of each komponent
+        needed_by: Dict[str, Set[str]] = {key: set() for key in keys}
+        for key, deps in graph.items():
+            for dep in deps:
+                needed_by[dep].add(key)
+        for key, others in render_after.items():
+            for other in others:
+                needed_by[other].add(key)
+
+        aktivated, rendered = set(), set()
+        for key in _dag.topological_order(graph):
+            komp = by_key[key]
+            if komp.render_aktivate():
+                logger.debug(f"aktivating {key}")
+                komp.aktivate()
+            aktivated.add(key)
+            for dep in graph[key]:
+                needed_by[dep].discard(key)
+            for other_key in sorted(keys - rendered):
+                if other_key in aktivated and render_after[other_key] <= aktivated:
+                    self.render(by_key[other_key])
+                    rendered.add(other_key)
+                    for other in render_after[other_key]:
+                        needed_by[other].discard(other_key)
+            self.release(by_key, rendered, needed_by)
+
+    def release(self, by_key: dict, rendered: set, needed_by: dict) -> None:
+        for key in sorted(rendered):
+            if not needed_by[key] and key in by_key:
+                logger.debug(f"releasing {key}")
+                by_key.pop(key).set_aktivated_state(None)
+
+
+def render(cli: "Cli"):
+    """output the documents of all komponents, without writing files (-o file)"""
+    app = cli.kreate_app()
+    output = cli.args.output or "-"
+    komponents = app.select_komponents(cli.args.komp)
+    if cli.args.komp:
+        # a selected komponent is rendered with the komponents that change it, e.g. patches
+        extra = [key for komp in komponents for key in komp.render_after()]
+        komponents = app.select_komponents([*cli.args.komp, *extra])
+    with nullcontext(sys.stdout) if output == "-" else open(output, "w") as out:
+        renderer = Renderer(app, out, cli.args.output_format)
+        renderer.run(komponents)
+    logger.info(f"rendered {renderer.nrof_documents} documents of {len(komponents)} komponents")
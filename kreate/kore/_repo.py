@@ -1,6 +1,4 @@
-from typing import Protocol, Union, TYPE_CHECKING, Mapping
-import requests
-import requests.auth
+from typing import Optional, Protocol, Union, TYPE_CHECKING, Mapping
 import zipfile
 import hashlib
 import io
@@ -8,11 +6,16 @@ import os
 import re
 import pkgutil
 import shutil
+import copy
 import logging
 import importlib
+import json
+import tempfile
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from ._core import wrap
+from . import _repocache
 
 
 if TYPE_CHECKING:  # Only imports the below statements during type checking
@@ -28,11 +31,56 @@ def cache_dir():
     return Path(cache_dir)
 
 
+def jinja_cache_dir():
+    return cache_dir().parent / "jinja"
+
+
+def konfig_cache_dir():
+    return cache_dir().parent / "konfig"
+
+
+_http_session = None
+
+
+def http_session():
+    """a shared requests.Session, so connections to the same host are reused"""
+    global _http_session
+    if _http_session is None:
+        import requests  # imported when needed, for faster startup
+        import requests.adapters
+
+        jobs = max(prefetch_jobs(), 1)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=jobs, pool_maxsize=jobs)
+        _http_session = requests.Session()
+        _http_session.mount("http://", adapter)
+        _http_session.mount("https://", adapter)
+    return _http_session
+
+
+def prefetch_jobs() -> int:
+    """the number of repos to download in parallel, 0 disables automatic prefetch"""
+    return int(os.getenv("KREATE_REPO_PREFETCH_JOBS", "4"))
+
+
+def offline() -> bool:
+    return os.getenv("KREATE_REPO_OFFLINE", "False") == "True"
+
+
+def mirror_dir() -> Path:
+    """a dir with zip files named by their sha256, to use instead of downloading"""
+    dir = os.getenv("KREATE_REPO_MIRROR_DIR")
+    return Path(dir) if dir else None
+
+
 def clear_cache(_=None):
     """clear the repo cache"""
     logger.warning(f"removing repo cache dir {cache_dir()}")
     if cache_dir().is_dir():
         shutil.rmtree(cache_dir())
+    for dir in (jinja_cache_dir(), konfig_cache_dir()):
+        if dir.is_dir():
+            logger.warning(f"removing cache dir {dir}")
+            shutil.rmtree(dir)
 
 
 class FileGetter:
@@ -53,13 +101,100 @@ class FileGetter:
         }
         # self.reponame = None # TODO: remove self.split_location(location)
         self.main_dir_path = main_dir_path
+        self.repo_konfs = {}
+        self._locked_repos = None
+        # the content of all files (and missing files) that were loaded
+        self.cache = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # the (reponame, path) of all files that are loaded, if these are recorded
+        self.read_files = None
 
     def __str__(self) -> str:
         return f"FileGetter({self.main_dir_path=})"
 
-    def konfig_repos(self):
-        for repo in self.konfig.get_path("system.repo", []):
+    def konfig_repos(self, prefetch: bool = True):
+        new_repos = []
+        for repo, repo_konf in self.konfig.get_path("system.repo", {}).items():
+            # only (re)create a repo if it's konfiguration changed
+            if repo in self.repo_prefixes and self.repo_konfs.get(repo) == repo_konf:
+                continue
             self.repo_prefixes[repo] = self.get_repo(repo)
+            self.repo_konfs[repo] = copy.deepcopy(repo_konf)
+            self.invalidate(repo=repo)
+            new_repos.append(repo)
+            if isinstance(self.repo_prefixes[repo], KonfigRepo):
+                # the cache of a repo that might be used should not be evicted
+                _repocache.mark_active(self.repo_prefixes[repo].cache_path())
+        if new_repos and prefetch and prefetch_jobs() > 0:
+            self.prefetch_repos(new_repos, raise_error=False)
+
+    def prefetch_repos(self, repo_names=None, jobs: int = None, raise_error=True):
+        """download all (or the given) repos in parallel, if not already cached"""
+        jobs = jobs or max(prefetch_jobs(), 1)
+        if repo_names is None:
+            self.konfig_repos(prefetch=False)
+            repo_names = list(self.konfig.get_path("system.repo", {}).keys())
+        repos = [self.repo_prefixes[name] for name in repo_names]
+        repos = [repo for repo in repos if repo.needs_prefetch()]
+        if not repos:
+            return {}
+        logger.info(f"prefetching {len(repos)} repos with {jobs} jobs")
+        with ThreadPoolExecutor(max_workers=min(jobs, len(repos))) as executor:
+            futures = {repo.repo_name: executor.submit(repo.prefetch) for repo in repos}
+        _repocache.evict(cache_dir())
+        result = {}
+        for name, future in futures.items():
+            error = future.exception()
+            if error and raise_error:
+                raise error
+            elif error:
+                # the download is retried (and raises) when a file of the repo is needed
+                logger.info(f"could not prefetch repo {name}: {error}")
+            result[name] = error
+        return result
+
+    def lock_file_path(self) -> Path:
+        filename = self.konfig.get_path("system.repo_lock_file", "kreate-repo.lock")
+        return self.main_dir_path / filename
+
+    def locked_repo(self, repo_name: str) -> Mapping:
+        """the locked url and sha256 of a repo, or None if it is not locked"""
+        if self._locked_repos is None:
+            path = self.lock_file_path()
+            self._locked_repos = {}
+            if path.exists():
+                logger.debug(f"using repo lock file {path}")
+                self._locked_repos = json.loads(path.read_text()).get("repo", {})
+        return self._locked_repos.get(repo_name)
+
+    def lock_repos(self) -> dict:
+        """download all zip repos, and write their url and sha256 in the lock file"""
+        self.konfig_repos(prefetch=False)
+        result = {}
+        for name in self.konfig.get_path("system.repo", {}):
+            repo = self.repo_prefixes[name]
+            if not getattr(repo, "is_zip_repo", False):
+                logger.info(f"not locking repo {name}, only zip repos can be locked")
+                continue
+            # the sha256 of a repo that was downloaded before is kept in the cache
+            sha256 = None if mirror_dir() else repo.cached_sha256()
+            if not sha256:
+                data = repo.fetch_archive(use_lock=False)
+                sha256 = repo.archive_sha256
+                if mirror_dir():
+                    write_bytes_atomic(mirror_dir() / f"{sha256}.zip", data)
+            result[name] = {
+                "type": repo.repo_konf.get("type"),
+                "version": repo.version,
+                "url": repo.lock_url(),
+                "sha256": sha256,
+            }
+        path = self.lock_file_path()
+        logger.info(f"writing repo lock file {path}")
+        path.write_text(json.dumps({"repo": result}, indent=2) + "\n")
+        self._locked_repos = result
+        return result
 
     def get_prefix(self, filename: str) -> str:
         if filename.startswith("optional:"):
@@ -120,10 +255,10 @@ class FileGetter:
                     f"WARNING: could not find repo {reponame}, for optional file {file}"
                 )
                 return ""
-            data = repo.get_data(path, optional=optional)
+            data = self.get_cached_data(reponame, path, optional, repo)
         else:
             logger.debug(f"looking for {file} in {path}")
-            data = self.load_file_data(path)
+            data = self.get_cached_data(None, path, optional)
         if data is None:
             if optional:
                 logger.debug(f"ignoring missing optional file {orig_file}")
@@ -138,6 +273,68 @@ class FileGetter:
             data = self.konfig.dekrypt_str(data)
         return data
 
+    def get_cached_data(self, reponame: str, path: Path, optional: bool, repo=None):
+        """
+        load the data of a file, or the result of a missing file, only once per run
+
+        Files in local dirs are checked with their modification time (or that of
+        their dir for missing files), files in downloaded repos do not change.
+        """
+        key = (reponame, path.as_posix(), optional)
+        if self.read_files is not None:
+            self.read_files.add(key[:2])
+        local_path = self.local_file_path(path, repo)
+        validator = file_validator(local_path) if local_path else None
+        if key in self.cache:
+            data, cached_validator, cached_repo = self.cache[key]
+            if cached_validator == validator and cached_repo is repo:
+                self.cache_hits += 1
+                return data
+        self.cache_misses += 1
+        if repo:
+            data = repo.get_data(path, optional=optional)
+        else:
+            data = self.load_file_data(path)
+        self.cache[key] = (data, validator, repo)
+        return data
+
+    def local_file_path(self, path: Path, repo=None) -> Optional[Path]:
+        """the path of a file in a local dir that might change, None for downloaded files"""
+        if repo:
+            return getattr(repo, "local_path", lambda path: None)(path)
+        return self.main_dir_path / path
+
+    def local_files(self) -> dict:
+        """the local path of all loaded files (and missing files), by (reponame, path)"""
+        result = {}
+        for (reponame, path, _), (_, validator, repo) in self.cache.items():
+            if validator is not None:
+                result[(reponame, path)] = self.local_file_path(Path(path), repo)
+        return result
+
+    def invalidate(self, location: str = None, repo: str = None) -> None:
+        """remove a file, all files of a repo, or everything from the cache"""
+        if location is None and repo is None:
+            self.cache.clear()
+            return
+        if location is not None:
+            for prefix in ("optional:", "dekrypt:"):
+                if location.startswith(prefix):
+                    location = location[len(prefix) :]
+            repo, path = self.split_location(location)
+            path = path.as_posix()
+        for key in list(self.cache):
+            if key[0] == repo and (location is None or key[1] == path):
+                del self.cache[key]
+
+    def cache_stats(self) -> dict:
+        return {
+            "files": len(self.cache),
+            "missing": sum(1 for entry in self.cache.values() if not entry[0]),
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+        }
+
     def load_file_data(self, filename: Path) -> str:
         path = self.main_dir_path / filename
         if not path.exists():
@@ -173,10 +370,27 @@ class FileGetter:
         return use == "True"
 
 
+def file_validator(path: Path):
+    """the modification time and size of a file, or of it's dir if it is missing"""
+    try:
+        stat = path.stat()
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        pass
+    try:
+        return "missing", path.parent.stat().st_mtime_ns
+    except OSError:
+        return "missing", None
+
+
 class Repo(Protocol):
     def get_data(self, path: Path, optional: bool = False) -> str:
         ...
 
+    def local_path(self, filename: Path) -> Path:
+        """the path of a file in a local dir that might change, None for downloaded files"""
+        return None
+
     def save_repo_file(self, filename: str) -> Path:
         raise NotImplementedError(
             f"not possible to save file in repo {self.__class__}: {filename}"
@@ -199,6 +413,9 @@ class FixedDirRepo(Repo):
         with open(self.dir / filename, "w") as f:
             f.write(data)
 
+    def local_path(self, filename: Path) -> Path:
+        return self.dir / filename
+
     def get_data(self, filename: Path, optional: bool = False):
         path = self.dir / filename
         if not path.exists():
@@ -210,6 +427,9 @@ class FixedDirRepo(Repo):
 
 
 class KonfigRepo(Repo):
+    # a zip repo can be kept as one file in the cache, instead of being extracted
+    is_zip_repo = False
+
     def __init__(self, konfig: "Konfig", repo_name: str, repo_konf: Mapping):
         self.konfig = konfig
         self.repo_name = repo_name
@@ -220,6 +440,9 @@ class KonfigRepo(Repo):
         if not self.version:
             raise ValueError(f"no version given for repo {repo_name}")
         self.version = str(self.version)  # sometimes a version is a float like 0.1
+        self.zip_index = None
+        self.cache_used = False
+        self.archive_sha256 = None
 
     def __repr__(self) -> str:
         return f"{self.__class__.__name__}({self.repo_name}, version={self.version})"
@@ -227,6 +450,60 @@ class KonfigRepo(Repo):
     def download(self, filename: str) -> bool:
         raise FileNotFoundError(f"Could not find {self.calc_dir()}/{filename} in repo {self.repo_name}")
 
+    def needs_prefetch(self) -> bool:
+        """True if the repo is downloaded as a whole, and not in the cache yet"""
+        return False
+
+    def keep_zip(self) -> bool:
+        if not self.is_zip_repo:
+            return False
+        default = os.getenv("KREATE_REPO_KEEP_ZIP", "False") == "True"
+        return bool(self.repo_konf.get("keep_zip", default))
+
+    def cache_path(self) -> Path:
+        return self.calc_zip_path() if self.keep_zip() else self.calc_dir()
+
+    def prefetch(self) -> None:
+        # the cache is evicted after all parallel downloads are done
+        self.ensure_cached(None, evict=False)
+
+    def ensure_cached(self, filename, evict: bool = True) -> Path:
+        """download the repo if it is not in the cache, and record that it is used"""
+        path = self.cache_path()
+        if self.cache_used:
+            return path
+        in_cache = cache_dir() in path.parents
+        downloaded = False
+        if not path.exists() and in_cache:
+            # only one process downloads it, other processes wait for the result
+            with _repocache.lock(path):
+                if not path.exists():
+                    self.download(filename)
+                    downloaded = True
+        elif not path.exists():
+            self.download(filename)
+        self.cache_used = True
+        if in_cache:
+            origin = {"repo": self.repo_name, "version": self.version}
+            origin["url"] = self.calc_url("...")
+            if self.archive_sha256:
+                origin["sha256"] = self.archive_sha256
+            elif locked := self.locked_sha256():
+                cached = _repocache.read_meta(path).get("sha256")
+                if not cached:
+                    # cached before the repo was locked, or by an older version
+                    cached = self.verify_cached(path)
+                if cached != locked:
+                    raise ValueError(
+                        f"cached repo {self.repo_name} in {path} has sha256 {cached},"
+                        f" but {locked} in the repo lock file"
+                    )
+                origin["sha256"] = cached
+            _repocache.record_use(path, downloaded, **origin)
+            if downloaded and evict:
+                _repocache.evict(cache_dir())
+        return path
+
     def get_data(self, filename: Path, optional: bool = False):
         if isinstance(self.version, str) and self.version.startswith("branch."):
             version = self.version[7:]
@@ -239,9 +516,9 @@ class KonfigRepo(Repo):
                 f"skipping optional {filename} in disable repo {self.repo_name}"
             )
             return ""
-        dir = Path(self.calc_dir())
-        if not dir.exists():
-            self.download(filename)
+        if self.keep_zip():
+            return self.get_zip_data(filename, optional=optional)
+        dir = self.ensure_cached(filename)
         if not dir.is_dir():
             # add other assertions, or better error message?
             raise FileExistsError(f"repo dir {dir} exists, but is not a directory")
@@ -257,6 +534,86 @@ class KonfigRepo(Repo):
     def download_extra_file(self, filename: str) -> bool:
         return False
 
+    def get_zip_data(self, filename: Path, optional: bool = False):
+        if self.zip_index is None:
+            path = self.ensure_cached(filename)
+            self.zip_index = shared_zip_index(
+                path,
+                skip_levels=self.repo_konf.get("skip_levels", 0),
+                select_regexp=self.repo_konf.get("select_regexp", ""),
+            )
+        logger.debug(f"getting data from {self.zip_index.path}: {filename}")
+        data = self.zip_index.read(filename)
+        if data is None:
+            if optional:
+                return ""
+            raise FileNotFoundError(
+                f"could not find file {filename} in {self.zip_index.path}"
+            )
+        return data.decode()
+
+    def lock_url(self) -> str:
+        return self.calc_url("...")
+
+    def locked_sha256(self) -> str:
+        locked = self.konfig.file_getter.locked_repo(self.repo_name)
+        if not locked:
+            return None
+        if locked.get("url") != self.lock_url():
+            logger.warning(
+                f"ignoring outdated repo lock for {self.repo_name}, use kreate repo lock"
+            )
+            return None
+        return locked.get("sha256")
+
+    def cached_sha256(self) -> str:
+        path = self.cache_path()
+        if cache_dir() in path.parents and path.exists():
+            return _repocache.read_meta(path).get("sha256")
+        return None
+
+    def verify_cached(self, path: Path) -> str:
+        """
+        the sha256 of a cached repo without a known sha256: a kept zip file is hashed,
+        an extracted repo is downloaded again (and checked with the repo lock file)
+        """
+        if self.keep_zip():
+            return hashlib.sha256(path.read_bytes()).hexdigest()
+        logger.info(f"downloading repo {self.repo_name} again, to check it with the repo lock file")
+        with _repocache.lock(path):
+            data = self.fetch_archive()
+            old_dir = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            os.rename(path, old_dir)
+            try:
+                self.unzip_data(data)
+            finally:
+                if path.exists():
+                    shutil.rmtree(old_dir)
+                else:
+                    os.rename(old_dir, path)
+        return self.archive_sha256
+
+    def download_archive(self) -> bytes:
+        raise NotImplementedError(f"repo {self.repo_name} has no archive to download")
+
+    def fetch_archive(self, use_lock: bool = True) -> bytes:
+        """the zip data, verified with the repo lock file, from a mirror if possible"""
+        locked = self.locked_sha256() if use_lock else None
+        mirror_path = mirror_dir() / f"{locked}.zip" if locked and mirror_dir() else None
+        if mirror_path and mirror_path.exists():
+            logger.info(f"using {mirror_path} for repo {self.repo_name}")
+            data = mirror_path.read_bytes()
+        else:
+            data = self.download_archive()
+        sha256 = hashlib.sha256(data).hexdigest()
+        if locked and sha256 != locked:
+            raise ValueError(
+                f"downloaded repo {self.repo_name} has sha256 {sha256},"
+                f" but {locked} in the repo lock file"
+            )
+        self.archive_sha256 = sha256
+        return data
+
     def calc_hash(self, extra: str = "") -> str:
         return hashlib.md5(
             (
@@ -281,6 +638,10 @@ class KonfigRepo(Repo):
         else:
             return cache_dir() / f"{self.repo_name}-{hash}"
 
+    def calc_zip_path(self) -> Path:
+        dir = self.calc_dir()
+        return dir.with_name(dir.name + ".zip")
+
     def calc_url(self, filename: str) -> str:
         url = self.repo_konf.get("url", "")
         if self.version:
@@ -288,13 +649,35 @@ class KonfigRepo(Repo):
         return url
 
     def unzip_data(self, data) -> None:
+        if self.keep_zip():
+            path = self.calc_zip_path()
+            logger.info(f"keeping zip file {path}")
+            write_bytes_atomic(path, data)
+            return
         z = zipfile.ZipFile(io.BytesIO(data))
         skip_levels = self.repo_konf.get("skip_levels", 0)
         regexp = self.repo_konf.get("select_regexp", "")
-        self.calc_dir().mkdir(parents=True)
-        unzip(z, self.calc_dir(), skip_levels=skip_levels, select_regexp=regexp)
+        # extract in a temporary dir, so no other process sees a half extracted repo
+        dir = self.calc_dir()
+        dir.parent.mkdir(parents=True, exist_ok=True)
+        tmp_dir = Path(tempfile.mkdtemp(prefix=f"{dir.name}.", suffix=".tmp", dir=dir.parent))
+        try:
+            unzip(z, tmp_dir, skip_levels=skip_levels, select_regexp=regexp)
+            os.rename(tmp_dir, dir)
+        except OSError:
+            if not dir.is_dir():
+                raise
+            logger.info(f"repo dir {dir} was already extracted by another process")
+        finally:
+            if tmp_dir.exists():
+                shutil.rmtree(tmp_dir)
 
     def url_response(self, filename: str, raise_error=True):
+        import requests.auth  # imported when needed, for faster startup
+
+        url = self.calc_url(filename)
+        if offline():
+            raise IOError(f"can not download {url} for repo {self.repo_name} in offline mode")
         auth = None
         if self.repo_konf.get("basic_auth", {}):
             usr_env_var = self.repo_konf["basic_auth"]["usr_env_var"]
@@ -302,9 +685,8 @@ class KonfigRepo(Repo):
             usr = os.getenv(usr_env_var)
             psw = os.getenv(psw_env_var)
             auth = requests.auth.HTTPBasicAuth(usr, psw)
-        url = self.calc_url(filename)
         logger.info(f"downloading {self.calc_dir()} from {url}")
-        response = requests.get(url, auth=auth)
+        response = http_session().get(url, auth=auth)
         if response.status_code >= 300 and raise_error:
             raise IOError(
                 f"status {response.status_code} while downloading {url} with message {response.content}"
@@ -346,6 +728,9 @@ class LocalKonfigRepo(KonfigRepo):
         self.konfig.tracer.pop()
         return dir
 
+    def local_path(self, filename: Path) -> Path:
+        return self.calc_dir() / filename
+
     def calc_dir(self):
         dir: str = self.calc_local_dir()
         dir = self.repo_konf.get("dir", dir)
@@ -361,29 +746,55 @@ class LocalKonfigRepo(KonfigRepo):
 
 
 class LocalZipRepo(KonfigRepo):
-    def download(self, filename: str) -> bool:
+    is_zip_repo = True
+
+    def calc_zip_path(self) -> Path:
+        # the local zip file can be used directly, without copying it
         path: str = self.repo_konf.get("path")
         if self.version:
             path = path.replace("{version}", self.version)
+        return Path(path)
+
+    def lock_url(self) -> str:
+        return str(self.calc_zip_path())
+
+    def download_archive(self) -> bytes:
+        path = self.calc_zip_path()
         logger.info(f"unzipping {self.calc_dir()} from {path}")
-        data = Path(path).read_bytes()
-        self.unzip_data(data)
+        return path.read_bytes()
+
+    def download(self, filename: str) -> bool:
+        self.unzip_data(self.fetch_archive())
         return True
 
 
 class UrlZipRepo(KonfigRepo):
+    is_zip_repo = True
+
+    def download_archive(self) -> bytes:
+        return self.url_response(None).content
+
     def download(self, filename: str) -> bool:
-        data = self.url_response(filename).content
-        self.unzip_data(data)
+        self.unzip_data(self.fetch_archive())
         return True
 
+    def needs_prefetch(self) -> bool:
+        return not self.repo_konf.get("disabled", False) and not self.cache_path().exists()
+
 
 class BitbucketZipRepo(KonfigRepo):
+    is_zip_repo = True
+
+    def download_archive(self) -> bytes:
+        return self.url_response(None).content
+
     def download(self, filename: str) -> bool:
-        data = self.url_response(filename).content
-        self.unzip_data(data)
+        self.unzip_data(self.fetch_archive())
         return True
 
+    def needs_prefetch(self) -> bool:
+        return not self.repo_konf.get("disabled", False) and not self.cache_path().exists()
+
     def calc_url(self, filename: str) -> str:
         return self._calc_url("archive", "&format=zip")
 
@@ -399,15 +810,19 @@ class BitbucketZipRepo(KonfigRepo):
 
 
 class BitbucketFileRepo(BitbucketZipRepo):
+    is_zip_repo = False
+
     def download(self, filename: str, raise_error=True) -> bool:
         response = self.url_response(filename, raise_error=raise_error)
         if response.status_code > 300:
             return False
-        path = self.calc_dir() / filename
-        path.parent.mkdir(parents=True, exist_ok=True)
-        path.write_bytes(response.content)
+        write_bytes_atomic(self.calc_dir() / filename, response.content)
         return True
 
+    def needs_prefetch(self) -> bool:
+        # files are downloaded one by one, when needed
+        return False
+
     def calc_url(self, filename: str) -> str:
         filename = str(filename)
         while filename.startswith("/"):
@@ -428,6 +843,74 @@ class BitbucketFileRepo(BitbucketZipRepo):
         return False
 
 
+def write_bytes_atomic(path: Path, data: bytes) -> None:
+    """write a file, so that other processes never see a half written file"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f"{path.name}.", suffix=".tmp", dir=path.parent)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class ZipIndex:
+    """
+    The files in a zip archive, that are read directly from the archive.
+
+    The index is built once from the central directory of the archive,
+    with the same skip_levels and select_regexp as the unzip function.
+    """
+
+    def __init__(self, path: Path, skip_levels: int = 0, select_regexp: str = ""):
+        # the index is shared between konfigs in other dirs, e.g. in batch mode
+        self.path = Path(path).resolve()
+        self.skip_levels = skip_levels
+        self.select_regexp = select_regexp
+        self.files = None
+        self.zfile = None
+        self.pid = None
+
+    def zip_file(self) -> zipfile.ZipFile:
+        if self.pid != os.getpid():
+            # a forked process should not share the file position with its parent
+            self.zfile = zipfile.ZipFile(self.path)
+            self.pid = os.getpid()
+        if self.files is None:
+            self.files = self.build_index(self.zfile)
+        return self.zfile
+
+    def build_index(self, zfile: zipfile.ZipFile) -> dict:
+        result = {}
+        for info in zfile.infolist():
+            if info.is_dir():
+                continue
+            if self.skip_levels == 0 and not self.select_regexp:
+                result[info.filename] = info
+                continue
+            newname = "/".join(info.filename.split("/")[self.skip_levels :])
+            if newname and re.match(self.select_regexp, info.filename):
+                result[newname] = info
+        logger.debug(f"indexed {len(result)} files in {self.path}")
+        return result
+
+    def read(self, filename: Path) -> bytes:
+        zfile = self.zip_file()
+        info = self.files.get(Path(filename).as_posix())
+        if info is None:
+            return None
+        return zfile.read(info)
+
+
+# the same zip repo is often used by several konfigs in one process (e.g. in batch mode)
+_zip_indexes = {}
+
+
+def shared_zip_index(path: Path, skip_levels: int = 0, select_regexp: str = "") -> ZipIndex:
+    key = (Path(path).resolve(), skip_levels, select_regexp, path.stat().st_mtime_ns)
+    if key not in _zip_indexes:
+        _zip_indexes[key] = ZipIndex(path, skip_levels, select_regexp)
+    return _zip_indexes[key]
+
+
 def unzip(
     zfile: zipfile.ZipFile,
     dir: Path,
@@ -0,0 +1,199 @@
+"""
+metadata and eviction for the entries in the repo cache
+
+Each entry (an extracted repo dir, or a kept zip file) has a small json file
+next to it, with the origin of the entry, it's size, when it was last used,
+and how often it was used from the cache (hit) or downloaded (miss).
+When a size or age budget is set, the least recently used entries are removed
+after each download, except the entries that are in active use.
+"""
+
+import contextlib
+import json
+import logging
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+META_SUFFIX = ".meta.json"
+LOCK_SUFFIX = ".lock"
+# entries used in the last hour might be in use by another kreate process
+ACTIVE_SECONDS = 3600
+_SIZE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+# the entries of the repos used by this process are never evicted
+_active_entries = set()
+_recorded_entries = set()
+_warned_full = False
+
+
+def parse_size(size: str) -> int:
+    """parse a size like 500M or 2G to a number of bytes"""
+    match = re.fullmatch(r"\s*(\d+)\s*([KMGT]?)B?\s*", str(size).upper())
+    if not match:
+        raise ValueError(f"could not parse size {size}, use e.g. 500M or 2G")
+    return int(match.group(1)) * _SIZE_UNITS[match.group(2)]
+
+
+def format_size(size: int) -> str:
+    for unit in ("", "K", "M", "G"):
+        if size < 1024:
+            break
+        size /= 1024
+    return f"{size:.0f}{unit}" if unit else f"{size}"
+
+
+def max_size() -> Optional[int]:
+    size = os.getenv("KREATE_REPO_CACHE_MAX_SIZE")
+    return parse_size(size) if size else None
+
+
+def max_age() -> Optional[float]:
+    """the maximum age in seconds since the last use of an entry"""
+    days = os.getenv("KREATE_REPO_CACHE_MAX_AGE_DAYS")
+    return float(days) * 24 * 3600 if days else None
+
+
+def meta_path(entry: Path) -> Path:
+    return entry.with_name(entry.name + META_SUFFIX)
+
+
+def entry_size(entry: Path) -> int:
+    if entry.is_file():
+        return entry.stat().st_size
+    size = 0
+    for dirpath, _, filenames in os.walk(entry):
+        for fname in filenames:
+            size += os.path.getsize(os.path.join(dirpath, fname))
+    return size
+
+
+def read_meta(entry: Path) -> dict:
+    try:
+        return json.loads(meta_path(entry).read_text())
+    except (OSError, ValueError):
+        # entries kreated by older versions have no metadata
+        stat = entry.stat()
+        return {"last_access": stat.st_mtime, "hits": 0, "misses": 0}
+
+
+def write_meta(entry: Path, meta: dict) -> None:
+    path = meta_path(entry)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(meta, indent=2))
+    os.replace(tmp_path, path)
+
+
+@contextlib.contextmanager
+def lock(entry: Path):
+    """an exclusive lock on an entry, so only one process downloads it"""
+    try:
+        import fcntl
+    except ImportError:
+        # no file locks on windows, but extracted repos are still renamed atomically
+        yield
+        return
+    path = entry.with_name(entry.name + LOCK_SUFFIX)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            logger.info(f"waiting for another process to download {entry}")
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def mark_active(entry: Path) -> None:
+    _active_entries.add(entry)
+
+
+def record_use(entry: Path, downloaded: bool, **origin) -> None:
+    """update the metadata of an entry, when it is used for the first time in this process"""
+    if entry in _recorded_entries or not entry.exists():
+        return
+    _recorded_entries.add(entry)
+    _active_entries.add(entry)
+    meta = read_meta(entry)
+    meta.update(origin)
+    meta["last_access"] = time.time()
+    if downloaded or "size" not in meta:
+        meta["size"] = entry_size(entry)
+    counter = "misses" if downloaded else "hits"
+    meta[counter] = meta.get(counter, 0) + 1
+    write_meta(entry, meta)
+
+
+def cache_entries(root: Path) -> List[dict]:
+    """all entries in the cache, with their metadata, most recently used first"""
+    if not root.is_dir():
+        return []
+    entries = set()
+    for path in root.rglob(f"*{META_SUFFIX}"):
+        entries.add(path.with_name(path.name[: -len(META_SUFFIX)]))
+    for path in root.glob("*/*"):
+        # entries without metadata, kreated by older versions
+        if not path.name.endswith((META_SUFFIX, LOCK_SUFFIX, ".tmp")):
+            entries.add(path)
+    result = []
+    for entry in entries:
+        if not entry.exists():
+            meta_path(entry).unlink(missing_ok=True)
+            continue
+        meta = read_meta(entry)
+        if "size" not in meta:
+            meta["size"] = entry_size(entry)
+        meta["path"] = entry
+        result.append(meta)
+    return sorted(result, key=lambda meta: meta["last_access"], reverse=True)
+
+
+def is_active(meta: dict, now: float) -> bool:
+    return meta["path"] in _active_entries or now - meta["last_access"] < ACTIVE_SECONDS
+
+
+def remove_entry(entry: Path) -> None:
+    logger.info(f"evicting {entry} from repo cache")
+    if entry.is_dir():
+        # another process might be evicting the same entry
+        shutil.rmtree(entry, ignore_errors=True)
+    else:
+        entry.unlink(missing_ok=True)
+    meta_path(entry).unlink(missing_ok=True)
+
+
+def evict(root: Path, size_budget: int = None, age_budget: float = None) -> List[dict]:
+    """remove the least recently used entries, until the cache fits in the budget"""
+    global _warned_full
+    size_budget = size_budget if size_budget is not None else max_size()
+    age_budget = age_budget if age_budget is not None else max_age()
+    if size_budget is None and age_budget is None:
+        return []
+    now = time.time()
+    entries = cache_entries(root)
+    total = sum(meta["size"] for meta in entries)
+    evicted = []
+    # start with the least recently used entry
+    for meta in reversed(entries):
+        too_old = age_budget is not None and now - meta["last_access"] > age_budget
+        too_big = size_budget is not None and total > size_budget
+        if not (too_old or too_big) or is_active(meta, now):
+            continue
+        remove_entry(meta["path"])
+        total -= meta["size"]
+        evicted.append(meta)
+    if size_budget is not None and total > size_budget and not _warned_full:
+        _warned_full = True
+        logger.warning(
+            f"repo cache size {total} is above {size_budget} bytes, "
+            f"but all remaining entries are in use"
+        )
+    return evicted
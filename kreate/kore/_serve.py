@@ -0,0 +1,255 @@
+"""
+a server that runs kreate commands, without starting python for each command
+
+`kreate serve` listens on a unix socket for commands of clients, that are
+started with KREATE_SERVE_CLIENT=True (see _client.py).
+Each command runs in a forked process, that starts with all modules imported,
+and with the compiled templates, parsed konfig files and zip repo indexes of
+the server. When the command is finished this process exits, so nothing it
+loaded (including dekrypted secrets) is kept.
+
+After a command is started, the server loads the konfig of the command
+itself (in the same dir and environment), to fill it's caches for the next
+commands. This is done with dummy secrets (as with --testdummy) and without
+the krypt key, so the server never dekrypts a secret or keeps the key, and
+with a temporary target dir, so the server never writes in the dir of the
+command. The konfig is only loaded again when one of it's local files is
+changed (by modification time and size).
+"""
+
+import contextlib
+import importlib
+import logging
+import os
+import socket
+import struct
+import sys
+import tempfile
+import time
+import traceback
+import warnings
+from pathlib import Path
+from typing import Dict, List
+
+from ._cli import Cli
+from ._client import receive_request, socket_path
+from ._kontext import Kontext
+from ._repo import file_validator
+from ._target import TargetDir
+
+logger = logging.getLogger(__name__)
+
+# heavy dependencies are imported by the server, so no command needs to import them
+PRELOAD_MODULES = ("jinja2", "ruamel.yaml", "requests", "cryptography.fernet")
+
+
+def idle_timeout() -> float:
+    return float(os.getenv("KREATE_SERVE_IDLE_TIMEOUT", "600"))
+
+
+@contextlib.contextmanager
+def request_kontext(request: dict):
+    """run in the dir and with the environment of a request"""
+    cwd = os.getcwd()
+    environ = dict(os.environ)
+    os.chdir(request["cwd"])
+    os.environ.clear()
+    os.environ.update(request["env"])
+    try:
+        yield
+    finally:
+        os.chdir(cwd)
+        os.environ.clear()
+        os.environ.update(environ)
+
+
+@contextlib.contextmanager
+def quiet():
+    """do not show the logging and warnings of loading a konfig in the server"""
+    logging.disable(logging.CRITICAL)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            yield
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+class Server:
+    def __init__(self, cli: Cli) -> None:
+        self.cli = cli
+        self.path = socket_path()
+        self.children = set()
+        # the validators of the local files of the konfig of each dir
+        self.warmed: Dict[str, Dict[Path, tuple]] = {}
+
+    def new_cli(self) -> Cli:
+        # the Kontext loads the .env file, so it should be created in the dir of the request
+        kontext = Kontext()
+        for mod in self.cli.kontext.modules:
+            kontext.add_module(type(mod)())
+        return Cli(kontext)
+
+    def listen(self) -> socket.socket:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists():
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                try:
+                    probe.connect(str(self.path))
+                except OSError:
+                    # the socket of a server that was stopped
+                    self.path.unlink()
+                else:
+                    raise RuntimeError(f"a kreate server is already running on {self.path}")
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # only the same user can connect
+        umask = os.umask(0o177)
+        try:
+            sock.bind(str(self.path))
+        finally:
+            os.umask(umask)
+        sock.listen()
+        sock.settimeout(1)
+        return sock
+
+    def run(self) -> None:
+        from ._jinyaml import share_parsed_yaml
+
+        share_parsed_yaml()
+        for name in PRELOAD_MODULES:
+            with contextlib.suppress(ImportError):
+                importlib.import_module(name)
+        timeout = idle_timeout()
+        sock = self.listen()
+        logger.info(f"serving on {self.path}, stopping after {timeout:g}s without commands")
+        last_request = time.monotonic()
+        try:
+            while self.children or time.monotonic() - last_request < timeout:
+                self.reap_children()
+                try:
+                    conn, _ = sock.accept()
+                except socket.timeout:
+                    continue
+                self.handle(conn)
+                last_request = time.monotonic()
+        finally:
+            sock.close()
+            if self.path.exists():
+                self.path.unlink()
+        logger.info(f"stopped serving after {timeout:g}s without commands")
+
+    def reap_children(self) -> None:
+        for pid in list(self.children):
+            done, _ = os.waitpid(pid, os.WNOHANG)
+            if done:
+                self.children.discard(pid)
+
+    def handle(self, conn: socket.socket) -> None:
+        fds = []
+        try:
+            with conn:
+                conn.settimeout(10)
+                request, fds = receive_request(conn)
+                logger.info(f"running {' '.join(request['argv'])} in {request['cwd']}")
+                sys.stdout.flush()
+                sys.stderr.flush()
+                pid = os.fork()
+                if pid == 0:
+                    self.run_request(conn, request, fds)
+                self.children.add(pid)
+        except Exception as e:
+            logger.error(f"could not handle request: {type(e).__name__}: {e}")
+            return
+        finally:
+            for fd in fds:
+                os.close(fd)
+        self.warm_up(request)
+
+    def run_request(self, conn: socket.socket, request: dict, fds: List[int]) -> None:
+        """run the command of a request in a forked process, and exit"""
+        code = 1
+        try:
+            conn.settimeout(None)
+            # the output is written directly to the stdout and stderr of the client
+            for fd, target in zip(fds, request["fds"]):
+                os.dup2(fd, target)
+                os.close(fd)
+            # the command configures logging itself
+            logging.root.handlers.clear()
+            os.chdir(request["cwd"])
+            os.environ.clear()
+            os.environ.update(request["env"])
+            sys.argv = ["kreate", *request["argv"]]
+            code = 0
+            try:
+                self.new_cli().run()
+            except SystemExit as e:
+                if isinstance(e.code, str):
+                    print(e.code, file=sys.stderr)
+                code = e.code if isinstance(e.code, int) else int(e.code is not None)
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            with contextlib.suppress(Exception):
+                sys.stdout.flush()
+                sys.stderr.flush()
+            with contextlib.suppress(OSError):
+                conn.sendall(struct.pack(">i", code))
+            os._exit(0)
+
+    def is_warm(self, cwd: str) -> bool:
+        files = self.warmed.get(cwd)
+        if files is None:
+            return False
+        return all(file_validator(path) == validator for path, validator in files.items())
+
+    def warm_up(self, request: dict) -> None:
+        """load the konfig of a request with dummy secrets, to fill the caches of the server"""
+        cwd = request["cwd"]
+        if self.is_warm(cwd):
+            return
+        start = time.perf_counter()
+        # if there is no (valid) konfig, try again when a file is added to the dir
+        files = [Path(cwd)]
+        # secrets are dummies, so the server never needs (or keeps) the key of a client
+        env = {k: v for k, v in request["env"].items() if not k.startswith("KREATE_KRYPT_KEY_")}
+        request = {**request, "env": env}
+        with request_kontext(request), quiet(), tempfile.TemporaryDirectory() as tmpdir:
+            cli = self.new_cli()
+            try:
+                cli.args = cli.parser.parse_args(["--testdummy", *request["argv"]])
+                for mod in cli.kontext.modules:
+                    mod.process_cli_options(cli)
+                # parallel aktivation would fork the server
+                cli.args.define.append("system.jobs=1")
+                cli.subcmd = "files"
+                cli.params = []
+                app = cli.kreate_app()
+                # files that are kopied while aktivating (e.g. by a Kustomization) are
+                # written in a temporary dir, not in the target dir of the command
+                app.target_path = Path(tmpdir)
+                app.target_dir = TargetDir(app.target_path)
+                app.aktivate_komponents()
+                files = [Path(cwd), *app.konfig.file_getter.local_files().values()]
+            except (Exception, SystemExit) as e:
+                logger.debug(f"could not load konfig in {cwd}: {type(e).__name__}: {e}")
+            finally:
+                # all written files are in the temporary dir, which is removed
+                cli.kontext.cleanup_paths.clear()
+                # forget the key (and dekrypted values), if a konfig did get it anyway
+                from ..krypt import krypt_functions
+
+                krypt_functions.set_key_finder(None)
+        self.warmed[cwd] = {Path(cwd) / path: file_validator(Path(cwd) / path) for path in files}
+        logger.verbose(f"loaded konfig in {cwd} in {time.perf_counter() - start:.2f}s")
+
+
+def serve(cli: Cli):
+    """run the commands of clients (with KREATE_SERVE_CLIENT=True) in a warm process"""
+    if not hasattr(os, "fork") or not hasattr(socket, "AF_UNIX"):
+        raise RuntimeError("kreate serve needs fork and unix sockets")
+    try:
+        Server(cli).run()
+    except KeyboardInterrupt:
+        logger.info("stopped serving")
@@ -0,0 +1,120 @@
+"""
+a snapshot of a fully loaded konfig, stored in the kreate cache dir
+
+The snapshot is only used when all files that were loaded while inkluding,
+and all environment variables that might be used, are still the same.
+In that case all the inklude rendering and merging can be skipped.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable
+
+from ._repo import konfig_cache_dir
+from .overlay import freeze
+
+if TYPE_CHECKING:  # Only imports the below statements during type checking
+    from ._konfig import Konfig
+
+logger = logging.getLogger(__name__)
+
+
+def use_snapshots() -> bool:
+    return os.getenv("KREATE_KONFIG_CACHE", "False") == "True"
+
+
+def content_hash(data) -> str:
+    if data is None:
+        return None
+    if isinstance(data, str):
+        data = data.encode()
+    return hashlib.sha256(data).hexdigest()
+
+
+class KonfigSnapshot:
+    def __init__(self, konfig: "Konfig", inkludes=None):
+        self.konfig = konfig
+        key = json.dumps(
+            {
+                "kreate": konfig.get_kreate_version(),
+                "cwd": str(Path.cwd()),
+                "main": str(konfig.main_konfig_path.resolve()),
+                "dict": konfig.dict_,
+                "inkludes": list(inkludes or []),
+            },
+            sort_keys=True,
+            default=str,
+        )
+        self.path = konfig_cache_dir() / f"{content_hash(key)}.pickle"
+        self.files = {}
+
+    def __repr__(self) -> str:
+        return f"KonfigSnapshot({self.path})"
+
+    def record_file(self, location: str, data) -> None:
+        self.files[location] = content_hash(data)
+
+    def env_var_hashes(self, names: Iterable[str]) -> dict:
+        # only store hashes, since env vars might contain secrets
+        names = set(names)
+        names.update(name for name in os.environ if name.startswith("KREATE_"))
+        return {name: content_hash(os.getenv(name)) for name in sorted(names)}
+
+    def load(self) -> bool:
+        if not self.path.is_file():
+            logger.debug(f"no konfig snapshot {self.path}")
+            return False
+        try:
+            with open(self.path, "rb") as f:
+                snapshot = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"ignoring unreadable konfig snapshot {self.path}: {e}")
+            return False
+        if snapshot["env"] != self.env_var_hashes(snapshot["env"].keys()):
+            logger.verbose("not using konfig snapshot, environment vars changed")
+            return False
+        konfig = self.konfig
+        orig_dict = dict(konfig.dict_)
+        konfig.dict_.clear()
+        konfig.dict_.update(snapshot["dict"])
+        konfig.file_getter.konfig_repos()
+        for location, hash in snapshot["files"].items():
+            try:
+                data = konfig.file_getter.get_data(location)
+            except Exception as e:
+                logger.debug(f"could not load {location} for konfig snapshot: {e}")
+                data = e
+            if isinstance(data, Exception) or content_hash(data) != hash:
+                logger.verbose(f"not using konfig snapshot, {location} changed")
+                konfig.dict_.clear()
+                konfig.dict_.update(orig_dict)
+                return False
+        konfig.inklude_graph = snapshot["inklude_graph"]
+        self.files = snapshot["files"]
+        logger.verbose(f"using konfig snapshot {self.path}")
+        return True
+
+    def save(self) -> None:
+        if self.konfig.dekrypted:
+            logger.verbose("not saving konfig snapshot, since it contains dekrypted data")
+            return
+        snapshot = {
+            "env": self.env_var_hashes(self.konfig.jinyaml.used_env_vars),
+            "files": self.files,
+            "inklude_graph": self.konfig.inklude_graph,
+            "dict": freeze(self.konfig.dict_),
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(snapshot, f)
+            os.replace(tmp_path, self.path)
+            logger.debug(f"saved konfig snapshot {self.path}")
+        except Exception as e:
+            logger.warning(f"could not save konfig snapshot {self.path}: {e}")
+            tmp_path.unlink(missing_ok=True)
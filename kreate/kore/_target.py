@@ -0,0 +1,147 @@
+"""
+writing the kreated files to the target dir
+
+By default the target dir is removed, and all files are written again.
+In incremental mode all files are rendered first, and only files with
+a different content are written, so unchanged files keep their mtime.
+Files that were not kreated in this run are removed afterwards.
+A manifest with the sha256 (and size and mtime) of each written file
+is kept in the target dir, so unchanged files need not be read again.
+Secret files are always written, and never added to the manifest.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, Set, Union
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = ".kreate-manifest.json"
+
+
+def sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class TargetDir:
+    def __init__(self, path: Path, incremental: bool = False, partial: bool = False) -> None:
+        self.path = path
+        self.incremental = incremental
+        # only some komponents are kreated, so other files are kept
+        self.partial = partial
+        self.manifest: Dict[str, dict] = {}
+        self.new_manifest: Dict[str, dict] = {}
+        self.written: Set[str] = set()
+        self.nrof_changed = 0
+
+    def manifest_path(self) -> Path:
+        return self.path / MANIFEST_NAME
+
+    def prepare(self) -> None:
+        if self.incremental:
+            self.manifest = self.read_manifest()
+        elif self.path.exists() and not self.partial:
+            logger.info(f"removing target directory {self.path}")
+            shutil.rmtree(self.path)
+        os.makedirs(self.path, exist_ok=True)
+
+    def read_manifest(self) -> Dict[str, dict]:
+        try:
+            return json.loads(self.manifest_path().read_text())
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"ignoring invalid manifest {self.manifest_path()}: {e}")
+            return {}
+
+    def relative_name(self, path: Path) -> str:
+        return Path(path).relative_to(self.path).as_posix()
+
+    def is_written(self, path: Path) -> bool:
+        return self.relative_name(path) in self.written
+
+    def is_unchanged(self, path: Path, name: str, digest: str) -> bool:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return False
+        entry = self.manifest.get(name, {})
+        if entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+            return entry.get("sha256") == digest
+        # the file is changed outside kreate, or not in the manifest
+        return sha256(path.read_bytes()) == digest
+
+    def write(self, path: Path, data: Union[str, bytes], secret: bool = False) -> bool:
+        """write the data to path, and return False if the file was unchanged"""
+        path = Path(path)
+        name = self.relative_name(path)
+        if isinstance(data, str):
+            data = data.encode()
+        self.written.add(name)
+        digest = sha256(data)
+        if self.incremental and not secret and self.is_unchanged(path, name, digest):
+            logger.verbose(f"file {name} is unchanged")
+            changed = False
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+            self.nrof_changed += 1
+            changed = True
+        if not secret:
+            stat = path.stat()
+            self.new_manifest[name] = {
+                "sha256": digest,
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+            }
+        return changed
+
+    def keep(self, name: str) -> None:
+        """keep a file that was written in an earlier run, and is not changed"""
+        self.written.add(name)
+        if name in self.manifest:
+            self.new_manifest[name] = self.manifest[name]
+
+    def pop_written_state(self) -> tuple:
+        """the files written by a forked worker process since the last call"""
+        state = (self.written, self.new_manifest, self.nrof_changed)
+        self.written, self.new_manifest, self.nrof_changed = set(), {}, 0
+        return state
+
+    def merge_written(self, state: tuple) -> None:
+        """merge the files written by a forked worker process"""
+        written, new_manifest, nrof_changed = state
+        self.written.update(written)
+        self.new_manifest.update(new_manifest)
+        self.nrof_changed += nrof_changed
+
+    def remove_stale_files(self) -> None:
+        for dirpath, dirnames, filenames in os.walk(self.path, topdown=False):
+            for fname in filenames:
+                path = Path(dirpath) / fname
+                name = self.relative_name(path)
+                if name != MANIFEST_NAME and name not in self.written:
+                    logger.info(f"removing stale file {name}")
+                    path.unlink()
+            if dirpath != str(self.path) and not os.listdir(dirpath):
+                os.rmdir(dirpath)
+
+    def finish(self) -> None:
+        if not self.incremental:
+            return
+        if self.partial:
+            self.new_manifest = {**self.manifest, **self.new_manifest}
+        else:
+            self.remove_stale_files()
+        tmp_path = self.manifest_path().with_name(f"{MANIFEST_NAME}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(self.new_manifest, indent=2, sort_keys=True))
+        os.replace(tmp_path, self.manifest_path())
+        logger.info(
+            f"{self.nrof_changed} of {len(self.written)} files changed in {self.path}"
+        )
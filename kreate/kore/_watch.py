@@ -0,0 +1,205 @@
+"""
+kreate the files again, each time a file that was loaded is changed
+
+The konfig and app are kept in memory. While a komponent is aktivated and
+it's file is kreated, all konfig paths and files it reads are recorded.
+When a file changes, only the komponents that read that file, or a konfig
+path that has a different value, are aktivated again (together with the
+komponents that depend on them), and only their files are written.
+The other komponents keep their aktivated state and files.
+
+Files are polled every KREATE_WATCH_INTERVAL seconds (default 1).
+Only local files are watched, since files in downloaded repos do not change.
+"""
+
+import contextlib
+import logging
+import os
+import time
+from collections.abc import Mapping
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Set, Tuple
+
+from . import _dag, overlay
+from ._repo import file_validator
+from ._target import TargetDir
+
+if TYPE_CHECKING:  # Only imports the below statements during type checking
+    from ._app import App
+    from ._cli import Cli
+    from ._komp import Komponent
+
+logger = logging.getLogger(__name__)
+
+# markers for konfig values that are compared in another way
+_MISSING = "<missing>"
+_OVERLAY = "<overlay>"
+
+
+def watch_interval() -> float:
+    return float(os.getenv("KREATE_WATCH_INTERVAL", "1"))
+
+
+class KompRecord:
+    """what a komponent read and wrote, the last time it was aktivated"""
+
+    def __init__(self, komp: "Komponent") -> None:
+        self.files: Set[Tuple[str, str]] = set()
+        self.paths: Set[tuple] = set()
+        self.written: Set[str] = set()
+        self.deps = set(komp.aktivate_after())
+
+
+def konfig_value(app: "App", path: tuple):
+    """the value of a path in the konfig, without recording it as a read"""
+    value = app.konfig.dict_
+    for key in path:
+        if key is overlay.KEYS:
+            return list(value) if isinstance(value, Mapping) else _MISSING
+        if not isinstance(value, Mapping) or key not in value:
+            return _MISSING
+        value = value[key]
+    if isinstance(value, overlay.OverlayMap):
+        # the values that were read in this map are recorded (and compared) separately
+        return _OVERLAY
+    return value
+
+
+class Watcher:
+    def __init__(self, cli: "Cli") -> None:
+        self.cli = cli
+        self.app: "App" = None
+        self.records: Dict[str, KompRecord] = {}
+        self.konfig_files: Set[Tuple[str, str]] = set()
+        self.watched: Dict[Tuple[str, str], tuple] = {}
+
+    @contextlib.contextmanager
+    def recording(self, app: "App", record: KompRecord):
+        file_getter = app.konfig.file_getter
+        written = set(app.target_dir.written)
+        file_getter.read_files = record.files
+        overlay.record_reads(record.paths)
+        try:
+            yield
+        finally:
+            overlay.record_reads(None)
+            file_getter.read_files = None
+            record.written |= app.target_dir.written - written
+
+    def is_unchanged(self, app: "App", komp: "Komponent", changed: set) -> bool:
+        old_app = self.app
+        record = self.records.get(komp.key())
+        if old_app is None or record is None:
+            return False
+        old = old_app.komponents_by_key.get(komp.key())
+        if old is None or type(old) is not type(komp) or old.name != komp.name:
+            return False
+        if record.files & changed or record.deps != set(komp.aktivate_after()):
+            return False
+        if app is not old_app:
+            # the strukture might be read when the komponent is created (not recorded)
+            if overlay.freeze(old.strukture.data) != overlay.freeze(komp.strukture.data):
+                return False
+            # values that were read are (as a plain value) equal in the old and new konfig
+            for path in record.paths:
+                if konfig_value(old_app, path) != konfig_value(app, path):
+                    logger.verbose(f"{komp.id} read changed konfig path {path}")
+                    return False
+        return True
+
+    def kreate(self, changed: set = frozenset()) -> None:
+        """kreate the files, and only aktivate the komponents that might be changed"""
+        start = time.perf_counter()
+        if self.app is None or changed & self.konfig_files:
+            app = self.cli.kreate_app()
+            self.konfig_files = set(app.konfig.file_getter.local_files())
+        else:
+            # changed local files are loaded again, since their validator changed
+            app = self.app
+        app.target_dir = TargetDir(app.target_path, incremental=True)
+        app.target_dir.prepare()
+        graph = app.dependency_graph()
+        dirty = [komp.key() for komp in app.komponents if not self.is_unchanged(app, komp, changed)]
+        # komponents that depend on a changed komponent are aktivated again as well
+        dirty = _dag.dependents_closure(graph, dirty)
+        records = {}
+        for key in _dag.topological_order(graph):
+            komp = app.komponents_by_key[key]
+            if key in dirty:
+                logger.debug(f"aktivating {key}")
+                records[key] = KompRecord(komp)
+                # memoized fields would not be read (and recorded) again
+                komp.field_index.reset()
+                with self.recording(app, records[key]):
+                    komp.aktivate()
+            else:
+                records[key] = self.records[key]
+                if app is not self.app:
+                    old_komp = self.app.komponents_by_key[key]
+                    komp.set_aktivated_state(old_komp.aktivated_state())
+        for komp in app.select_komponents():
+            if komp.key() in dirty:
+                if komp.get_filename():
+                    logger.info(f"kreating file {komp.get_filename()}")
+                with self.recording(app, records[komp.key()]):
+                    komp.kreate_file()
+            else:
+                for name in records[komp.key()].written:
+                    app.target_dir.keep(name)
+        app.target_dir.finish()
+        seconds = time.perf_counter() - start
+        logger.info(
+            f"aktivated {len(dirty)} of {len(app.komponents)} komponents in {seconds:.2f}s"
+        )
+        self.app = app
+        self.records = records
+        self.watched = {}
+        self.update_watched(app.konfig.file_getter.local_files())
+
+    def update_watched(self, files: Dict[Tuple[str, str], Path]) -> None:
+        for key, path in files.items():
+            self.watched[key] = (path, file_validator(path))
+
+    def changed_files(self) -> set:
+        changed = set()
+        for key, (path, validator) in self.watched.items():
+            new_validator = file_validator(path)
+            if validator[0] == "missing" and new_validator[0] == "missing":
+                # the dir of a missing file changed, but the file is still missing
+                continue
+            if new_validator != validator:
+                changed.add(key)
+        return changed
+
+    def run(self) -> None:
+        from ._jinyaml import share_parsed_yaml
+
+        # unchanged konfig files need not be parsed again when the konfig is reloaded
+        share_parsed_yaml()
+        self.kreate()
+        interval = watch_interval()
+        logger.info(f"watching {len(self.watched)} files, press Ctrl-C to stop")
+        pending = set()
+        while True:
+            time.sleep(interval)
+            changed = self.changed_files()
+            if not changed:
+                continue
+            for key in sorted(changed, key=str):
+                logger.info(f"changed {key[0] + ':' if key[0] else ''}{key[1]}")
+            # a failed kreate is only tried again when another file changes
+            self.update_watched({key: self.watched[key][0] for key in changed})
+            pending |= changed
+            try:
+                self.kreate(pending)
+                pending = set()
+            except Exception as e:
+                logger.error(f"{type(e).__name__}: {e}")
+
+
+def watch(cli: "Cli"):
+    """kreate the files again each time a loaded file changes"""
+    try:
+        Watcher(cli).run()
+    except KeyboardInterrupt:
+        logger.info("stopped watching")
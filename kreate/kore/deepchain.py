@@ -1,51 +1,86 @@
 """
 a chain of maps where an attribute will be checked in any of the maps
+
+The results of lookups (including the child chains) and the merged keys
+are cached, so the maps should not be changed after they are chained,
+or clear_cache() should be called.
 """
 
 from collections.abc import Mapping
 
 # from typing import Mapping
 
+_MISSING = object()
+
 
 class DeepChain(Mapping):
+    __slots__ = ("_maps", "_cache", "_keys")
+
     def __init__(self, *maps: Mapping):
         self._maps = maps
+        self._cache = {}
+        self._keys = None
 
-    def __getitem__(self, key):
-        all_vals = tuple(m.get(key, None) for m in self._maps)
-        vals = tuple(v for v in all_vals if v is not None)
-        nrof_map_vals = sum(isinstance(v, Mapping) for v in vals)
-        if nrof_map_vals > 0:
+    def _lookup(self, key):
+        # scan all maps once, and remember the result
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        found = False
+        vals = []
+        nrof_map_vals = 0
+        for m in self._maps:
+            if key in m:
+                found = True
+                v = m[key]
+                if v is not None:
+                    vals.append(v)
+                    if isinstance(v, Mapping):
+                        nrof_map_vals += 1
+        if not found:
+            result = _MISSING
+        elif nrof_map_vals > 0:
             if nrof_map_vals < len(vals):
                 raise AttributeError(
                     f"key {key} is not mergeable into dictionary "
                     f"since not all values are maps {vals}"
                 )
-            args = list(m for m in vals)
-            return DeepChain(*args)
-        if len(vals) > 0:
-            return vals[0]
-        return None
+            result = DeepChain(*vals)
+        elif vals:
+            result = vals[0]
+        else:
+            result = None
+        self._cache[key] = result
+        return result
+
+    def __getitem__(self, key):
+        result = self._lookup(key)
+        return None if result is _MISSING else result
 
     def __getattr__(self, attr):
-        if attr not in self:
+        if attr.startswith("__") or attr in DeepChain.__slots__:
+            # prevent recursion for special or unset attributes (e.g. when copying)
+            raise AttributeError(attr)
+        result = self._lookup(attr)
+        if result is _MISSING:
             raise AttributeError(
                 f"DeepChain object could not find attribute {attr} in {self}"
             )
-        else:
-            return self[attr]
+        return result
 
-    def get(self, attr, default):
-        if attr in self:
-            return self[attr]
-        return default
+    def get(self, attr, default=None):
+        result = self._lookup(attr)
+        return default if result is _MISSING else result
 
     def keys(self):
-        result = set()
-        for m in self._maps:
-            for k in m.keys():
-                result.add(k)
-        return result
+        if self._keys is None:
+            result = {}
+            for m in self._maps:
+                for k in m.keys():
+                    result[k] = None
+            self._keys = result.keys()
+        return self._keys
 
     def __len__(self):
         return len(self.keys())
@@ -54,6 +89,8 @@ class DeepChain(Mapping):
         return iter(self.keys())
 
     def __contains__(self, key):
+        if key in self._cache:
+            return self._cache[key] is not _MISSING
         for m in self._maps:
             if key in m:
                 return True
@@ -61,3 +98,15 @@ class DeepChain(Mapping):
 
     def __repr__(self):
         return f"DeepChain({self._maps})"
+
+    def clear_cache(self) -> None:
+        self._cache = {}
+        self._keys = None
+
+    def freeze(self) -> dict:
+        """merge all maps into one flat dict, with nested dicts instead of chains"""
+        result = {}
+        for key in self.keys():
+            val = self[key]
+            result[key] = val.freeze() if isinstance(val, DeepChain) else val
+        return result
@@ -0,0 +1,203 @@
+"""
+a map that is built from layers of other maps, without copying them
+
+Adding a layer has the same result as deep_update, but a value of a key that
+is new is only remembered, not copied. It is resolved the first time it is
+read, or when another layer has a value for the same key: then both values
+are merged, so values that are overwritten are not kept. Nested maps are
+resolved as OverlayMaps as well, so only the parts of the konfig that are
+actually used (or in more than one layer) are merged.
+Resolved values are cached, and all writes (and later layers) are applied
+to these cached values.
+
+The layers should not be changed after they are added.
+
+Each nested OverlayMap knows it's path in the toplevel map, so all keys that
+are read (including keys that are missing or iterated) can be recorded,
+e.g. to find out which komponents need to be kreated again when a konfig
+file is changed in watch mode.
+"""
+
+from collections.abc import Mapping, MutableMapping, Sequence
+
+from ._core import deep_update
+
+
+class _Absent:
+    def __reduce__(self):
+        return "_ABSENT"
+
+    def __repr__(self):
+        return "_ABSENT"
+
+
+_ABSENT = _Absent()
+_DO_NOT_OVERWRITE = "_do_not_overwrite"
+
+
+class _Keys:
+    def __repr__(self):
+        return "KEYS"
+
+
+# a path that ends with KEYS means the keys of a map were iterated (or counted)
+KEYS = _Keys()
+# the paths that are read from all OverlayMaps, or None if reads are not recorded
+_read_paths = None
+
+
+def record_reads(paths: set) -> None:
+    """record all paths that are read in the given set, or stop recording with None"""
+    global _read_paths
+    _read_paths = paths
+
+
+def _is_seq(value) -> bool:
+    return isinstance(value, Sequence) and not isinstance(value, str)
+
+
+def _kind(value) -> str:
+    if isinstance(value, Mapping):
+        return "map"
+    if _is_seq(value):
+        return "seq"
+    return "scalar"
+
+
+class OverlayMap(MutableMapping):
+    __slots__ = ("_pending", "_resolved", "_order", "_path")
+
+    def __init__(self, base: Mapping = None, path: tuple = ()):
+        self._path = path
+        self._resolved = {}
+        # the values of the keys that are not resolved yet, as in their layer
+        self._pending = dict(base) if base is not None else {}
+        # all keys, in order of insertion
+        self._order = dict.fromkeys(self._pending)
+
+    def add_layer(
+        self, layer: Mapping, overwrite: bool = True, list_insert_index: dict = None
+    ) -> None:
+        """merge a layer, with the same semantics as deep_update"""
+        if layer.get(_DO_NOT_OVERWRITE, False):
+            overwrite = False
+        list_insert_index = list_insert_index or {}
+        for k, v in layer.items():
+            if k in self._pending:
+                # merge the values now, so the overwritten values are not kept
+                self._resolve_done(k, self._resolve(k))
+            if k in self._resolved:
+                value = self._merge(
+                    self._resolved[k], k, v, overwrite, list_insert_index, self._path
+                )
+                self._resolved[k] = value
+                if value is not _ABSENT:
+                    self._order[k] = None
+            elif k != _DO_NOT_OVERWRITE or _kind(v) != "scalar":
+                self._order[k] = None
+                self._pending[k] = v
+
+    @staticmethod
+    def _merge(state, k, v, overwrite: bool, list_insert_index: dict, path: tuple = ()):
+        if isinstance(v, Mapping):
+            if state is _ABSENT:
+                return OverlayMap(v, path + (k,))
+            if isinstance(state, OverlayMap):
+                state.add_layer(v, overwrite=overwrite)
+            elif isinstance(state, Mapping):
+                deep_update(state, v, overwrite=overwrite)
+            else:
+                raise ValueError(
+                    f"trying to merge key {k} map {v} into non-map {state}"
+                )
+            return state
+        if _is_seq(v):
+            if state is _ABSENT:
+                return list(v)
+            if not _is_seq(state):
+                raise ValueError(
+                    f"trying to merge key {k} sequence {v}"
+                    f" into non-sequence {state}"
+                )
+            if k in list_insert_index:
+                idx = list_insert_index[k]
+                state[idx:idx] = v
+            else:
+                for item in v:
+                    state.append(item)
+            return state
+        if (overwrite or state is _ABSENT) and k != _DO_NOT_OVERWRITE:
+            return v
+        return state
+
+    def _resolve(self, key):
+        value = self._pending.get(key, _ABSENT)
+        if isinstance(value, Mapping):
+            return OverlayMap(value, self._path + (key,))
+        if _is_seq(value):
+            return list(value)
+        return value
+
+    def __getitem__(self, key):
+        if _read_paths is not None:
+            _read_paths.add(self._path + (key,))
+        try:
+            value = self._resolved[key]
+        except KeyError:
+            if key not in self._order:
+                raise
+            value = self._resolve(key)
+            self._resolve_done(key, value)
+        if value is _ABSENT:
+            raise KeyError(key)
+        return value
+
+    def _resolve_done(self, key, value) -> None:
+        # the value of the layer is not needed anymore
+        self._pending.pop(key, None)
+        self._resolved[key] = value
+
+    def __setitem__(self, key, value):
+        self._resolve_done(key, value)
+        self._order[key] = None
+
+    def __delitem__(self, key):
+        del self._order[key]
+        self._pending.pop(key, None)
+        self._resolved[key] = _ABSENT
+
+    def __contains__(self, key):
+        if _read_paths is not None:
+            _read_paths.add(self._path + (key,))
+        return key in self._order
+
+    def __iter__(self):
+        if _read_paths is not None:
+            _read_paths.add(self._path + (KEYS,))
+        return iter(self._order)
+
+    def __len__(self):
+        if _read_paths is not None:
+            _read_paths.add(self._path + (KEYS,))
+        return len(self._order)
+
+    def __repr__(self):
+        return "{" + ", ".join(f"{k!r}: {v!r}" for k, v in self.items()) + "}"
+
+    def freeze(self) -> dict:
+        """return a plain (nested) dict with all values resolved"""
+        return freeze(self)
+
+
+def freeze(value):
+    """replace all OverlayMaps in a value by plain dicts"""
+    if isinstance(value, OverlayMap):
+        return {k: freeze(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [freeze(item) for item in value]
+    return value
+
+
+def represent_overlay(representer, data: OverlayMap):
+    """a representer for ruamel.yaml, to dump an OverlayMap as a normal map"""
+    return representer.represent_dict(dict(data.items()))
@@ -2,12 +2,15 @@ import logging
 import os
 import base64
 import sys
-import jinja2.filters
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-from ..kore import Cli, Konfig, Module
+from ..kore import Cli, Module
 from . import krypt_functions
 
+if TYPE_CHECKING:  # Only imports the below statements during type checking
+    from ..kore import Konfig
+
 logger = logging.getLogger(__name__)
 
 
@@ -20,21 +23,31 @@ def dekrypt_str(s: str) -> str:
 
 
 class KryptModule(Module):
-    def init_konfig(self, konfig: Konfig):
+    def init_konfig(self, konfig: "Konfig"):
         self.konfig = konfig  # TODO: this is not really how this is intended
-        krypt_functions._key_finder = self
-        konfig.dekrypt_bytes = dekrypt_bytes
-        konfig.dekrypt_str = dekrypt_str
+        krypt_functions.set_key_finder(self)
+
+        # mark the konfig as dekrypted, so it will not be stored in a snapshot
+        def konfig_dekrypt_bytes(b: bytes) -> bytes:
+            konfig.dekrypted = True
+            return dekrypt_bytes(b)
+
+        def konfig_dekrypt_str(s: str) -> str:
+            konfig.dekrypted = True
+            return dekrypt_str(s)
+
+        konfig.dekrypt_bytes = konfig_dekrypt_bytes
+        konfig.dekrypt_str = konfig_dekrypt_str
+        konfig.jinyaml.add_jinja_filter("dekrypt", konfig_dekrypt_str)
 
     def init_cli(self, cli: Cli):
-        jinja2.filters.FILTERS["dekrypt"] = krypt_functions.dekrypt_str
         cli.add_help_section("krypt commands:")
         self.add_krypt_options(cli)
         self.add_krypt_subcommands(cli)
 
     def process_cli_options(self, cli: Cli):
-        if cli.args.testdummy:
-            krypt_functions._dekrypt_testdummy = True
+        # a process of kreate serve might have been forked after loading a konfig with dummies
+        krypt_functions._dekrypt_testdummy = bool(cli.args.testdummy)
 
     def get_krypt_key(self):
         krypt_key = self.default_krypt_key().encode()
@@ -75,7 +88,7 @@ def aliases():
 
 
 def dekrypt(cli: Cli):
-    """dekrypt lines|string|file <file> (abbrevs l|s|str|f|v)"""
+    """dekrypt lines|string|file <file>... (abbrevs l|s|str|f|v)"""
     if len(cli.params) == 0:
         raise ValueError(
             "dekrypt should have at least a second param: lines, file or string"
@@ -95,7 +108,7 @@ def dekrypt(cli: Cli):
 
 
 def enkrypt(cli: Cli):
-    """enkrypt lines|string|file <file> (abbrevs l|s|str|f)"""
+    """enkrypt lines|string|file <file>... (abbrevs l|s|str|f)"""
     if len(cli.params) == 0:
         raise ValueError(
             "dekrypt should have at least a second param: lines, file, view or string"
@@ -114,15 +127,18 @@ def enkrypt(cli: Cli):
         raise ValueError(f"unknown dekrypt subcommand {subcmd}")
 
 
+def lines_files(cli: Cli, konfig: "Konfig"):
+    if len(cli.params) > 1:
+        return cli.params[1:]
+    return [list(konfig.main_konfig_path.parent.glob("secret*konf"))[0]]
+
+
 def dek_lines(cli: Cli, stdout=False):
-    """dekrypt lines in a text file"""
+    """dekrypt lines in one or more text files"""
     konfig: "Konfig" = cli.kreate_konfig()
-    if len(cli.params) > 1:
-        file = cli.params[1]
-    else:
-        file = list(konfig.main_konfig_path.parent.glob("secret*konf"))[0]
-    logger.info(f"dekrypting lines of {file}")
-    krypt_functions.dekrypt_lines(file, ".", stdout=stdout)
+    for file in lines_files(cli, konfig):
+        logger.info(f"dekrypting lines of {file}")
+        krypt_functions.dekrypt_lines(file, ".", stdout=stdout)
 
 
 def dekstr(cli: Cli):
@@ -139,30 +155,27 @@ def dekstr(cli: Cli):
 
 
 def dekfile(cli: Cli):
-    "dekrypt an entire file"
+    "dekrypt one or more entire files"
     cli.kreate_konfig()  # init konfig to set the secret value
-    file = cli.params[1]
-    logger.info(f"dekrypting file {file}")
-    krypt_functions.dekrypt_file(file)
+    for file in cli.params[1:]:
+        logger.info(f"dekrypting file {file}")
+        krypt_functions.dekrypt_file(file)
 
 
 def enk_lines(cli: Cli, stdout=False):
-    "enkrypt lines in a text file"
+    "enkrypt lines in one or more text files"
     konfig: "Konfig" = cli.kreate_konfig()
-    if len(cli.params) > 1:
-        file = cli.params[1]
-    else:
-        file = list(konfig.main_konfig_path.parent.glob("secret*konf"))[0]
-    logger.info(f"enkrypting lines of {file}")
-    krypt_functions.enkrypt_lines(file, ".", stdout=stdout)
+    for file in lines_files(cli, konfig):
+        logger.info(f"enkrypting lines of {file}")
+        krypt_functions.enkrypt_lines(file, ".", stdout=stdout)
 
 
 def enkfile(cli: Cli):
-    "enkrypt an entire file"
+    "enkrypt one or more entire files"
     cli.kreate_konfig()
-    file = cli.params[1]
-    logger.info(f"enkrypting file {file}")
-    krypt_functions.enkrypt_file(file)
+    for file in cli.params[1:]:
+        logger.info(f"enkrypting file {file}")
+        krypt_functions.enkrypt_file(file)
 
 
 def enkstr(cli: Cli):
@@ -1,25 +1,61 @@
-from cryptography.fernet import Fernet
+import atexit
+import functools
 import logging
 import os
+import shutil
+import struct
 import sys
 
 logger = logging.getLogger(__name__)
 
 _key_finder = None
 _krypt_key = None
+_fernet = None
 _dekrypt_testdummy = False
+# the maximum number of dekrypted values that are remembered
+MEMO_SIZE = 4096
+# large files are enkrypted in chunks, with one fernet token per line
+CHUNKED_HEADER = b"kreate-krypt-chunked-v1"
+CHUNK_SIZE = 1024 * 1024
+# the index of each chunk and a flag for the last chunk are enkrypted with the chunk,
+# so chunks can not be reordered or removed without being noticed
+_CHUNK_PREFIX = struct.Struct(">IB")
+# use the parts to prevent changes if secret was not changed
+_IV = b"\xbd\xc0,\x16\x87\xd7G\xb5\xe5\xcc\xdb\xf9\x07\xaf\xa0\xfa"
+
+
+def set_key_finder(key_finder) -> None:
+    """use the key of a new konfig, and forget everything of the previous key"""
+    global _key_finder, _krypt_key, _fernet
+    _key_finder = key_finder
+    _krypt_key = None
+    _fernet = None
+    _dekrypt_cached.cache_clear()
 
 
 def _get_key():
-    global _krypt_key
+    global _krypt_key, _fernet
+    if _fernet:
+        return _fernet
     if not _krypt_key:
-        global _key_finder
         if not _key_finder:
             raise ValueError("No konfig tosearch for _krypt_key")
         _krypt_key = _key_finder.get_krypt_key()
         if not _krypt_key:
             raise ValueError("_krypt_key is empty")
-    return Fernet(_krypt_key)
+    from cryptography.fernet import Fernet  # imported when needed, for faster startup
+
+    _fernet = Fernet(_krypt_key)
+    return _fernet
+
+
+@functools.lru_cache(maxsize=MEMO_SIZE)
+def _dekrypt_cached(value: bytes) -> bytes:
+    # the dekrypted values are only kept in memory, and forgotten at exit
+    return _get_key().decrypt(value)
+
+
+atexit.register(_dekrypt_cached.cache_clear)
 
 
 def dekrypt_str(value: str) -> str:
@@ -27,48 +63,102 @@ def dekrypt_str(value: str) -> str:
 
 
 def dekrypt_bytes(value: bytes) -> bytes:
-    fernet = _get_key()
     if _dekrypt_testdummy:
+        # the key is not needed (or kept in memory) for dummies
         format = os.getenv("KREATE_DUMMY_DEKRYPT_FORMAT")
         format = format or "test-dummy"
         return format.format(value=value).encode()
-    return fernet.decrypt(value)
+    if value.startswith(CHUNKED_HEADER):
+        return b"".join(_dekrypt_chunks(value.splitlines()))
+    return _dekrypt_cached(bytes(value))
 
 
-def dekrypt_file(filename: str):
+def _enkrypt_chunks(f):
+    """generate the lines of a chunked enkrypted file, reading f in chunks"""
     fernet = _get_key()
-    with open(filename) as f:
-        data = f.read()
+    yield CHUNKED_HEADER + b"\n"
+    idx = 0
+    chunk = f.read(CHUNK_SIZE)
+    while True:
+        next_chunk = f.read(CHUNK_SIZE)
+        prefix = _CHUNK_PREFIX.pack(idx, 0 if next_chunk else 1)
+        yield fernet._encrypt_from_parts(prefix + chunk, 0, _IV) + b"\n"
+        if not next_chunk:
+            return
+        chunk = next_chunk
+        idx += 1
+
+
+def _dekrypt_chunks(lines):
+    """generate the dekrypted chunks of the lines of a chunked enkrypted file"""
+    fernet = _get_key()
+    expected = 0
+    last = False
+    for line in lines:
+        line = line.strip()
+        if not line or line == CHUNKED_HEADER:
+            continue
+        if last:
+            raise ValueError("enkrypted data found after the last chunk")
+        data = fernet.decrypt(line)
+        idx, last = _CHUNK_PREFIX.unpack_from(data)
+        if idx != expected:
+            raise ValueError(f"enkrypted chunk {idx} found, expected chunk {expected}")
+        expected += 1
+        yield data[_CHUNK_PREFIX.size :]
+    if not last:
+        raise ValueError("enkrypted data is incomplete, last chunk is missing")
+
+
+def _write_atomic(filename: str, chunks) -> None:
+    tmp_filename = f"{filename}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_filename, "wb") as out:
+            for chunk in chunks:
+                out.write(chunk)
+        if os.path.exists(filename):
+            shutil.copymode(filename, tmp_filename)
+        os.replace(tmp_filename, filename)
+    finally:
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+
+
+def dekrypt_file(filename: str):
+    with open(filename, "rb") as f:
+        if f.readline().strip() == CHUNKED_HEADER and not _dekrypt_testdummy:
+            # stream the chunks, so large files do not need to fit in memory
+            _write_atomic(filename + ".decrypted", _dekrypt_chunks(f))
+            return
+        f.seek(0)
+        data = f.read().decode()
     if _dekrypt_testdummy:
         format = os.getenv("KREATE_DUMMY_DEKRYPT_FORMAT")
         format = format or "testdummy-{value[len(value)//2-4:len(value)//2+4]}"
         return format.format(value=data)
+    fernet = _get_key()
     with open(filename + ".decrypted", "wb") as out:
         out.write(fernet.decrypt(data.encode()))
 
 
 def enkrypt_str(value):
     fernet = _get_key()
-    part = b"\xbd\xc0,\x16\x87\xd7G\xb5\xe5\xcc\xdb\xf9\x07\xaf\xa0\xfa"
-    # use the parts to prevent changes if secret was not changed
-    return fernet._encrypt_from_parts(value.encode(), 0, part).decode()
+    return fernet._encrypt_from_parts(value.encode(), 0, _IV).decode()
 
 
 def enkrypt_file(filename: str):
-    fernet = _get_key()
     with open(filename, "rb") as f:
-        data = f.read()
-    with open(filename + ".encrypted", "wb") as f:
-        part = b"\xbd\xc0,\x16\x87\xd7G\xb5\xe5\xcc\xdb\xf9\x07\xaf\xa0\xfa"
-        f.write(fernet._encrypt_from_parts(data, 0, part))
+        _write_atomic(filename + ".encrypted", _enkrypt_chunks(f))
 
 
 def change_lines(
     filename: str, func, from_: str, to_: str, dir: str = None, stdout=False
-):
+) -> bool:
+    """change all lines with from_, and return True if the file was changed"""
     dir = dir or "."
     with open(f"{dir}/{filename}") as f:
         lines = f.readlines()
+    orig_lines = list(lines)
     for idx, line in enumerate(lines):
         # line = line.rstrip()
         if from_ in line:
@@ -83,14 +173,21 @@ def change_lines(
                 logger.error(f"problem with {func} in {parts[0]}: {e}")
     if stdout:
         sys.stdout.writelines(lines)
+    elif lines == orig_lines:
+        logger.info(f"{filename} is not changed")
+        return False
     else:
-        with open(f"{dir}/{filename}", "w") as f:
-            f.writelines(lines)
+        _write_atomic(f"{dir}/{filename}", (line.encode() for line in lines))
+    return True
 
 
-def dekrypt_lines(filename: str, dir: str = None, stdout=False):
-    change_lines(filename, dekrypt_str, "dekrypt:", "enkrypt:", dir=dir, stdout=stdout)
+def dekrypt_lines(filename: str, dir: str = None, stdout=False) -> bool:
+    return change_lines(
+        filename, dekrypt_str, "dekrypt:", "enkrypt:", dir=dir, stdout=stdout
+    )
 
 
-def enkrypt_lines(filename: str, dir: str = None, stdout=False):
-    change_lines(filename, enkrypt_str, "enkrypt:", "dekrypt:", dir=dir, stdout=stdout)
+def enkrypt_lines(filename: str, dir: str = None, stdout=False) -> bool:
+    return change_lines(
+        filename, enkrypt_str, "enkrypt:", "dekrypt:", dir=dir, stdout=stdout
+    )
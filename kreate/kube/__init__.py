@@ -1,8 +1,22 @@
-from ._kube import KubeModule
-from ._kust import Kustomization
+import importlib
+from typing import TYPE_CHECKING
 
+if TYPE_CHECKING:  # Only imports the below statements during type checking
+    from ._kube import KubeModule
+    from ._kust import Kustomization
 
-__all__ = [
-    KubeModule.__name__,
-    Kustomization.__name__,
-]
+# the submodules are only imported when used, so a client of kreate serve starts fast
+_lazy_imports = {
+    "KubeModule": "._kube",
+    "Kustomization": "._kust",
+}
+
+__all__ = list(_lazy_imports)
+
+
+def __getattr__(name: str):
+    if name not in _lazy_imports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_lazy_imports[name], __name__), name)
+    globals()[name] = value
+    return value
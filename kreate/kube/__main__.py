@@ -1,12 +1,23 @@
-from kreate.kore._kontext import Kontext
-from kreate.kore._kore import KoreModule
-from kreate.krypt._krypt import KryptModule
-from kreate.kube._kube import KubeModule
-from kreate.kube._kust import KustomizeModule
-from kreate.kore._cli import Cli
+import os
+import sys
 
 
 def main():
+    # the client (with socket and json) is only imported in client mode
+    if os.getenv("KREATE_SERVE_CLIENT", "False") == "True":
+        from kreate.kore._client import forward_to_server
+
+        exit_code = forward_to_server()
+        if exit_code is not None:
+            sys.exit(exit_code)
+    # only imported when the command is not handled by a kreate server
+    from kreate.kore._kontext import Kontext
+    from kreate.kore._kore import KoreModule
+    from kreate.krypt._krypt import KryptModule
+    from kreate.kube._kube import KubeModule
+    from kreate.kube._kust import KustomizeModule
+    from kreate.kore._cli import Cli
+
     kontext: Kontext = Kontext()
     kontext.add_module(KoreModule())
     kontext.add_module(KryptModule())
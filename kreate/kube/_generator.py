@@ -0,0 +1,194 @@
+"""
+kustomize compatible configMapGenerator and secretGenerator
+
+A generated ConfigMap or Secret gets a suffix with a hash of it's content.
+kustomize computes this hash as a sha256 of a json encoding (as done by go)
+of the kind, name, type and data of the resource. The same hash is computed
+here, so the generated names are known without running kustomize.
+In current versions of kustomize the name in this encoding is always empty
+(it looks up a field `metadata/name` instead of the name in the metadata),
+so the hash only depends on the content, as in the recorded output of the
+demo app.
+"""
+
+import base64
+import hashlib
+from collections.abc import Mapping
+from pathlib import PurePosixPath
+from typing import Callable, Dict, List, Tuple
+
+# the generator fields of a kustomization, with the kind of resource they generate
+GENERATORS = (("configMapGenerator", "ConfigMap"), ("secretGenerator", "Secret"))
+# kustomize replaces characters in the hash to avoid (bad) words
+_HASH_CHARS = str.maketrans("013ae", "ghkmt")
+# characters that go's json.Marshal escapes, besides other control characters
+_GO_JSON_ESCAPES = {
+    '"': '\\"',
+    "\\": "\\\\",
+    "\n": "\\n",
+    "\r": "\\r",
+    "\t": "\\t",
+    "<": "\\u003c",
+    ">": "\\u003e",
+    "&": "\\u0026",
+    "\u2028": "\\u2028",
+    "\u2029": "\\u2029",
+}
+
+
+def _go_json_str(text: str) -> str:
+    result = ['"']
+    for ch in text:
+        if ch in _GO_JSON_ESCAPES:
+            result.append(_GO_JSON_ESCAPES[ch])
+        elif ord(ch) < 0x20:
+            result.append(f"\\u{ord(ch):04x}")
+        else:
+            result.append(ch)
+    result.append('"')
+    return "".join(result)
+
+
+def go_json(value) -> str:
+    """the same json encoding as go's json.Marshal, for (nested) maps of strings"""
+    if isinstance(value, Mapping):
+        items = (f"{_go_json_str(k)}:{go_json(value[k])}" for k in sorted(value))
+        return "{" + ",".join(items) + "}"
+    if value is None:
+        return "null"
+    return _go_json_str(str(value))
+
+
+def encode_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()[:10].translate(_HASH_CHARS)
+
+
+def generated_hash(resource: Mapping) -> str:
+    """the hash that kustomize adds as suffix to a generated ConfigMap or Secret"""
+    kind = resource["kind"]
+    fields = {
+        "kind": kind,
+        # kustomize does not find the name, see above
+        "name": "",
+        "data": resource.get("data") or "",
+    }
+    if kind == "ConfigMap":
+        if resource.get("binaryData"):
+            fields["binaryData"] = resource["binaryData"]
+    elif kind == "Secret":
+        fields["type"] = resource.get("type", "")
+        if resource.get("stringData"):
+            fields["stringData"] = resource["stringData"]
+    else:
+        raise ValueError(f"can not compute a hash for kind {kind}")
+    return encode_hash(go_json(fields))
+
+
+def literal_source(source: str) -> Tuple[str, str]:
+    """the key and value of a literal `key=value`, without surrounding quotes"""
+    key, sep, value = str(source).partition("=")
+    if not key or not sep:
+        raise ValueError(f"invalid literal source {source}, expected key=value")
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+        value = value[1:-1]
+    return key, value
+
+
+def file_source(source: str) -> Tuple[str, str]:
+    """the key and path of a file source `path` or `key=path`"""
+    key, sep, path = str(source).partition("=")
+    if not sep:
+        return PurePosixPath(key).name, key
+    if not key or not path:
+        raise ValueError(f"invalid file source {source}, expected key=path")
+    return key, path
+
+
+def generator_data(args: Mapping, load_file: Callable[[str], bytes]) -> dict:
+    """the keys and values (as bytes) of the literals and files of a generator"""
+    if args.get("envs") or args.get("env"):
+        raise ValueError(f"env files are not supported, in generator {args.get('name')}")
+    data = {}
+    sources = [literal_source(src) for src in args.get("literals") or []]
+    for src in args.get("files") or []:
+        key, path = file_source(src)
+        sources.append((key, load_file(path)))
+    for key, value in sources:
+        if key in data:
+            raise ValueError(
+                f"cannot add key {key} in {args.get('name')}, "
+                "another key by that name already exists"
+            )
+        data[key] = value.encode() if isinstance(value, str) else value
+    return data
+
+
+def _is_text(value: bytes) -> bool:
+    try:
+        value.decode()
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def generate(kind: str, args: Mapping, options: Mapping, load_file: Callable) -> dict:
+    """
+    a ConfigMap or Secret for an entry of a configMapGenerator or secretGenerator
+
+    The name does not have the hash suffix yet, since kustomize adds it
+    after the patches are applied.
+    """
+    options = options or {}
+    own_options = args.get("options") or {}
+    metadata = {"name": args["name"]}
+    if args.get("namespace"):
+        metadata["namespace"] = args["namespace"]
+    for field in ("labels", "annotations"):
+        values = {**(options.get(field) or {}), **(own_options.get(field) or {})}
+        if values:
+            metadata[field] = values
+    resource = {"apiVersion": "v1", "kind": kind, "metadata": metadata}
+    data = generator_data(args, load_file)
+    if kind == "ConfigMap":
+        text = {k: v.decode() for k, v in data.items() if _is_text(v)}
+        binary = {k: base64.b64encode(v).decode() for k, v in data.items() if k not in text}
+        if text:
+            resource["data"] = text
+        if binary:
+            resource["binaryData"] = binary
+    else:
+        resource["type"] = args.get("type") or "Opaque"
+        if data:
+            resource["data"] = {k: base64.b64encode(v).decode() for k, v in data.items()}
+    if own_options.get("immutable", options.get("immutable")):
+        resource["immutable"] = True
+    return resource
+
+
+def needs_hash(args: Mapping, options: Mapping) -> bool:
+    own_options = args.get("options") or {}
+    disabled = own_options.get("disableNameSuffixHash")
+    if disabled is None:
+        disabled = (options or {}).get("disableNameSuffixHash", False)
+    return not disabled
+
+
+def generated_resources(kustomization: Mapping, load_file: Callable) -> List[Tuple[str, dict]]:
+    """the generated resources (with hash suffix in their name), with their name without suffix"""
+    options = kustomization.get("generatorOptions") or {}
+    result = []
+    for field, kind in GENERATORS:
+        for args in kustomization.get(field) or []:
+            resource = generate(kind, args, options, load_file)
+            if needs_hash(args, options):
+                resource["metadata"]["name"] = f"{args['name']}-{generated_hash(resource)}"
+            result.append((args["name"], resource))
+    return result
+
+
+def generated_names(kustomization: Mapping, load_file: Callable) -> Dict[Tuple[str, str], str]:
+    """the names (with hash suffix) of the generated resources, by kind and name"""
+    return {
+        (res["kind"], name): res["metadata"]["name"]
+        for name, res in generated_resources(kustomization, load_file)
+    }
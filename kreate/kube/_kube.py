@@ -4,16 +4,19 @@ import logging
 import os
 import re
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 #import yaml
 
 from .resource import CustomResource
-from ..kore import Kontext, Module, Konfig, App, Cli
+from ..kore import Kontext, Module, Cli
 from ..krypt import krypt_functions
 from ..kore._core import pprint_map
-from ..kore._repo import PythonPackageRepo
 from .vardiff import vardiff, dump
 
+if TYPE_CHECKING:  # Only imports the below statements during type checking
+    from ..kore import Konfig, App
+
 logger = logging.getLogger(__name__)
 
 
@@ -34,7 +37,9 @@ class KubeModule(Module):
         cli.add_subcommand(test_diff, aliases=["td"])
         cli.add_subcommand(test_diff_update, aliases=["tdu"])
 
-    def init_konfig(self, konfig: Konfig):
+    def init_konfig(self, konfig: "Konfig"):
+        from ..kore._repo import PythonPackageRepo  # only needed when a konfig is loaded
+
         konfig.file_getter.repo_prefixes["kreate-kube-framework"] = (
             PythonPackageRepo(konfig, "kreate-kube-framework", {
                 "package": "kreate.kube",
@@ -51,14 +56,16 @@ class KubeModule(Module):
         )
 
 
-    def init_app(self, app: App) -> None:
+    def init_app(self, app: "App") -> None:
         app.register_klass(CustomResource)
 
 
 def build(cli: Cli) -> None:
     """output all the resources"""
+    from ._kustomize import run_build
+
     app = cli.kreate_files()
-    print(cli.run_command(app, "build"))
+    print(run_build(cli, app))
 
 
 def diff(cli: Cli) -> None:
@@ -161,7 +168,7 @@ def apply(cli: Cli) -> None:
     print(cli.run_command(app, "apply"))
 
 
-def expected_output_location(konfig: Konfig) -> str:
+def expected_output_location(konfig: "Konfig") -> str:
     loc = os.getenv("KREATE_TEST_EXPECTED_OUTPUT_LOCATION")
     loc = loc or konfig.get_path("tests.expected_output_location")
     loc = loc or "cwd:tests/expected-output-{konfig.app.appname}-{konfig.app.env}.out"
@@ -169,7 +176,7 @@ def expected_output_location(konfig: Konfig) -> str:
     return loc
 
 
-def expected_diff_location(konfig: Konfig) -> str:
+def expected_diff_location(konfig: "Konfig") -> str:
     loc = os.getenv("KREATE_TEST_EXPECTED_DIFF_LOCATION")
     loc = loc or konfig.get_path("tests.expected_diff_location")
     loc = loc or "cwd:tests/expected-diff-{konfig.app.appname}-{konfig.app.env}.out"
@@ -177,10 +184,12 @@ def expected_diff_location(konfig: Konfig) -> str:
     return loc
 
 
-def build_output(cli: Cli, app: App) -> str:
+def build_output(cli: Cli, app: "App") -> str:
+    from ._kustomize import run_build
+
     # Do not dekrypt secrets for testing
     krypt_functions._dekrypt_testdummy = True
-    return cli.run_command(app, "build")
+    return run_build(cli, app)
 
 
 def truncate_ignores(ignores, lines):
@@ -193,7 +202,7 @@ def truncate_ignores(ignores, lines):
     return lines
 
 
-def test_result(cli: Cli, app: App, n=0):
+def test_result(cli: Cli, app: "App", n=0):
     ignores = []  # cli.konfig().get_path("tests.ignore", [])
     build_lines = build_output(cli, app).splitlines()
     loc = expected_output_location(app.konfig)
@@ -4,6 +4,7 @@ from pathlib import Path
 from ..kore import JinYamlKomponent, Module, App, KomponentKlass
 from .resource import Resource, MultiDocumentResource
 from .patch import Patch, CustomPatch
+from ._generator import generated_names
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +34,10 @@ class KustomizeModule(Module):
 
 
 class Kustomization(JinYamlKomponent):
+    def __init__(self, app: App, klass: KomponentKlass, shortname: str = None):
+        super().__init__(app, klass, shortname)
+        self._generated_names = None
+
     def resources(self):
         return [
             res
@@ -43,6 +48,9 @@ class Kustomization(JinYamlKomponent):
     def patches(self):
         return [res for res in self.app.komponents if isinstance(res, Patch)]
 
+    def aktivate_after(self):
+        return [komp.id for komp in self.resources() + self.patches()]
+
     def var(self, cm: str, varname: str):
         value = self.strukture.get_path(f"configmaps.{cm}.vars.{varname}")
         if not isinstance(value, str):
@@ -52,33 +60,30 @@ class Kustomization(JinYamlKomponent):
         return value
 
 
-    def _write_data(self, data: str, target: Path) -> None:
-        dir = target.parent
-        dir.mkdir(parents=True, exist_ok=True)
-        if isinstance(data, bytes):
-            data = data.decode()
-        target.write_text(data)
+    def _write_data(self, data: str, target: Path, secret: bool = False) -> None:
+        self.app.write_file(target, data, secret=secret)
 
-    def _find_and_kopy_file(self, filename: str, target: Path, search_path):
-        if target.exists():
-            logger.verbose(f"kust file {filename} already kreated in {target}")
-            return
+    def _find_file(self, filename: str, search_path) -> tuple:
+        """the location and data of a file to kopy"""
         if loc := self.app.konfig.get_path("file", {}).get(filename):
-                logger.info(f"kopying file {loc} to {target}")
-                data = self.app.konfig.file_getter.get_data(loc)
-                self._write_data(data, target)
-                return
+            return loc, self.app.konfig.file_getter.get_data(loc)
         logger.verbose(f"looking for {filename} in {search_path}")
         for path in search_path:
             logger.verbose(f"looking for {filename} to kopy in {path}")
             p =  str(Path(path) / filename)
             data = self.app.konfig.file_getter.get_data(p)
             if data:
-                logger.info(f"kust file {filename} kopied to {target}")
-                self._write_data(data, target)
-                return
+                return p, data
         raise ValueError(f"Could not find file {filename} in {search_path}, add it to file: section")
 
+    def _find_and_kopy_file(self, filename: str, target: Path, search_path, secret=False):
+        if self.app.target_dir.is_written(target):
+            logger.verbose(f"kust file {filename} already kreated in {target}")
+            return
+        loc, data = self._find_file(filename, search_path)
+        logger.info(f"kopying file {loc} to {target}")
+        self._write_data(data, target, secret)
+
     def kopy_file(self, filename: str, dest: str = "files"):
         search_path = self.app.konfig.get_path("system.search_path.kopy_file", [])
         target = self.app.target_path / Path(dest) / filename
@@ -90,14 +95,98 @@ class Kustomization(JinYamlKomponent):
         search_path = self.app.konfig.get_path("system.search_path.kopy_secret_file", [])
         target = self.app.target_path / Path(dest) / filename
         result = Path(dest) / filename
-        self._find_and_kopy_file(filename, target, search_path)
-        self.app.kontext.add_cleanup_path(target)
+        self._find_and_kopy_file(filename, target, search_path, secret=True)
         return str(result)
 
+    def kopied_file_data(self, path: str) -> bytes:
+        """the data of a file in a generator, as it is (or will be) kopied"""
+        if path.startswith("files/"):
+            search_path = self.app.konfig.get_path("system.search_path.kopy_file", [])
+            return self._find_file(path[len("files/"):], search_path)[1].encode()
+        return (self.app.target_path / path).read_bytes()
+
+    def _generator_varnames(self, strukt_key: str, name: str) -> list:
+        strukt = self.strukture[strukt_key][name] or {}
+        removals = self.strukture.get("remove_vars", {}).get(name, [])
+        return [v for v in sorted(strukt.get("vars", {}).keys()) if v not in removals]
+
+    def secrets_with_vars(self) -> list:
+        """
+        the generated secrets with vars, that are left out of generators(),
+        since the template gets their values with my.secret, not from the strukture
+        """
+        return [
+            name
+            for name in sorted(self.strukture.get("secrets", {}).keys())
+            if self._generator_varnames("secrets", name)
+        ]
+
+    def generators(self) -> dict:
+        """
+        the configMapGenerator and secretGenerator, derived from the strukture
+        in the same way as the template, so they are known before aktivating
+        """
+        result = {"configMapGenerator": [], "secretGenerator": []}
+        for field, strukt_key, label in (
+            ("configMapGenerator", "configmaps", "config-map"),
+            ("secretGenerator", "secrets", "secret"),
+        ):
+            for name in sorted(self.strukture.get(strukt_key, {}).keys()):
+                strukt = self.strukture[strukt_key][name] or {}
+                args = {"name": name, "options": {"labels": {label: name}}}
+                varnames = self._generator_varnames(strukt_key, name)
+                if varnames and field == "secretGenerator":
+                    logger.verbose(f"can not compute the generated secret {name} with vars")
+                    continue
+                if varnames:
+                    args["literals"] = [f"{v}={self.var(name, v)}" for v in varnames]
+                if strukt.get("files", []):
+                    args["files"] = [f"files/{f}" for f in strukt.get("files", [])]
+                result[field].append(args)
+        return result
+
+    def generated_names(self) -> dict:
+        """
+        the names (with hash suffix) of the generated ConfigMaps and Secrets, by kind and name,
+        except for the secrets_with_vars()
+        """
+        # memoized, since every rendered resource needs them (until aktivated again)
+        if self._generated_names is None:
+            self._generated_names = generated_names(self.generators(), self.kopied_file_data)
+        return self._generated_names
+
+    def generated_name(self, kind: str, name: str) -> str:
+        names = self.generated_names()
+        if (kind, name) not in names:
+            raise KeyError(f"the name of generated {kind} {name} is not known")
+        return names[(kind, name)]
+
+    def namespace(self) -> str:
+        """
+        the namespace of the kustomization, also before aktivating:
+        as the template sets it, unless the strukture adds or removes it
+        """
+        if self.yaml is not None:
+            return self.get_path("namespace")
+        if "namespace" in self.strukture.get("remove", []):
+            return None
+        default = self.app.konfig.get_path("app.namespace")
+        return self.strukture.get("add", {}).get("namespace", default)
+
     def get_filename(self):
         return "kustomization.yaml"
 
+    def render_aktivate(self):
+        # aktivating would kopy files, and the generators are known from the strukture
+        return False
+
+    def render_documents(self):
+        from ._kustomize import render_generated
+
+        return render_generated(self)
+
     def aktivate(self):
+        self._generated_names = None
         super().aktivate()
         self.remove_vars()
 
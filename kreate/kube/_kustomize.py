@@ -0,0 +1,632 @@
+"""
+a native build of a kustomization, without running kustomize
+
+Only the parts of kustomize that a kreated kustomization uses are supported:
+resources and strategic merge patches in files, a namespace, and
+configMapGenerator and secretGenerator with literals and files.
+Other fields give an error, so a kustomization is never built differently.
+
+The resources and patches are taken from the aktivated komponents (in memory),
+other files are read from the target dir. The output is the same multi
+document yaml that `kustomize build` prints: the resources are sorted in the
+(legacy) order of kustomize, all keys are sorted, and strings are quoted in
+the same way as go-yaml does.
+"""
+
+import datetime
+import decimal
+import io
+import logging
+import re
+from collections.abc import Mapping
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, List
+
+from . import _generator
+
+if TYPE_CHECKING:  # Only imports the below statements during type checking
+    from ..kore import App, Cli, Komponent
+    from ._kust import Kustomization
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_FIELDS = {
+    "apiVersion",
+    "kind",
+    "namespace",
+    "resources",
+    "patches",
+    "patchesStrategicMerge",
+    "configMapGenerator",
+    "secretGenerator",
+    "generatorOptions",
+}
+
+# the legacy order of kustomize, other kinds are put in between
+ORDER_FIRST = [
+    "Namespace",
+    "ResourceQuota",
+    "StorageClass",
+    "CustomResourceDefinition",
+    "ServiceAccount",
+    "PodSecurityPolicy",
+    "Role",
+    "ClusterRole",
+    "RoleBinding",
+    "ClusterRoleBinding",
+    "ConfigMap",
+    "Secret",
+    "Endpoints",
+    "Service",
+    "LimitRange",
+    "PriorityClass",
+    "PersistentVolume",
+    "PersistentVolumeClaim",
+    "Deployment",
+    "StatefulSet",
+    "CronJob",
+    "PodDisruptionBudget",
+]
+ORDER_LAST = ["MutatingWebhookConfiguration", "ValidatingWebhookConfiguration"]
+
+CLUSTER_SCOPED_KINDS = {
+    "APIService",
+    "ClusterRole",
+    "ClusterRoleBinding",
+    "ComponentStatus",
+    "CSIDriver",
+    "CSINode",
+    "CustomResourceDefinition",
+    "IngressClass",
+    "MutatingWebhookConfiguration",
+    "Namespace",
+    "Node",
+    "PersistentVolume",
+    "PodSecurityPolicy",
+    "PriorityClass",
+    "RuntimeClass",
+    "StorageClass",
+    "ValidatingWebhookConfiguration",
+    "VolumeAttachment",
+}
+
+# the merge keys of lists in the builtin kinds that kreate uses,
+# lists in other kinds (e.g. custom resources) are replaced by a patch
+POD_KINDS = {"Pod", "Deployment", "StatefulSet", "DaemonSet", "ReplicaSet", "Job", "CronJob"}
+MERGE_KINDS = POD_KINDS | {"Service", "ServiceAccount"}
+MERGE_KEYS = {
+    "containers": "name",
+    "initContainers": "name",
+    "ephemeralContainers": "name",
+    "env": "name",
+    "volumes": "name",
+    "imagePullSecrets": "name",
+    "secrets": "name",
+    "volumeMounts": "mountPath",
+    "volumeDevices": "devicePath",
+    "hostAliases": "ip",
+    "topologySpreadConstraints": "topologyKey",
+    "resourceClaims": "name",
+    "schedulingGates": "name",
+}
+# the pod spec of kinds that can refer to generated ConfigMaps and Secrets
+POD_SPEC_PATHS = {
+    "Pod": "spec",
+    "Deployment": "spec.template.spec",
+    "StatefulSet": "spec.template.spec",
+    "DaemonSet": "spec.template.spec",
+    "ReplicaSet": "spec.template.spec",
+    "ReplicationController": "spec.template.spec",
+    "Job": "spec.template.spec",
+    "CronJob": "spec.jobTemplate.spec.template.spec",
+}
+
+
+class _Delete:
+    pass
+
+
+_DELETE = _Delete()
+
+
+def plain(value):
+    """a copy with plain python values, instead of ruamel types"""
+    if isinstance(value, Mapping):
+        return {str(k): plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [plain(item) for item in value]
+    if isinstance(value, str):
+        return str(value)
+    if isinstance(value, bool) or type(value).__name__ == "ScalarBoolean":
+        return bool(value)
+    if isinstance(value, int):
+        return int(value)
+    if isinstance(value, float):
+        value = float(value)
+        # kustomize converts all numbers to json, so 1.0 becomes 1
+        return int(value) if value.is_integer() and abs(value) < 1e21 else value
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def resource_id(res: Mapping) -> str:
+    return f"{res.get('kind')} {res.get('metadata', {}).get('name')}"
+
+
+###########################################################################
+# strategic merge patches
+
+def _without_directives(value):
+    if isinstance(value, Mapping):
+        return {
+            k: _without_directives(v)
+            for k, v in value.items()
+            if v is not None and not k.startswith("$")
+        }
+    if isinstance(value, list):
+        return [
+            _without_directives(item)
+            for item in value
+            if not (isinstance(item, Mapping) and "$patch" in item)
+        ]
+    return value
+
+
+def _merge_key(kind: str, key: str, parent: str):
+    if kind not in MERGE_KINDS:
+        return None
+    if key == "ports":
+        return "port" if kind == "Service" and parent == "spec" else "containerPort"
+    return MERGE_KEYS.get(key)
+
+
+def merge_map(kind: str, dest: dict, patch: Mapping, parent: str = None):
+    directive = patch.get("$patch")
+    if directive == "delete":
+        return _DELETE
+    if directive == "replace":
+        return _without_directives(patch)
+    for key, value in patch.items():
+        if key.startswith("$"):
+            continue
+        if value is None:
+            dest.pop(key, None)
+        elif isinstance(value, Mapping) and isinstance(dest.get(key), dict):
+            merged = merge_map(kind, dest[key], value, key)
+            if merged is _DELETE:
+                del dest[key]
+            else:
+                dest[key] = merged
+        elif isinstance(value, list) and isinstance(dest.get(key), list):
+            dest[key] = merge_list(kind, dest[key], value, _merge_key(kind, key, parent))
+        else:
+            dest[key] = _without_directives(value)
+    return dest
+
+
+def merge_list(kind: str, dest: list, patch: list, merge_key: str):
+    if any(isinstance(item, Mapping) and item.get("$patch") == "replace" for item in patch):
+        return _without_directives(patch)
+    if merge_key is None:
+        return _without_directives(patch)
+    result = list(dest)
+    for item in patch:
+        if not isinstance(item, Mapping) or merge_key not in item:
+            raise ValueError(f"item {item} in patch has no merge key {merge_key}")
+        idx = next(
+            (i for i, old in enumerate(result) if old.get(merge_key) == item[merge_key]),
+            None,
+        )
+        if idx is None:
+            if item.get("$patch") != "delete":
+                result.append(_without_directives(item))
+            continue
+        merged = merge_map(kind, result[idx], item)
+        if merged is _DELETE:
+            result.pop(idx)
+        else:
+            result[idx] = merged
+    return result
+
+
+def _matches(res: Mapping, patch: Mapping) -> bool:
+    if res.get("kind") != patch.get("kind"):
+        return False
+    meta, patch_meta = res.get("metadata", {}), patch.get("metadata", {})
+    if meta.get("name") != patch_meta.get("name"):
+        return False
+    if patch_meta.get("namespace") and meta.get("namespace") != patch_meta["namespace"]:
+        return False
+    group = res.get("apiVersion", "").rpartition("/")[0]
+    patch_group = patch.get("apiVersion", "").rpartition("/")[0]
+    return not patch.get("apiVersion") or group == patch_group
+
+
+def apply_patch(resources: List[dict], patch: Mapping) -> None:
+    targets = [res for res in resources if _matches(res, patch)]
+    if len(targets) != 1:
+        raise ValueError(
+            f"found {len(targets)} targets for patch {resource_id(patch)}, expected 1"
+        )
+    merged = merge_map(targets[0]["kind"], targets[0], patch)
+    if merged is _DELETE:
+        resources.remove(targets[0])
+
+
+###########################################################################
+# name references to generated ConfigMaps and Secrets
+
+def _items(value, path: str) -> list:
+    """all values at a dotted path, where a list is expanded into it's items"""
+    values = [value]
+    for key in path.split("."):
+        found = []
+        for val in values:
+            val = val.get(key) if isinstance(val, Mapping) else None
+            if isinstance(val, list):
+                found.extend(val)
+            elif val is not None:
+                found.append(val)
+        values = found
+    return values
+
+
+def _rename(value, path: str, names: Dict[str, str]) -> None:
+    parent, _, field = path.rpartition(".")
+    for obj in _items(value, parent) if parent else [value]:
+        if isinstance(obj, dict) and obj.get(field) in names:
+            obj[field] = names[obj[field]]
+
+
+def rename_references(res: dict, renames: Dict[str, Dict[str, str]]) -> None:
+    """use the names with hash suffix, at the same fields as kustomize does"""
+    kind = res.get("kind")
+    paths = {"ConfigMap": [], "Secret": []}
+    if kind in POD_SPEC_PATHS:
+        spec = POD_SPEC_PATHS[kind]
+        for containers in ("containers", "initContainers", "ephemeralContainers"):
+            paths["ConfigMap"].append(f"{spec}.{containers}.env.valueFrom.configMapKeyRef.name")
+            paths["ConfigMap"].append(f"{spec}.{containers}.envFrom.configMapRef.name")
+            paths["Secret"].append(f"{spec}.{containers}.env.valueFrom.secretKeyRef.name")
+            paths["Secret"].append(f"{spec}.{containers}.envFrom.secretRef.name")
+        paths["ConfigMap"].append(f"{spec}.volumes.configMap.name")
+        paths["ConfigMap"].append(f"{spec}.volumes.projected.sources.configMap.name")
+        paths["Secret"].append(f"{spec}.volumes.secret.secretName")
+        paths["Secret"].append(f"{spec}.volumes.projected.sources.secret.name")
+        paths["Secret"].append(f"{spec}.imagePullSecrets.name")
+    elif kind == "Ingress":
+        paths["Secret"].append("spec.tls.secretName")
+    elif kind == "ServiceAccount":
+        paths["Secret"] += ["secrets.name", "imagePullSecrets.name"]
+    for ref_kind, ref_paths in paths.items():
+        if renames[ref_kind]:
+            for path in ref_paths:
+                _rename(res, path, renames[ref_kind])
+
+
+###########################################################################
+# sorting
+
+def _gvk_string(res: Mapping) -> str:
+    group, _, version = res.get("apiVersion", "").rpartition("/")
+    return f"{group or '~G'}_{version or '~V'}_{res.get('kind') or '~K'}"
+
+
+def _sort_key(res: Mapping) -> tuple:
+    kind = res.get("kind")
+    if kind in ORDER_FIRST:
+        rank = ORDER_FIRST.index(kind) - len(ORDER_FIRST)
+    elif kind in ORDER_LAST:
+        rank = ORDER_LAST.index(kind) + 1
+    else:
+        rank = 0
+    meta = res.get("metadata", {})
+    legacy = (
+        f"{_gvk_string(res)}|{meta.get('namespace') or '~X'}|{meta.get('name') or '~N'}"
+    )
+    return (rank, _gvk_string(res), legacy)
+
+
+###########################################################################
+# the build itself
+
+def _list(kustomization: Mapping, field: str) -> list:
+    return list(kustomization.get(field) or [])
+
+
+def build(
+    kustomization: Mapping,
+    load_docs: Callable[[str], List[Mapping]],
+    load_file: Callable[[str], bytes],
+) -> List[dict]:
+    """
+    the resources of a kustomization
+
+    load_docs(path) should return the yaml documents of a resource or patch file,
+    load_file(path) the content (as bytes) of a file used by a generator.
+    """
+    unsupported = sorted(set(kustomization) - SUPPORTED_FIELDS)
+    if unsupported:
+        raise ValueError(
+            f"kustomization fields {unsupported} are not supported by the native "
+            "build engine, use system.build_engine: kustomize"
+        )
+    resources = []
+    for path in _list(kustomization, "resources"):
+        resources.extend(plain(doc) for doc in load_docs(path) if doc)
+
+    options = plain(kustomization.get("generatorOptions") or {})
+    hashed = []
+    for field, kind in _generator.GENERATORS:
+        for args in _list(kustomization, field):
+            args = plain(args)
+            if args.get("behavior", "create") != "create":
+                raise ValueError(f"generator behavior {args['behavior']} is not supported")
+            res = _generator.generate(kind, args, options, load_file)
+            resources.append(res)
+            if _generator.needs_hash(args, options):
+                hashed.append(res)
+
+    patch_paths = list(_list(kustomization, "patchesStrategicMerge"))
+    for entry in _list(kustomization, "patches"):
+        if not isinstance(entry, Mapping) or set(entry) != {"path"}:
+            raise ValueError(f"only patches with just a path are supported, not {entry}")
+        patch_paths.append(entry["path"])
+    for path in patch_paths:
+        for patch in load_docs(path):
+            if patch:
+                apply_patch(resources, plain(patch))
+
+    namespace = kustomization.get("namespace")
+    if namespace:
+        for res in resources:
+            if res.get("kind") not in CLUSTER_SCOPED_KINDS:
+                res.setdefault("metadata", {})["namespace"] = str(namespace)
+
+    renames = {"ConfigMap": {}, "Secret": {}}
+    for res in hashed:
+        name = res["metadata"]["name"]
+        new_name = f"{name}-{_generator.generated_hash(res)}"
+        renames[res["kind"]][name] = new_name
+        res["metadata"]["name"] = new_name
+    for res in resources:
+        rename_references(res, renames)
+    return sorted(resources, key=_sort_key)
+
+
+###########################################################################
+# output in the same format as kustomize (go-yaml v2)
+
+_GO_BOOL_NULL = {
+    "y", "Y", "yes", "Yes", "YES", "on", "On", "ON",
+    "n", "N", "no", "No", "NO", "off", "Off", "OFF",
+    "true", "True", "TRUE", "false", "False", "FALSE",
+    "", "~", "null", "Null", "NULL",
+    ".nan", ".NaN", ".NAN", "<<",
+}  # fmt: skip
+_GO_FLOAT = re.compile(r"^[-+]?(\.[0-9]+|[0-9]+(\.[0-9]*)?)([eE][-+]?[0-9]+)?$")
+_GO_INF = re.compile(r"^[-+]?\.(inf|Inf|INF)$")
+_GO_BASE60 = re.compile(r"^[-+]?[0-9][0-9_]*(?::[0-5]?[0-9])+(?:\.[0-9_]*)?$")
+_GO_TIMESTAMP = re.compile(
+    r"^[0-9]{4}-[0-9]{1,2}-[0-9]{1,2}"
+    r"(([Tt]|[ \t]+)[0-9]{1,2}:[0-9]{2}:[0-9]{2}(\.[0-9]*)?"
+    r"([ \t]*(Z|[-+][0-9]{1,2}(:[0-9]{2})?))?)?$"
+)
+_GO_INT = re.compile(r"^[-+]?(0[bB][01]+|0[oO]?[0-7]+|0[xX][0-9a-fA-F]+|[1-9][0-9]*|0)$")
+# the representer class is only created when needed, since it imports ruamel.yaml
+_go_representer_class = None
+
+
+def _go_non_str(text: str) -> bool:
+    """True if go-yaml would read the text (unquoted) as something else than a string"""
+    if text in _GO_BOOL_NULL or _GO_INF.match(text):
+        return True
+    if _GO_INT.match(text.replace("_", "")) and not text.startswith("_"):
+        return True
+    return bool(
+        _GO_FLOAT.match(text) or _GO_BASE60.match(text) or _GO_TIMESTAMP.match(text)
+    )
+
+
+def _go_key(key: str) -> list:
+    """the sort key of go-yaml: digits are compared as numbers, letters before others"""
+    result = []
+    for part in re.findall(r"\d+|\D", key):
+        if part.isdigit():
+            result.append((1, int(part), part))
+        elif part.isalpha():
+            result.append((2, part, ""))
+        else:
+            result.append((0, part, ""))
+    return result
+
+
+def _go_float(value: float) -> str:
+    """the same format as go's FormatFloat(value, 'g', -1, 64)"""
+    if value != value:
+        return ".nan"
+    if value in (float("inf"), float("-inf")):
+        return "+.inf" if value > 0 else "-.inf"
+    sign, digits, exp = decimal.Decimal(repr(value)).normalize().as_tuple()
+    digits = "".join(str(d) for d in digits)
+    exp10 = len(digits) + exp - 1
+    prefix = "-" if sign else ""
+    if exp10 < -4 or exp10 >= 6:
+        mantissa = digits[0] + ("." + digits[1:] if len(digits) > 1 else "")
+        return f"{prefix}{mantissa}e{'-' if exp10 < 0 else '+'}{abs(exp10):02d}"
+    return prefix + format(decimal.Decimal(digits).scaleb(exp), "f")
+
+
+def _go_representer():
+    """a ruamel representer that writes the same format as go-yaml"""
+    global _go_representer_class
+    if _go_representer_class is not None:
+        return _go_representer_class
+    from ruamel.yaml.representer import SafeRepresenter  # only needed for a native build
+
+    class GoRepresenter(SafeRepresenter):
+        sort_base_mapping_type_on_output = False
+
+        def represent_str(self, data):
+            if "\n" in data:
+                return self.represent_scalar("tag:yaml.org,2002:str", data, style="|")
+            if _go_non_str(data):
+                return self.represent_scalar("tag:yaml.org,2002:str", data, style='"')
+            return self.represent_scalar("tag:yaml.org,2002:str", data)
+
+        def represent_none(self, data):
+            return self.represent_scalar("tag:yaml.org,2002:null", "null")
+
+        def represent_float(self, data):
+            return self.represent_scalar("tag:yaml.org,2002:float", _go_float(data))
+
+        def represent_dict(self, data):
+            items = sorted(data.items(), key=lambda item: _go_key(str(item[0])))
+            return self.represent_mapping("tag:yaml.org,2002:map", dict(items))
+
+    GoRepresenter.add_representer(str, GoRepresenter.represent_str)
+    GoRepresenter.add_representer(type(None), GoRepresenter.represent_none)
+    GoRepresenter.add_representer(float, GoRepresenter.represent_float)
+    GoRepresenter.add_representer(dict, GoRepresenter.represent_dict)
+    _go_representer_class = GoRepresenter
+    return _go_representer_class
+
+
+def dump(resources: List[Mapping]) -> str:
+    """the resources as the multi document yaml that kustomize prints"""
+    from ruamel.yaml import YAML
+
+    yaml = YAML(typ="safe", pure=True)
+    yaml.Representer = _go_representer()
+    yaml.default_flow_style = False
+    yaml.allow_unicode = True
+    yaml.width = 80
+    yaml.indent(mapping=2, sequence=2, offset=0)
+    docs = []
+    for res in resources:
+        out = io.StringIO()
+        yaml.dump(res, out)
+        docs.append(out.getvalue())
+    return "---\n".join(docs)
+
+
+###########################################################################
+# building a kreated app or a directory
+
+def build_dir(path: Path) -> str:
+    """build a kustomization.yaml in a directory, e.g. to compare with kustomize"""
+    from ruamel.yaml import YAML
+
+    path = Path(path)
+    yaml = YAML(typ="safe", pure=True)
+
+    def load_docs(filename: str) -> List[Mapping]:
+        return list(yaml.load_all((path / filename).read_text()))
+
+    kustomization = yaml.load((path / "kustomization.yaml").read_text())
+    resources = build(kustomization, load_docs, lambda f: (path / f).read_bytes())
+    return dump(resources)
+
+
+def build_app(app: "App") -> str:
+    """build the aktivated komponents of an app, with kreated files in the target dir"""
+    from ruamel.yaml import YAML
+
+    from ..kore._komp import JinYamlKomponent, MultiJinYamlKomponent
+    from ._kust import Kustomization
+
+    kustomizations = [k for k in app.komponents if isinstance(k, Kustomization)]
+    if len(kustomizations) != 1:
+        raise ValueError(f"expected 1 Kustomization komponent, found {len(kustomizations)}")
+    docs = {}
+    for komp in app.komponents:
+        if isinstance(komp, JinYamlKomponent) and komp.yaml is not None:
+            docs[komp.get_filename()] = [komp.yaml.data]
+        elif isinstance(komp, MultiJinYamlKomponent) and komp.documents is not None:
+            docs[komp.get_filename()] = komp.documents
+    yaml = YAML(typ="safe", pure=True)
+
+    def load_docs(filename: str) -> List[Mapping]:
+        if filename in docs:
+            return docs[filename]
+        logger.debug(f"loading {filename} from {app.target_path}")
+        return list(yaml.load_all((app.target_path / filename).read_text()))
+
+    def load_file(filename: str) -> bytes:
+        return (app.target_path / filename).read_bytes()
+
+    resources = build(kustomizations[0].yaml.data, load_docs, load_file)
+    return dump(resources)
+
+
+###########################################################################
+# rendering komponents one by one, for the render command
+
+def _kustomization(app: "App"):
+    from ._kust import Kustomization
+
+    found = [komp for komp in app.komponents if isinstance(komp, Kustomization)]
+    return found[0] if len(found) == 1 else None
+
+
+def patches_of(komp: "Komponent") -> list:
+    from .patch import Patch
+
+    return [p for p in komp.app.komponents if isinstance(p, Patch) and p.target_id == komp.id]
+
+
+def _check_secrets_with_vars(kust: "Kustomization") -> None:
+    names = kust.secrets_with_vars()
+    if names:
+        raise ValueError(
+            f"can not render generated secrets {names} of {kust.id}, the values of their "
+            "vars (and so their names) are not known"
+        )
+
+
+def render_generated(kust: "Kustomization") -> List[dict]:
+    """the ConfigMaps and Secrets generated by a kustomization, without aktivating it"""
+    _check_secrets_with_vars(kust)
+    namespace = kust.namespace()
+    result = []
+    generated = _generator.generated_resources(kust.generators(), kust.kopied_file_data)
+    for _, res in generated:
+        if namespace:
+            res["metadata"]["namespace"] = str(namespace)
+        result.append(res)
+    return result
+
+
+def render_resource(komp: "Komponent", docs: List[Mapping]) -> List[dict]:
+    """the documents of a resource as kustomize outputs them: patched, with namespace and generated names"""
+    resources = [plain(doc) for doc in docs if doc]
+    for patch in patches_of(komp):
+        if patch.yaml is None:
+            raise ValueError(f"patch {patch.key()} of {komp.id} is not aktivated")
+        if patch.yaml.data:
+            apply_patch(resources, plain(patch.yaml.data))
+    kust = _kustomization(komp.app)
+    if kust is None:
+        return resources
+    # a reference to such a secret would keep the name without hash suffix
+    _check_secrets_with_vars(kust)
+    namespace = kust.namespace()
+    renames = {"ConfigMap": {}, "Secret": {}}
+    for (kind, name), generated in kust.generated_names().items():
+        renames[kind][name] = generated
+    for res in resources:
+        if namespace and res.get("kind") not in CLUSTER_SCOPED_KINDS:
+            res.setdefault("metadata", {})["namespace"] = str(namespace)
+        rename_references(res, renames)
+    return resources
+
+
+def run_build(cli: "Cli", app: "App") -> str:
+    """the output of `kustomize build`, or of the native build engine"""
+    engine = app.konfig.get_path("system.build_engine", "kustomize")
+    if engine == "native":
+        return build_app(app)
+    if engine != "kustomize":
+        raise ValueError(f"unknown system.build_engine {engine}, use kustomize or native")
+    return cli.run_command(app, "build")
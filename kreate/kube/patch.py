@@ -2,7 +2,7 @@ import logging
 
 from ..kore import deep_update
 from ..kore import JinYamlKomponent, App
-from ..kore._komp import KomponentKlass
+from ..kore._komp import KomponentKlass, FieldIndex
 from .resource import Resource, Egress
 
 logger = logging.getLogger(__name__)
@@ -39,28 +39,38 @@ class Patch(JinYamlKomponent):
         self.target = self.app.komponents_by_id[self.target_id]
         super().aktivate()
 
+    def key(self):
+        return f"{self.target_id}-{self.id}"
+
+    def aktivate_after(self):
+        return [self.target_id]
+
     def __str__(self):
         return f"<Patch {self.target_id}: {self.id}>"
 
     def get_filename(self):
         return f"patches/{self.target_id}-{self.id}.yaml"
 
+    def render_documents(self):
+        # a patch is rendered as part of it's target
+        return []
+
     def _template_vars(self):
-        return {**super()._template_vars(), "target": self.target}
+        return super()._template_vars().new_child({"target": self.target})
 
     def _find_strukture(self):
         if result := super()._find_strukture():
             return result
         return self.app.konfig.get_path(f"strukt.{self.target_id}.patches.{self.id}", {})
 
-    def _field(self, fieldname: str, default=None):
-        if fieldname in self.strukture:
-            return self.strukture[fieldname]
-        if result := self.target.strukture.get_path(f"field.{fieldname}"):
-            return result
-        if fieldname in self.target.strukture:
-            return self.target.strukture[fieldname]
-        return super()._field(fieldname, default=default)
+    def field_layers(self) -> list:
+        strukt = self.target.strukture.data
+        return [
+            (f"strukt.{self.id}", self.strukture.data, FieldIndex.PRESENT),
+            (f"strukt.{self.target_id}.field", strukt.get("field"), FieldIndex.TRUTHY),
+            (f"strukt.{self.target_id}", strukt, FieldIndex.PRESENT),
+            *super().field_layers(),
+        ]
 
 
 class CustomPatch(Patch):
@@ -72,6 +82,9 @@ class EgressLabels(Patch):
     def egresses(self):
         return [k for k in self.app.komponents if isinstance(k, Egress)]
 
+    def aktivate_after(self):
+        return [self.target_id, *(egress.id for egress in self.egresses())]
+
 
 class MultiPatch(Patch):
     def __init__(self, app: App, klass: KomponentKlass, shortname: str, target_id=None):
@@ -24,6 +24,16 @@ class MultiDocumentResource(MultiJinYamlKomponent):
             return True
         return super().implements(name)
 
+    def render_after(self):
+        from ._kustomize import patches_of
+
+        return [patch.key() for patch in patches_of(self)]
+
+    def render_documents(self):
+        from ._kustomize import render_resource
+
+        return render_resource(self, self.documents)
+
 
 
 class Resource(JinYamlKomponent):
@@ -46,6 +56,16 @@ class Resource(JinYamlKomponent):
     def get_filename(self):
         return f"resources/{self.id}.yaml"
 
+    def render_after(self):
+        from ._kustomize import patches_of
+
+        return [patch.key() for patch in patches_of(self)]
+
+    def render_documents(self):
+        from ._kustomize import render_resource
+
+        return render_resource(self, [self.yaml.data])
+
     def add_metadata(self):
         for key in self.strukture.get("annotations", {}):
             self.yaml.get("metadata.annotations")[key] = self.strukture.get(
@@ -1,7 +1,9 @@
 import logging
+import re
 from ..kore import App, Cli
 from ..kore._core import pprint_map
 from .resource import Resource
+from ._kust import Kustomization
 
 
 logger = logging.getLogger(__name__)
@@ -56,6 +58,24 @@ def diff_config_map(cli: Cli, name: str, old_name: str) -> list:
     #build_result = cli.run_command(komp.app, "build")
     #documents = app.konfig.jinyaml.yaml_parser.load_all(build_result)
 
+def generated_base_names(app: App, documents: list) -> dict:
+    """the names without hash suffix of generated resources, by kind and generated name"""
+    result = {}
+    unknown = []
+    for komp in app.komponents:
+        if isinstance(komp, Kustomization):
+            for (kind, name), generated in komp.generated_names().items():
+                result[(kind, generated)] = name
+            unknown += [("Secret", name) for name in komp.secrets_with_vars()]
+    # generated names that can not be computed are matched in the build output
+    for doc in documents:
+        kind, name = doc.get("kind"), doc.get("metadata").get("name")
+        for unknown_kind, base_name in unknown:
+            if kind == unknown_kind and re.fullmatch(re.escape(base_name) + "-[a-z0-9]{10}", name):
+                result[(kind, name)] = base_name
+    return result
+
+
 def dump(cli: Cli, kind_filter: str = None, name_mapper: dict = None) -> None:
     app = cli.kreate_files()
     dump_helper(cli, app)
@@ -63,9 +83,12 @@ def dump(cli: Cli, kind_filter: str = None, name_mapper: dict = None) -> None:
 
 def dump_helper(cli: Cli, app: App,  kind_filter: str = None, name_mapper: dict = None) -> None:
     """dump `kustomize build` output to individual files per resource"""
+    from ._kustomize import run_build
+
     dumped_files = []
-    build_result = cli.run_command(app, "build")
-    documents = app.konfig.jinyaml.yaml_parser.load_all(build_result)
+    build_result = run_build(cli, app)
+    documents = list(app.konfig.jinyaml.yaml_parser.load_all(build_result))
+    base_names = generated_base_names(app, documents) if name_mapper else {}
     dumpdir = app.target_path / "dump"
     dumpdir.mkdir(parents=True, exist_ok=True)
     for doc in documents:
@@ -73,16 +96,15 @@ def dump_helper(cli: Cli, app: App,  kind_filter: str = None, name_mapper: dict
         if kind_filter and kind != kind_filter:
             continue
         name = doc.get("metadata").get("name")
-        if name_mapper:
-            if len(name) > 11:
-                trunc_name = name[:-11]
-                if trunc_name not in name_mapper:
-                    logger.warning(f"Could not find {trunc_name} in mapper list, skipping...")
-                    continue
-                old_name = name_mapper[trunc_name]
-                logger.info(f"changing name from {name} to {old_name}")
-                doc.get("metadata")["name"] = old_name
-                name = old_name
+        if name_mapper and (kind, name) in base_names:
+            base_name = base_names[(kind, name)]
+            if base_name not in name_mapper:
+                logger.warning(f"Could not find {base_name} in mapper list, skipping...")
+                continue
+            old_name = name_mapper[base_name]
+            logger.info(f"changing name from {name} to {old_name}")
+            doc.get("metadata")["name"] = old_name
+            name = old_name
         if len(cli.params) > 0:
             pattern = cli.params[0]
             if not pattern in kind + name:
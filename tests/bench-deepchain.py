@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""micro-benchmarks for DeepChain lookups with 5 to 10 layers"""
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from kreate.kore.deepchain import DeepChain  # noqa: E402
+
+
+def layer(i: int, depth: int = 4) -> dict:
+    result = {f"key{i}-{k}": k for k in range(20)}
+    result["shared"] = i
+    if depth > 0:
+        result["nested"] = layer(i, depth - 1)
+    return result
+
+
+def bench(nrof_layers: int, number: int = 10000) -> None:
+    chain = DeepChain(*(layer(i) for i in range(nrof_layers)))
+
+    def deep_lookup():
+        return chain["nested"]["nested"]["nested"]["shared"]
+
+    def attr_lookup():
+        return chain.nested.nested.shared
+
+    def get_missing():
+        return chain.nested.get("missing", None)
+
+    def length():
+        return len(chain.nested)
+
+    print(f"{nrof_layers} layers:")
+    for func in (deep_lookup, attr_lookup, get_missing, length):
+        usec = timeit.timeit(func, number=number) / number * 1_000_000
+        print(f"  {func.__name__:12} {usec:8.2f} usec")
+    frozen = chain.freeze()
+    assert frozen["nested"]["nested"]["nested"]["shared"] == deep_lookup()
+    usec = timeit.timeit(lambda: chain.freeze(), number=10) / 10 * 1_000_000
+    print(f"  {'freeze':12} {usec:8.2f} usec")
+
+
+if __name__ == "__main__":
+    for nrof_layers in (5, 8, 10):
+        bench(nrof_layers)
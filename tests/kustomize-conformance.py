@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+test the native build engine against recorded output of kustomize
+
+Each dir in tests/kustomize contains a kustomization.yaml with it's files,
+and an expected.yaml with the output of `kustomize build` for that dir.
+The native build of each dir should give exactly the same output,
+and the names of the generated resources should also be computed correctly
+without a build.
+All recorded output (including the expected output of the demo app) should
+also stay the same when it is parsed and dumped again, to test the format.
+
+The expected output of the demo-dev case is the recorded output of the demo
+app (tests/demo/expected-output-demo-dev.out). It's kustomization has
+everything the Kustomization komponent kreates: resources, patches, a
+namespace, and generated ConfigMaps and Secrets that are referenced by other
+resources (also by a CronJob, at a path that kustomize does not rename).
+The resources, patches and files are the documents of that output, without
+namespace and hash suffix, and with some fields moved to the patches.
+
+New cases can be recorded with `--record` (this needs kustomize or kubectl),
+e.g. by copying the target dir of a kreated app and running:
+    tests/kustomize-conformance.py --record tests/kustomize/<case>
+"""
+import difflib
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from kreate.kube import _generator, _kustomize  # noqa: E402
+
+CASES_DIR = Path(__file__).parent / "kustomize"
+RECORDED_OUTPUT = [
+    *sorted(CASES_DIR.glob("*/expected.yaml")),
+    *sorted(Path(__file__).parent.glob("demo/expected-output-*.out")),
+]
+
+# hashes that are tested in the hasher of kustomize itself
+HASHES = [
+    ('{"data":"","kind":"ConfigMap","name":""}', "6ct58987ht"),
+    ('{"data":{"one":""},"kind":"ConfigMap","name":""}', "9g67k2htb6"),
+    ('{"data":"","kind":"Secret","name":"","type":"my-type"}', "5gmgkf8578"),
+    ('{"data":{"one":""},"kind":"Secret","name":"","type":"my-type"}', "74bd68bm66"),
+]
+
+
+def kustomize_command(case: Path) -> list:
+    if shutil.which("kustomize"):
+        return ["kustomize", "build", str(case)]
+    if shutil.which("kubectl"):
+        return ["kubectl", "kustomize", str(case)]
+    sys.exit("recording needs kustomize or kubectl")
+
+
+def record(case: Path) -> None:
+    output = subprocess.run(
+        kustomize_command(case), check=True, capture_output=True, text=True
+    ).stdout
+    (case / "expected.yaml").write_text(output)
+    print(f"recorded {case}")
+
+
+def check(case: Path) -> bool:
+    expected = (case / "expected.yaml").read_text()
+    try:
+        output = _kustomize.build_dir(case)
+    except Exception as e:
+        print(f"FAILED {case.name}: {type(e).__name__}: {e}")
+        return False
+    if output == expected:
+        print(f"ok {case.name}")
+        return True
+    print(f"FAILED {case.name}")
+    diff = difflib.unified_diff(
+        expected.splitlines(), output.splitlines(), "kustomize", "native", lineterm=""
+    )
+    for line in diff:
+        print(line)
+    return False
+
+
+def check_names(case: Path) -> bool:
+    """the names of generated resources, computed without a build"""
+    from ruamel.yaml import YAML
+
+    yaml = YAML(typ="safe", pure=True)
+    kustomization = yaml.load((case / "kustomization.yaml").read_text())
+    names = _generator.generated_names(kustomization, lambda f: (case / f).read_bytes())
+    expected = {
+        doc["metadata"]["name"]
+        for doc in yaml.load_all((case / "expected.yaml").read_text())
+        if doc and doc.get("kind") in ("ConfigMap", "Secret")
+    }
+    if set(names.values()) <= expected:
+        print(f"ok names of {case.name}")
+        return True
+    print(f"FAILED names of {case.name}: {sorted(names.values())} not in {sorted(expected)}")
+    return False
+
+
+def check_format(path: Path) -> bool:
+    from ruamel.yaml import YAML
+
+    text = path.read_text()
+    docs = YAML(typ="safe", pure=True).load_all(text)
+    output = _kustomize.dump([_kustomize.plain(doc) for doc in docs])
+    if output == text:
+        print(f"ok format of {path.parent.name}/{path.name}")
+        return True
+    print(f"FAILED format of {path}")
+    diff = difflib.unified_diff(
+        text.splitlines(), output.splitlines(), "kustomize", "native", lineterm=""
+    )
+    for line in diff:
+        print(line)
+    return False
+
+
+def check_hashes() -> bool:
+    ok = True
+    for text, expected in HASHES:
+        result = _generator.encode_hash(text)
+        if result != expected:
+            print(f"FAILED hash of {text}: {result} instead of {expected}")
+            ok = False
+    print(f"{'ok' if ok else 'FAILED'} {len(HASHES)} hashes")
+    return ok
+
+
+def main() -> None:
+    args = sys.argv[1:]
+    if args and args[0] == "--record":
+        for case in args[1:]:
+            record(Path(case))
+        return
+    cases = [Path(case) for case in args] or sorted(p for p in CASES_DIR.iterdir() if p.is_dir())
+    results = [check_hashes()]
+    results += [check_format(path) for path in RECORDED_OUTPUT]
+    results += [check(case) for case in cases]
+    results += [check_names(case) for case in cases]
+    if not all(results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+randomized test of OverlayMap against deep_update on a plain dict
+
+Random layers (with nested maps, lists, scalars, _do_not_overwrite and a
+list insert index) are added to an OverlayMap and merged into a plain dict
+with deep_update. Between the layers, random paths are read, set and
+deleted on both. The (frozen) values and the order of all keys should be
+the same, and the layers should not be changed by the OverlayMap.
+If deep_update raises an error, the OverlayMap should raise the same error
+when adding the layer, or when the merged value is read.
+
+usage: tests/overlay-equivalence.py [nrof-runs [seed]]
+"""
+import copy
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from kreate.kore._core import deep_update  # noqa: E402
+from kreate.kore.overlay import OverlayMap, freeze  # noqa: E402
+
+KEYS = ["a", "b", "c", "d", "inklude", "_do_not_overwrite"]
+
+
+def random_value(rnd: random.Random, depth: int):
+    choice = rnd.random()
+    if depth > 0 and choice < 0.4:
+        return random_map(rnd, depth - 1)
+    if choice < 0.6:
+        return [rnd.randint(0, 9) for _ in range(rnd.randint(0, 3))]
+    return rnd.choice([rnd.randint(0, 9), "x", "y", None, True])
+
+
+def random_map(rnd: random.Random, depth: int) -> dict:
+    result = {}
+    for key in rnd.sample(KEYS, rnd.randint(0, 4)):
+        if key == "_do_not_overwrite":
+            result[key] = rnd.random() < 0.5
+        else:
+            result[key] = random_value(rnd, depth)
+    return result
+
+
+def ordered(value):
+    """the value with all maps as lists of items, to compare the order of keys"""
+    if isinstance(value, dict):
+        return [(k, ordered(v)) for k, v in value.items()]
+    if isinstance(value, list):
+        return [ordered(item) for item in value]
+    return value
+
+
+def random_path(rnd: random.Random, plain: dict) -> list:
+    path, node = [], plain
+    while isinstance(node, dict) and node:
+        path.append(rnd.choice(list(node)) if rnd.random() < 0.9 else "missing")
+        if path[-1] not in node or rnd.random() < 0.3:
+            break
+        node = node[path[-1]]
+    return path
+
+
+def lookup(node, path: list):
+    for key in path:
+        node = node[key]
+    return node
+
+
+def run(rnd: random.Random, log: list) -> str:
+    """do random operations, and return a description of the first difference"""
+    plain, overlay = {}, OverlayMap()
+    layers = []
+    for _ in range(rnd.randint(1, 8)):
+        layer = random_map(rnd, 3)
+        overwrite = rnd.random() < 0.7
+        list_insert_index = {"inklude": rnd.randint(0, 2)} if rnd.random() < 0.3 else None
+        log.append(f"add_layer({layer}, {overwrite}, {list_insert_index})")
+        layers.append((layer, copy.deepcopy(layer)))
+        try:
+            deep_update(plain, copy.deepcopy(layer), overwrite, list_insert_index)
+        except ValueError:
+            try:
+                overlay.add_layer(layer, overwrite, list_insert_index)
+                freeze(overlay)
+            except ValueError:
+                return ""
+            return "deep_update raised an error, but OverlayMap did not"
+        overlay.add_layer(layer, overwrite, list_insert_index)
+        for _ in range(rnd.randint(0, 3)):
+            path = random_path(rnd, plain)
+            if not path:
+                continue
+            action = rnd.random()
+            if action < 0.5:
+                log.append(f"read {path}")
+                try:
+                    expected = lookup(plain, path)
+                except KeyError:
+                    expected = KeyError
+                try:
+                    value = freeze(lookup(overlay, path))
+                except KeyError:
+                    value = KeyError
+                if ordered(value) != ordered(expected):
+                    return f"read {path} gives {value} instead of {expected}"
+            elif not isinstance(lookup(plain, path[:-1]), dict):
+                continue
+            elif action < 0.8:
+                value = random_value(rnd, 0)
+                log.append(f"set {path} = {value}")
+                lookup(plain, path[:-1])[path[-1]] = copy.deepcopy(value)
+                lookup(overlay, path[:-1])[path[-1]] = value
+            elif path[-1] in lookup(plain, path[:-1]):
+                log.append(f"del {path}")
+                del lookup(plain, path[:-1])[path[-1]]
+                del lookup(overlay, path[:-1])[path[-1]]
+    result = freeze(overlay)
+    if ordered(result) != ordered(plain):
+        return f"result {result} instead of {plain}"
+    for layer, original in layers:
+        if ordered(layer) != ordered(original):
+            return f"layer {original} was changed to {layer}"
+    return ""
+
+
+def main() -> int:
+    nrof_runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    for i in range(nrof_runs):
+        log = []
+        error = run(random.Random(seed + i), log)
+        if error:
+            print("\n".join(log))
+            print(f"FAIL: run with seed {seed + i}: {error}")
+            return 1
+    print(f"OK: {nrof_runs} runs")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+stress test for many kreate processes that share the same repo cache
+
+All processes start with an empty cache, and need the same local zip repo.
+Each process should either extract the repo itself, or wait for another
+process and use that result, and never see a half extracted repo.
+
+usage: tests/repo-concurrency.py [nrof-processes]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import zipfile
+from pathlib import Path
+
+NROF_FILES = 2000
+
+
+def write_zip(path: Path) -> None:
+    with zipfile.ZipFile(path, "w") as z:
+        for i in range(NROF_FILES):
+            z.writestr(f"top/files/file{i}.konf", f"file{i}: {i}\n")
+        # the last file in the zip is needed, to detect half extracted repos
+        z.writestr("top/shared.konf", "shared:\n  loaded: true\n")
+
+
+def write_konfig(dir: Path, keep_zip: bool) -> None:
+    (dir / "kreate-test.konf").write_text(
+        "inklude:\n"
+        "- shared:shared.konf\n"
+        "system:\n"
+        "  repo:\n"
+        "    shared:\n"
+        "      type: local-zip\n"
+        f"      path: {dir / 'shared.zip'}\n"
+        "      version: 1.0.0\n"
+        "      skip_levels: 1\n"
+        f"      keep_zip: {keep_zip}\n"
+    )
+
+
+def run_concurrent(dir: Path, nrof_processes: int) -> int:
+    env = {**os.environ, "KREATE_REPO_CACHE_DIR": str(dir / "cache")}
+    cmd = [sys.executable, "-m", "kreate.kube", "-w", "-k", str(dir), "view", "shared"]
+    procs = [
+        subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        for _ in range(nrof_processes)
+    ]
+    errors = 0
+    for proc in procs:
+        out, err = proc.communicate()
+        if proc.returncode != 0 or b"loaded: True" not in out:
+            errors += 1
+            print(f"FAIL: process {proc.pid} exited with {proc.returncode}")
+            print(out.decode()[-500:], err.decode()[-500:])
+    return errors
+
+
+def main() -> int:
+    nrof_processes = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    errors = 0
+    for keep_zip in (False, True):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dir = Path(tmpdir)
+            write_zip(dir / "shared.zip")
+            write_konfig(dir, keep_zip)
+            errors += run_concurrent(dir, nrof_processes)
+            leftovers = list((dir / "cache").glob("**/*.tmp"))
+            if leftovers:
+                print(f"FAIL: temporary files left in cache: {leftovers}")
+                errors += 1
+        print(f"{nrof_processes} concurrent processes with keep_zip={keep_zip}")
+    print("OK" if errors == 0 else f"{errors} errors")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
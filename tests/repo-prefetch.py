@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+test the parallel prefetch of url-zip repos, with a local http server
+
+Each zip file is served with a delay, to simulate a slow (remote) server.
+The repos should be downloaded in parallel, using the same http session.
+With KREATE_REPO_KEEP_ZIP=True the zip files are kept, instead of extracted.
+"""
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+NROF_REPOS = 4
+DELAY = 0.5
+
+
+def zip_data(name: str) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as z:
+        z.writestr(f"{name}.konf", f"{name}:\n  loaded: true\n")
+    return buffer.getvalue()
+
+
+class ZipHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        name = self.path.strip("/").split("/")[0]
+        time.sleep(DELAY)
+        data = zip_data(name)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/zip")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def write_konfig(dir: Path, port: int) -> None:
+    lines = ["inklude:"]
+    lines += [f"- repo{i}:repo{i}.konf" for i in range(NROF_REPOS)]
+    lines += ["system:", "  repo:"]
+    for i in range(NROF_REPOS):
+        lines += [
+            f"    repo{i}:",
+            "      type: url-zip",
+            f"      url: http://127.0.0.1:{port}/repo{i}/{{version}}.zip",
+            "      version: 1.0.0",
+        ]
+    (dir / "kreate-test.konf").write_text("\n".join(lines) + "\n")
+
+
+def kreate(dir: Path, keep_zip: bool, *args) -> float:
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-m", "kreate.kube", "-k", str(dir), *args],
+        env={
+            **os.environ,
+            "KREATE_REPO_CACHE_DIR": str(dir / "cache"),
+            "KREATE_REPO_PREFETCH_JOBS": str(NROF_REPOS),
+            "KREATE_REPO_KEEP_ZIP": str(keep_zip),
+        },
+        check=True,
+    )
+    return time.perf_counter() - start
+
+
+def check_prefetch(port: int, keep_zip: bool, *args) -> int:
+    errors = 0
+    with tempfile.TemporaryDirectory() as tmpdir:
+        dir = Path(tmpdir)
+        write_konfig(dir, port)
+        elapsed = kreate(dir, keep_zip, *args)
+        pattern = "repo*/1.0.0-*.zip" if keep_zip else "repo*/1.0.0-*/repo*.konf"
+        cached = list((dir / "cache").glob(pattern))
+        print(f"kreate {' '.join(args)}: {len(cached)} repos in {elapsed:.2f} seconds")
+        if len(cached) != NROF_REPOS:
+            print(f"FAIL: expected {NROF_REPOS} repos in the cache")
+            errors += 1
+        if elapsed > NROF_REPOS * DELAY:
+            print("FAIL: repos were not downloaded in parallel")
+            errors += 1
+        elapsed = kreate(dir, keep_zip, *args)
+        print(f"second run took {elapsed:.2f} seconds")
+        if elapsed > DELAY:
+            print("FAIL: cached repos were downloaded again")
+            errors += 1
+    return errors
+
+
+def main() -> int:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ZipHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    # the explicit subcommand, and the automatic prefetch when loading the konfig
+    errors = 0
+    for keep_zip in (False, True):
+        errors += check_prefetch(port, keep_zip, "repo", "prefetch")
+        errors += check_prefetch(port, keep_zip, "view", "repo3")
+    server.shutdown()
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
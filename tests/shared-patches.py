@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+regression test for the same patches on more than one target
+
+As in the demo strukture, a Deployment and a StatefulSet both have an
+ElasticLogging and KubernetesAnnotations patch, so these patches have the
+same id. All patches should be aktivated and kreated for both targets,
+and aktivating in parallel processes should give exactly the same files.
+The rendered Deployment and StatefulSet should both have the annotations
+of both patches.
+
+usage: tests/shared-patches.py
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+TESTS_DIR = Path(__file__).resolve().parent
+PATCHES = ["ElasticLogging.main", "KubernetesAnnotations.main"]
+TARGETS = ["Deployment.main", "StatefulSet.main"]
+# an annotation that is added by each patch
+ANNOTATIONS = ["co.elastic.logs/enabled", "app.kubernetes.io/name"]
+
+
+def write_konfig(dir: Path) -> None:
+    (dir / "files").mkdir()
+    (dir / "files" / "application.properties").write_text("server.port=8080\n")
+    (dir / "kreate-demo-dev.konf").write_text(
+        "app:\n"
+        "  appname: demo\n"
+        "  env: dev\n"
+        "version:\n"
+        "  image_version: v1.3.4\n"
+        "inklude:\n"
+        "- kreate-kube-framework:init-kreate-kube-framework.konf\n"
+        "val:\n"
+        "  generic:\n"
+        "    image_repo: docker.example.com\n"
+        "    project: x\n"
+        "file:\n"
+        "  application.properties: cwd:files/application.properties\n"
+        "system:\n"
+        "  template:\n"
+        "    ElasticLogging:\n"
+        "      class: kreate.kube.patch.Patch\n"
+        f"      template: {TESTS_DIR / 'demo' / 'templates' / 'ElasticLogging.yaml'}\n"
+        "strukt:\n"
+        "  Deployment:\n"
+        "    main:\n"
+        "      patches:\n"
+        "        ElasticLogging: {}\n"
+        "        KubernetesAnnotations: {}\n"
+        "  StatefulSet:\n"
+        "    main:\n"
+        "      patches:\n"
+        "        ElasticLogging: {}\n"
+        "        KubernetesAnnotations: {}\n"
+        "  Kustomization:\n"
+        "    main:\n"
+        "      configmaps:\n"
+        "        demo-files:\n"
+        "          files:\n"
+        "          - application.properties\n"
+    )
+
+
+def kreate(dir: Path, *args) -> subprocess.CompletedProcess:
+    env = {**os.environ, "PYTHONPATH": str(TESTS_DIR.parent)}
+    return subprocess.run(
+        [sys.executable, "-m", "kreate.kube", "-w", "-k", str(dir), *args],
+        cwd=dir,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+
+
+def files_of(dir: Path) -> dict:
+    return {str(p.relative_to(dir)): p.read_bytes() for p in dir.glob("**/*") if p.is_file()}
+
+
+def check_files(dir: Path, *args) -> int:
+    errors = 0
+    cmd = " ".join(["kreate", *args, "files"])
+    proc = kreate(dir, *args, "files")
+    if proc.returncode != 0:
+        print(f"FAIL: {cmd} exited with {proc.returncode}\n{proc.stderr[-1000:]}")
+        return 1
+    for target in TARGETS:
+        for patch in PATCHES:
+            path = dir / "build" / "demo-dev" / "patches" / f"{target}-{patch}.yaml"
+            if not path.exists() or not path.read_text().strip():
+                print(f"FAIL: patch {patch} for {target} was not kreated")
+                errors += 1
+    print(f"{cmd}: {'OK' if errors == 0 else 'FAILED'}")
+    return errors
+
+
+def check_parallel(dir: Path) -> int:
+    serial = files_of(dir / "build" / "demo-dev")
+    errors = check_files(dir, "--jobs", "4")
+    parallel = files_of(dir / "build" / "demo-dev")
+    if parallel != serial:
+        changed = sorted(p for p in serial.keys() | parallel.keys() if serial.get(p) != parallel.get(p))
+        print(f"FAIL: parallel aktivation gives other files: {changed}")
+        errors += 1
+    return errors
+
+
+def check_render(dir: Path) -> int:
+    errors = 0
+    proc = kreate(dir, "render", "--output-format", "json")
+    if proc.returncode != 0:
+        print(f"FAIL: kreate render exited with {proc.returncode}\n{proc.stderr[-1000:]}")
+        return 1
+    docs = [json.loads(line) for line in proc.stdout.splitlines()]
+    for kind in ("Deployment", "StatefulSet"):
+        found = [doc for doc in docs if doc.get("kind") == kind]
+        if len(found) != 1:
+            print(f"FAIL: rendered {len(found)} documents of kind {kind}")
+            errors += 1
+            continue
+        annotations = found[0]["spec"]["template"]["metadata"].get("annotations", {})
+        for annotation in ANNOTATIONS:
+            if annotation not in annotations:
+                print(f"FAIL: rendered {kind} has no annotation {annotation}")
+                errors += 1
+    print(f"kreate render: {'OK' if errors == 0 else 'FAILED'}")
+    return errors
+
+
+def main() -> int:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        dir = Path(tmpdir)
+        write_konfig(dir)
+        errors = check_files(dir)
+        errors += check_parallel(dir)
+        errors += check_render(dir)
+    print("OK" if errors == 0 else f"{errors} errors")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
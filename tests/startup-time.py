@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+check the startup time of trivial kreate commands, using python -X importtime
+
+The heavy dependencies (jinja2, ruamel.yaml, requests, cryptography, ...)
+should only be imported by the subcommands that need them.
+The budget is for all kreate modules that the command line imports
+(`kreate.kube` itself imports almost nothing).
+
+usage: tests/startup-time.py [budget-in-ms] [subcommand ...]
+"""
+import os
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ["jinja2", "ruamel.yaml", "requests", "cryptography", "packaging"]
+
+
+def imported_modules(args: list) -> dict:
+    """return the cumulative import time (in us) of all imports, and which are toplevel"""
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)  # a pyc cache is part of normal use
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "kreate.kube", *args],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    result = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            # nested imports are indented
+            toplevel = not name[1:].startswith(" ")
+            result[name.strip()] = (int(cumulative), toplevel)
+    return result
+
+
+def wall_time(args: list, number: int = 5) -> float:
+    times = []
+    for _ in range(number):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-m", "kreate.kube", *args], capture_output=True
+        )
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main() -> int:
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else 100
+    args = sys.argv[2:] or ["version"]
+    imported_modules(args)  # warm up the pyc cache
+    modules = imported_modules(args)
+    heavy = [mod for mod in HEAVY_MODULES if mod in modules]
+    kreate_modules = {
+        name: us for name, (us, toplevel) in modules.items()
+        if toplevel and (name == "kreate" or name.startswith("kreate."))
+    }
+    kreate_ms = sum(kreate_modules.values()) / 1000
+    wall_ms = wall_time(args)
+    print(f"kreate {' '.join(args)}")
+    for name, us in sorted(kreate_modules.items(), key=lambda item: -item[1]):
+        print(f"  import {name:22} {us / 1000:6.1f} ms")
+    print(f"  import kreate (all):        {kreate_ms:6.1f} ms")
+    print(f"  total wall time:            {wall_ms:6.1f} ms")
+    if heavy:
+        print(f"  FAIL: heavy modules imported: {' '.join(heavy)}")
+    if kreate_ms > budget:
+        print(f"  FAIL: import time above budget of {budget} ms")
+    return 1 if heavy or kreate_ms > budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())